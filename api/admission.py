@@ -0,0 +1,344 @@
+"""
+Priority admission control in front of model scoring.
+
+Scoring runs on a fixed pool of scoring threads ("slots") instead of the
+event loop. Requests enter through one of two lanes:
+
+* interactive: single predictions and small batches. Strict priority: a
+  free slot always goes to a waiting interactive request first.
+* bulk: large batches. They are scored in slices, and every slice is
+  admitted separately, so interactive requests overtake a bulk batch
+  between slices rather than waiting for the whole batch.
+
+Each lane has its own concurrency limit and queue depth; requests beyond
+the queue depth are rejected (503) instead of piling up. Wait and service
+times are tracked per lane in fixed-size histograms.
+
+A request may carry a deadline. It then waits for a slot only until the
+deadline, and a sliced batch is stopped between slices once the deadline
+has passed or the client has disconnected, which frees the slot for other
+work. Stopped requests and the slices and rows they did not score are
+counted.
+"""
+import asyncio
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Batches up to this many rows are treated as interactive
+SMALL_BATCH_ROWS = 50
+# Rows per bulk slice (the preemption granularity for bulk batches)
+BULK_SLICE_ROWS = 1000
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = np.array([
+    0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000
+])
+
+
+class AdmissionRejected(Exception):
+    """Raised when a lane's queue is full."""
+
+
+class RequestCancelled(Exception):
+    """Raised when a request's scoring is stopped before it completes."""
+
+
+class DeadlineExceeded(RequestCancelled):
+    """Raised when a request's deadline passes before its scoring is done."""
+
+
+class ClientDisconnected(RequestCancelled):
+    """Raised when the client goes away before its scoring is done."""
+
+
+class Deadline:
+    """Time by which a request must be answered."""
+
+    def __init__(self, budget_ms: float, started: Optional[float] = None):
+        """
+        Initialize the deadline.
+
+        Args:
+            budget_ms: Time allowed, in milliseconds
+            started: time.monotonic() value the budget counts from (default: now)
+        """
+        self.budget_ms = budget_ms
+        self.started = started if started is not None else time.monotonic()
+        self.at = self.started + budget_ms / 1000
+
+    def remaining(self) -> float:
+        """Seconds left (negative once the deadline has passed)."""
+        return self.at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+def usable_cores() -> int:
+    """Number of cores this process may run on (honours CPU affinity where supported)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class LatencyStats:
+    """Count, mean, max and histogram-based percentiles of a latency, in fixed memory."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = np.zeros(len(LATENCY_BUCKETS_MS) + 1, dtype=np.int64)
+
+    def record(self, ms: float):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[np.searchsorted(LATENCY_BUCKETS_MS, ms)] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile (capped at the maximum)."""
+        if self.count == 0:
+            return None
+        idx = int(np.searchsorted(np.cumsum(self.buckets), q / 100 * self.count))
+        if idx >= len(LATENCY_BUCKETS_MS):
+            return round(self.max_ms, 3)
+        return min(float(LATENCY_BUCKETS_MS[idx]), round(self.max_ms, 3))
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3)
+        }
+
+
+class Lane:
+    """A traffic class with its own concurrency limit, queue and metrics."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting: deque = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.wait = LatencyStats()
+        self.service = LatencyStats()
+
+    def can_start(self) -> bool:
+        return bool(self.waiting) and self.active < self.max_concurrency
+
+    def to_dict(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": len(self.waiting),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait": self.wait.to_dict(),
+            "service": self.service.to_dict()
+        }
+
+
+class AdmissionController:
+    """Schedules scoring work from the lanes onto a fixed pool of scoring slots."""
+
+    def __init__(
+        self,
+        slots: Optional[int] = None,
+        interactive_concurrency: Optional[int] = None,
+        interactive_queue: Optional[int] = None,
+        bulk_concurrency: Optional[int] = None,
+        bulk_queue: Optional[int] = None
+    ):
+        """
+        Initialize the controller. Unset arguments fall back to environment variables.
+
+        Args:
+            slots: Scoring threads (SCORING_SLOTS, default: usable cores)
+            interactive_concurrency: Interactive lane limit (INTERACTIVE_CONCURRENCY, default: all slots)
+            interactive_queue: Interactive queue depth (INTERACTIVE_QUEUE_DEPTH, default 256)
+            bulk_concurrency: Bulk lane limit (BULK_CONCURRENCY, default: all slots but one)
+            bulk_queue: Bulk queue depth, in slices (BULK_QUEUE_DEPTH, default 64)
+        """
+        def setting(value, env, default):
+            return value if value is not None else int(os.getenv(env, default))
+
+        self.slots = setting(slots, "SCORING_SLOTS", usable_cores())
+        self.lanes: Dict[str, Lane] = {
+            INTERACTIVE: Lane(
+                INTERACTIVE,
+                setting(interactive_concurrency, "INTERACTIVE_CONCURRENCY", self.slots),
+                setting(interactive_queue, "INTERACTIVE_QUEUE_DEPTH", 256)
+            ),
+            BULK: Lane(
+                BULK,
+                # Keep a slot free for interactive traffic when there is more than one
+                setting(bulk_concurrency, "BULK_CONCURRENCY", max(1, self.slots - 1)),
+                setting(bulk_queue, "BULK_QUEUE_DEPTH", 64)
+            ),
+        }
+        self.busy = 0
+        # Set while no slot is in use, for background work waiting for idle time
+        self.idle = threading.Event()
+        self.idle.set()
+        self._executor = ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix="scoring")
+        # Requests stopped early, and the bulk work they did not do
+        self.cancellations = {
+            "admission_timeouts": 0,
+            "deadline_exceeded": 0,
+            "client_disconnected": 0,
+            "partial_responses": 0,
+            "slices_skipped": 0,
+            "rows_skipped": 0
+        }
+
+    def lane_for_batch(self, n_rows: int) -> str:
+        """Lane for a batch of the given size."""
+        return INTERACTIVE if n_rows <= SMALL_BATCH_ROWS else BULK
+
+    def _dispatch(self):
+        """Hand free slots to waiting requests, interactive first."""
+        interactive, bulk = self.lanes[INTERACTIVE], self.lanes[BULK]
+        while self.busy < self.slots:
+            if interactive.can_start():
+                lane = interactive
+            elif bulk.can_start() and not interactive.waiting:
+                lane = bulk
+            else:
+                return
+            future = lane.waiting.popleft()
+            if future.cancelled():
+                continue
+            lane.active += 1
+            self.busy += 1
+            self.idle.clear()
+            future.set_result(None)
+
+    def _release(self, lane: Lane):
+        lane.active -= 1
+        self.busy -= 1
+        if self.busy == 0:
+            self.idle.set()
+        self._dispatch()
+
+    async def run(self, lane_name: str, fn: Callable, *args, deadline: Optional[Deadline] = None, **kwargs):
+        """
+        Run a scoring function on a scoring slot once the lane admits it.
+
+        Args:
+            lane_name: interactive or bulk
+            fn: Blocking function to run
+            *args, **kwargs: Arguments for fn
+            deadline: Give up waiting for a slot when it passes (DeadlineExceeded)
+
+        Returns:
+            The function's return value
+        """
+        lane = self.lanes[lane_name]
+        if deadline is not None and deadline.expired():
+            self.cancellations["admission_timeouts"] += 1
+            raise DeadlineExceeded(f"Request deadline of {deadline.budget_ms:g} ms passed before scoring")
+        if len(lane.waiting) >= lane.max_queue:
+            lane.rejected += 1
+            raise AdmissionRejected(f"The {lane_name} queue is full, retry later")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        lane.waiting.append(future)
+        enqueued = time.perf_counter()
+        self._dispatch()
+        try:
+            if deadline is None:
+                await future
+            else:
+                await asyncio.wait_for(asyncio.shield(future), timeout=deadline.remaining())
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if future.done() and not future.cancelled():
+                # Admitted just before the cancellation: give the slot back
+                self._release(lane)
+            else:
+                future.cancel()
+                # Leave the queue so the lane's queue depth only counts live requests
+                try:
+                    lane.waiting.remove(future)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self.cancellations["admission_timeouts"] += 1
+                raise DeadlineExceeded(
+                    f"Request deadline of {deadline.budget_ms:g} ms passed while waiting for a {lane_name} scoring slot"
+                )
+            raise
+
+        started = time.perf_counter()
+        lane.wait.record((started - enqueued) * 1000)
+        lane.admitted += 1
+
+        def finished():
+            lane.service.record((time.perf_counter() - started) * 1000)
+            self._release(lane)
+
+        # The slot is released when the scoring thread is done, not when the
+        # awaiting request is: a cancelled request cannot stop a running function
+        work = self._executor.submit(partial(fn, *args, **kwargs))
+        work.add_done_callback(lambda _: loop.call_soon_threadsafe(finished))
+        return await asyncio.wrap_future(work, loop=loop)
+
+    def record_cancellation(self, reason: str, slices_skipped: int, rows_skipped: int, partial: bool = False):
+        """
+        Count a sliced batch stopped before its last slice.
+
+        Args:
+            reason: deadline_exceeded or client_disconnected
+            slices_skipped: Slices not scored
+            rows_skipped: Rows not scored
+            partial: Whether the rows scored so far were returned
+        """
+        self.cancellations[reason] += 1
+        self.cancellations["slices_skipped"] += slices_skipped
+        self.cancellations["rows_skipped"] += rows_skipped
+        self.cancellations["partial_responses"] += partial
+
+    def stats(self) -> dict:
+        """Per-lane admission metrics."""
+        return {
+            "slots": self.slots,
+            "busy": self.busy,
+            "bulk_slice_rows": BULK_SLICE_ROWS,
+            "small_batch_rows": SMALL_BATCH_ROWS,
+            "lanes": {name: lane.to_dict() for name, lane in self.lanes.items()},
+            "cancellations": dict(self.cancellations)
+        }
+
+
+# Global admission controller instance
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get or create the global admission controller instance."""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
@@ -0,0 +1,97 @@
+"""
+Benchmark the JSON batch path against the columnar (JSON/MessagePack/Arrow) path.
+
+Both paths are timed in-process, end to end: decode the request body,
+validate, score, and encode the response. HTTP transport is excluded so the
+numbers isolate the CPU cost of each format.
+
+Run from the project directory:
+    python api/bench_columnar.py --rows 1000 10000 100000 --model-version v1_lr
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pydantic import TypeAdapter
+
+from api.models import CustomerInput, PredictionResult
+from api.services import get_model_service
+from api.synthetic import generate_customers
+from api.codecs import (
+    MEDIA_JSON,
+    MEDIA_ARROW,
+    MEDIA_MSGPACK,
+    decode_columnar,
+    encode_columnar,
+    encode_frame,
+    validate_frame,
+    pa,
+    msgpack
+)
+
+
+def bench_json_rows(body: bytes, model_service) -> bytes:
+    """Same work as /predict/batch/simple: per-row Pydantic models and dicts."""
+    customers = TypeAdapter(List[CustomerInput]).validate_json(body)
+    customers_data = [customer.model_dump(by_alias=True) for customer in customers]
+    predictions, probabilities = model_service.predict_arrays(customers_data)
+    results = [
+        PredictionResult.create(pred, prob)
+        for pred, prob in zip(predictions.tolist(), probabilities.tolist())
+    ]
+    return TypeAdapter(List[PredictionResult]).dump_json(results)
+
+
+def bench_columnar(body: bytes, media_type: str, model_service) -> bytes:
+    """Same work as /predict/batch/columnar."""
+    df = validate_frame(decode_columnar(body, media_type))
+    predictions, probabilities = model_service.predict_frame(df)
+    return encode_columnar(predictions, probabilities, media_type)
+
+
+def timed(fn, *args, repeat: int = 3) -> float:
+    """Best wall time over a few runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--model-version", default="v1_lr")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    model_service = get_model_service(model_version=args.model_version)
+
+    formats = [MEDIA_JSON]
+    if msgpack is not None:
+        formats.append(MEDIA_MSGPACK)
+    if pa is not None:
+        formats.append(MEDIA_ARROW)
+
+    print(f"model={args.model_version}  (best of {args.repeat}, ms)")
+    print(f"{'rows':>8} {'json rows':>12} " + " ".join(f"{m.split('/')[-1]:>28}" for m in formats))
+    for n_rows in args.rows:
+        df = generate_customers(n_rows)
+        row_body = df.to_json(orient="records").encode()
+        baseline = timed(bench_json_rows, row_body, model_service, repeat=args.repeat)
+        cells = []
+        for media_type in formats:
+            body = encode_frame(df, media_type)
+            elapsed = timed(bench_columnar, body, media_type, model_service, repeat=args.repeat)
+            cells.append(f"{elapsed:10.1f} ({baseline / elapsed:4.1f}x, {len(body) / 1e6:5.1f} MB)")
+        print(f"{n_rows:>8} {baseline:12.1f} " + " ".join(f"{c:>28}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
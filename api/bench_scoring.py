@@ -0,0 +1,87 @@
+"""
+Benchmark time and memory allocated per batch by the two scoring paths.
+
+* sklearn: row-wise DataFrame, reindexed copy, the pipeline's
+  ColumnTransformer and a list of (prediction, probability) tuples, as
+  predict_batch used to do.
+* compiled: column-wise frame, preprocessing replayed into the reusable
+  feature buffers of api/fastpath.py, and NumPy result arrays.
+
+Allocations are measured with tracemalloc (peak traced memory during one
+batch), after a warm-up batch has sized the buffers. Drift monitoring is
+excluded from both paths.
+
+Run from the project directory:
+    python api/bench_scoring.py --rows 100 1000 10000 --model-version v1_lr v3_gb
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.fastpath import records_to_frame
+from api.models import EXPECTED_COLUMNS, NUMERIC_COLUMNS
+from api.services import get_model_service
+from api.synthetic import generate_customers
+
+
+def sklearn_path(records, model_service):
+    df = pd.DataFrame(records).reindex(columns=EXPECTED_COLUMNS)
+    proba = model_service.model.predict_proba(df)
+    predictions = model_service.model.classes_[np.argmax(proba, axis=1)]
+    return [(int(pred), float(prob)) for pred, prob in zip(predictions, proba[:, 1])]
+
+
+def compiled_path(records, model_service):
+    df = records_to_frame(records, EXPECTED_COLUMNS, NUMERIC_COLUMNS)
+    return model_service.compiled.score(df)
+
+
+def measure(fn, *args, repeat: int = 3):
+    """Best wall time (ms), then peak traced memory (MB) of one run."""
+    fn(*args)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--model-version", nargs="+", default=["v1_lr", "v3_gb"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"(best of {args.repeat} ms, peak MB of one batch)")
+    print(f"{'model':>8} {'rows':>8} {'sklearn':>18} {'compiled':>18}")
+    for model_version in args.model_version:
+        model_service = get_model_service(model_version=model_version)
+        if model_service.compiled is None:
+            print(f"{model_version:>8} pipeline not compiled, skipped")
+            continue
+        for n_rows in args.rows:
+            records = generate_customers(n_rows).to_dict("records")
+            cells = [
+                "{:8.1f} {:7.2f}".format(*measure(fn, records, model_service, repeat=args.repeat))
+                for fn in (sklearn_path, compiled_path)
+            ]
+            print(f"{model_version:>8} {n_rows:>8} {cells[0]:>18} {cells[1]:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Columnar request/response codecs for high-volume batch scoring.
+
+Batches are exchanged column-wise (one array per feature) so they can be
+scored as a DataFrame directly, without building a dict or a Pydantic model
+per row. Supported formats:
+
+* JSON:        {"Gender": [...], "Tenure Months": [...], ...}
+* MessagePack: the same mapping, packed with msgpack
+* Arrow IPC:   a record batch stream with one column per feature
+
+pyarrow and msgpack are optional; a format whose library is missing is
+rejected with 415 Unsupported Media Type.
+"""
+import io
+import json
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .models import CATEGORICAL_DOMAINS, EXPECTED_COLUMNS, NUMERIC_COLUMNS
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+MEDIA_JSON = "application/json"
+MEDIA_ARROW = "application/vnd.apache.arrow.stream"
+MEDIA_MSGPACK = "application/msgpack"
+
+# Accepted spellings for each format
+_MEDIA_ALIASES = {
+    "application/json": MEDIA_JSON,
+    "application/vnd.apache.arrow.stream": MEDIA_ARROW,
+    "application/x-arrow": MEDIA_ARROW,
+    "application/msgpack": MEDIA_MSGPACK,
+    "application/x-msgpack": MEDIA_MSGPACK,
+    "application/vnd.msgpack": MEDIA_MSGPACK,
+}
+
+# Nullable numeric inputs (same as the Optional fields of CustomerInput)
+NULLABLE_COLUMNS = {"Total Charges"}
+
+
+class UnsupportedMediaType(Exception):
+    """Raised when a payload format is unknown or its library is not installed."""
+
+
+def _normalize_media_type(media_type: Optional[str]) -> Optional[str]:
+    if not media_type:
+        return None
+    return _MEDIA_ALIASES.get(media_type.split(";")[0].strip().lower())
+
+
+def _require(media_type: str):
+    if media_type == MEDIA_ARROW and pa is None:
+        raise UnsupportedMediaType("Arrow payloads require pyarrow to be installed")
+    if media_type == MEDIA_MSGPACK and msgpack is None:
+        raise UnsupportedMediaType("MessagePack payloads require msgpack to be installed")
+
+
+def negotiate_media_type(accept: Optional[str], content_type: Optional[str]) -> str:
+    """
+    Pick the response format.
+
+    Args:
+        accept: Value of the Accept header
+        content_type: Media type of the request body (used when Accept is absent or */*)
+
+    Returns:
+        Media type of the response
+    """
+    if accept:
+        for item in accept.split(","):
+            media_type = _normalize_media_type(item)
+            if media_type is not None:
+                _require(media_type)
+                return media_type
+    return _normalize_media_type(content_type) or MEDIA_JSON
+
+
+def decode_columnar(body: bytes, content_type: Optional[str]) -> pd.DataFrame:
+    """
+    Decode a columnar batch into a DataFrame.
+
+    Args:
+        body: Raw request body
+        content_type: Value of the Content-Type header (defaults to JSON)
+
+    Returns:
+        DataFrame with one column per feature
+    """
+    media_type = _normalize_media_type(content_type or MEDIA_JSON)
+    if media_type is None:
+        raise UnsupportedMediaType(f"Unsupported content type: {content_type}")
+    _require(media_type)
+
+    try:
+        if media_type == MEDIA_ARROW:
+            reader = pa.ipc.open_stream(pa.py_buffer(body))
+            return reader.read_all().to_pandas()
+        if media_type == MEDIA_MSGPACK:
+            columns = msgpack.unpackb(body, raw=False)
+        else:
+            columns = json.loads(body)
+    except Exception as e:
+        raise ValueError(f"Could not decode {media_type} payload: {str(e)}")
+
+    if not isinstance(columns, dict):
+        raise ValueError("Columnar payload must be a mapping of column name to values")
+    return pd.DataFrame(columns)
+
+
+def validate_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Validate a columnar batch with the same rules as CustomerInput, column-wise.
+
+    Args:
+        df: Decoded batch
+
+    Returns:
+        DataFrame restricted to the expected columns, numerics as float
+    """
+    missing_cols = set(EXPECTED_COLUMNS) - set(df.columns)
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+    if len(df) == 0:
+        raise ValueError("Batch is empty")
+
+    df = df[EXPECTED_COLUMNS].copy()
+
+    for col, domain in CATEGORICAL_DOMAINS.items():
+        invalid = ~df[col].isin(domain)
+        if invalid.any():
+            row = int(np.argmax(invalid.to_numpy()))
+            raise ValueError(
+                f"Invalid value {df[col].iloc[row]!r} for {col} at row {row}. "
+                f"Allowed: {domain}"
+            )
+
+    for col in NUMERIC_COLUMNS:
+        values = pd.to_numeric(df[col], errors="coerce").astype(float)
+        bad = values.isna() & df[col].notna()
+        if col not in NULLABLE_COLUMNS:
+            bad |= values.isna()
+        bad |= values < 0
+        if bad.any():
+            row = int(np.argmax(bad.to_numpy()))
+            raise ValueError(
+                f"Invalid value {df[col].iloc[row]!r} for {col} at row {row}. "
+                f"Expected a non-negative number"
+            )
+        df[col] = values
+
+    return df
+
+
+def encode_columnar(predictions: np.ndarray, probabilities: np.ndarray, media_type: str) -> bytes:
+    """
+    Encode prediction arrays in the negotiated format.
+
+    Args:
+        predictions: Predicted classes (0/1)
+        probabilities: Churn probabilities
+        media_type: Response media type
+
+    Returns:
+        Encoded response body with columns churn_prediction and churn_probability
+    """
+    predictions = np.asarray(predictions, dtype=np.int8)
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+
+    if media_type == MEDIA_ARROW:
+        batch = pa.record_batch(
+            [pa.array(predictions), pa.array(probabilities)],
+            names=["churn_prediction", "churn_probability"]
+        )
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue()
+
+    columns = {
+        "churn_prediction": predictions.tolist(),
+        "churn_probability": probabilities.tolist()
+    }
+    if media_type == MEDIA_MSGPACK:
+        return msgpack.packb(columns, use_bin_type=True)
+    return json.dumps(columns).encode()
+
+
+def encode_frame(df: pd.DataFrame, media_type: str) -> bytes:
+    """
+    Encode a batch the way a client sends it to the columnar endpoint.
+
+    Args:
+        df: Batch with one column per feature
+        media_type: Request media type
+
+    Returns:
+        Encoded request body
+    """
+    _require(media_type)
+    if media_type == MEDIA_ARROW:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+    columns = {col: df[col].tolist() for col in df.columns}
+    if media_type == MEDIA_MSGPACK:
+        return msgpack.packb(columns, use_bin_type=True)
+    return json.dumps(columns).encode()
+
+
+def decode_predictions(body: bytes, media_type: str):
+    """
+    Decode a columnar endpoint response (the inverse of encode_columnar).
+
+    Returns:
+        Tuple of (predictions, probabilities) arrays
+    """
+    if media_type == MEDIA_ARROW:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+        columns = {name: table.column(name).to_numpy() for name in table.column_names}
+    elif media_type == MEDIA_MSGPACK:
+        columns = msgpack.unpackb(body, raw=False)
+    else:
+        columns = json.loads(body)
+    return (
+        np.asarray(columns["churn_prediction"], dtype=int),
+        np.asarray(columns["churn_probability"], dtype=np.float64)
+    )
@@ -0,0 +1,310 @@
+"""
+Coordinator mode: fan large batches out to several API instances.
+
+When COORDINATOR_BACKENDS lists other instances of this API (e.g. the
+separate-services containers of docker-compose.yml, or local instances on
+different ports), large columnar batches are split into shards that are
+scored concurrently by the backends through their /predict/batch/columnar
+endpoint, and the results are reassembled in the original row order.
+
+* Connections: each backend has a pool of keep-alive HTTP connections, so
+  shards do not pay a TCP handshake each. At most COORDINATOR_CONNECTIONS
+  requests are in flight per backend.
+* Failures: a shard whose backend is unreachable, times out or answers 5xx
+  (including 503 from admission control) is retried on the next backend. A
+  failing backend is tried last for a short cooldown. Client errors (4xx)
+  are not retried, since every backend would reject the shard the same way.
+* Loops: shards carry the X-Coordinator-Shard header, and an instance never
+  fans out a request carrying it, even if it is a coordinator itself.
+
+Shards travel as Arrow IPC when pyarrow is installed, then MessagePack, then
+JSON.
+"""
+import http.client
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .admission import LatencyStats
+from .codecs import (
+    MEDIA_ARROW,
+    MEDIA_JSON,
+    MEDIA_MSGPACK,
+    decode_predictions,
+    encode_frame,
+    msgpack,
+    pa
+)
+
+logger = logging.getLogger(__name__)
+
+# Header marking a request sent by a coordinator
+SHARD_HEADER = "X-Coordinator-Shard"
+COLUMNAR_PATH = "/predict/batch/columnar"
+# Seconds a backend that just failed is tried after the healthy ones
+BACKEND_COOLDOWN_S = 5.0
+
+SHARD_MEDIA_TYPE = MEDIA_ARROW if pa is not None else MEDIA_MSGPACK if msgpack is not None else MEDIA_JSON
+
+
+class BackendsUnavailable(Exception):
+    """Raised when a shard could not be scored by any backend."""
+
+
+class Backend:
+    """One API instance, with a pool of keep-alive connections."""
+
+    def __init__(self, url: str, max_connections: int, timeout: float):
+        """
+        Initialize the backend.
+
+        Args:
+            url: Base URL of the instance (e.g. http://127.0.0.1:8001)
+            max_connections: Maximum concurrent requests (and pooled connections)
+            timeout: Socket timeout in seconds
+        """
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Invalid backend URL: {url}")
+        self.url = f"{parts.scheme}://{parts.netloc}"
+        self.base_path = parts.path.rstrip("/")
+        self._connection_class = (
+            http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        )
+        self._host = parts.hostname
+        self._port = parts.port
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self.max_connections = max_connections
+        self.connections_opened = 0
+        self.shards = 0
+        self.rows = 0
+        self.failures = 0
+        self.failed_at = 0.0
+        self.latency = LatencyStats()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self.connections_opened += 1
+        return self._connection_class(self._host, self._port, timeout=self.timeout)
+
+    def post(self, path: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, bytes]:
+        """
+        POST on a pooled connection.
+
+        A pooled connection the server has closed in the meantime is replaced
+        by a new one once; other connection errors are raised.
+
+        Returns:
+            Tuple of (status code, response body)
+        """
+        with self._slots:
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._connect(), False
+            while True:
+                try:
+                    conn.request("POST", self.base_path + path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                    break
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    conn.close()
+                    if not reused:
+                        raise
+                    conn, reused = self._connect(), False
+                except Exception:
+                    conn.close()
+                    raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return response.status, data
+
+    def cooling_down(self) -> bool:
+        return time.monotonic() - self.failed_at < BACKEND_COOLDOWN_S
+
+    def record_success(self, rows: int, ms: float):
+        with self._lock:
+            self.shards += 1
+            self.rows += rows
+            self.latency.record(ms)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.failed_at = time.monotonic()
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url + self.base_path,
+            "cooling_down": self.cooling_down(),
+            "max_connections": self.max_connections,
+            "connections_opened": self.connections_opened,
+            "idle_connections": self._idle.qsize(),
+            "shards": self.shards,
+            "rows": self.rows,
+            "failures": self.failures,
+            "latency": self.latency.to_dict()
+        }
+
+
+class Coordinator:
+    """Splits batches into shards and scores them on the backends."""
+
+    def __init__(
+        self,
+        backends: Optional[List[str]] = None,
+        shard_rows: Optional[int] = None,
+        min_rows: Optional[int] = None,
+        connections: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        """
+        Initialize the coordinator. Unset arguments fall back to environment variables.
+
+        Args:
+            backends: Backend base URLs (COORDINATOR_BACKENDS, comma-separated; empty disables fan-out)
+            shard_rows: Rows per shard (COORDINATOR_SHARD_ROWS, default 5000)
+            min_rows: Smallest batch that is fanned out (COORDINATOR_MIN_ROWS, default: shard_rows)
+            connections: Concurrent requests per backend (COORDINATOR_CONNECTIONS, default 4)
+            timeout: Per-request timeout in seconds (COORDINATOR_TIMEOUT, default 60)
+        """
+        if backends is None:
+            backends = [url.strip() for url in os.getenv("COORDINATOR_BACKENDS", "").split(",") if url.strip()]
+        self.shard_rows = shard_rows or int(os.getenv("COORDINATOR_SHARD_ROWS", "5000"))
+        self.min_rows = min_rows or int(os.getenv("COORDINATOR_MIN_ROWS", str(self.shard_rows)))
+        connections = connections or int(os.getenv("COORDINATOR_CONNECTIONS", "4"))
+        timeout = timeout or float(os.getenv("COORDINATOR_TIMEOUT", "60"))
+        if self.shard_rows < 1 or connections < 1:
+            raise ValueError("Shard size and connections per backend must be positive")
+
+        self.backends = [Backend(url, connections, timeout) for url in backends]
+        self.batches = 0
+        self.shards = 0
+        self.retried_shards = 0
+        self.failed_batches = 0
+        self._lock = threading.Lock()
+        self._executor = (
+            ThreadPoolExecutor(max_workers=len(self.backends) * connections, thread_name_prefix="coordinator")
+            if self.backends else None
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.backends)
+
+    def should_fan_out(self, n_rows: int) -> bool:
+        """Whether a batch of this size is sharded across the backends."""
+        return self.enabled and n_rows >= self.min_rows
+
+    def _candidates(self, shard_index: int) -> List[Backend]:
+        """Backends to try for a shard: healthy ones round-robin, cooling-down ones last."""
+        healthy = [backend for backend in self.backends if not backend.cooling_down()]
+        cooling = [backend for backend in self.backends if backend.cooling_down()]
+        start = shard_index % len(healthy) if healthy else 0
+        return healthy[start:] + healthy[:start] + cooling
+
+    def _score_shard(
+        self, shard_index: int, shard: pd.DataFrame, model_version: str
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        body = encode_frame(shard, SHARD_MEDIA_TYPE)
+        headers = {
+            "Content-Type": SHARD_MEDIA_TYPE,
+            "Accept": SHARD_MEDIA_TYPE,
+            SHARD_HEADER: str(shard_index)
+        }
+        path = f"{COLUMNAR_PATH}?model_version={quote(model_version)}"
+        errors = []
+        for attempt, backend in enumerate(self._candidates(shard_index)):
+            start = time.perf_counter()
+            try:
+                status_code, data = backend.post(path, body, headers)
+            except (OSError, http.client.HTTPException) as e:
+                status_code, data = None, str(e).encode()
+
+            if status_code == 200:
+                backend.record_success(len(shard), (time.perf_counter() - start) * 1000)
+                if attempt:
+                    with self._lock:
+                        self.retried_shards += 1
+                return decode_predictions(data, SHARD_MEDIA_TYPE)
+            if status_code is not None and 400 <= status_code < 500:
+                raise ValueError(f"Shard {shard_index} rejected by {backend.url}: {data[:500].decode(errors='replace')}")
+
+            backend.record_failure()
+            errors.append(f"{backend.url}: {status_code or data.decode(errors='replace')}")
+            logger.warning(f"Shard {shard_index} failed on {backend.url} ({errors[-1]}), retrying elsewhere")
+
+        raise BackendsUnavailable(f"Shard {shard_index} failed on every backend: {'; '.join(errors)}")
+
+    def score_frame(self, df: pd.DataFrame, model_version: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score a validated batch on the backends.
+
+        Args:
+            df: Batch with the expected feature columns
+            model_version: Model version to score with
+
+        Returns:
+            Tuple of (predictions, probabilities) arrays in the order of df
+        """
+        if not self.enabled:
+            raise RuntimeError("No coordinator backends configured")
+        futures = [
+            self._executor.submit(self._score_shard, index, df.iloc[start:start + self.shard_rows], model_version)
+            for index, start in enumerate(range(0, len(df), self.shard_rows))
+        ]
+        with self._lock:
+            self.batches += 1
+            self.shards += len(futures)
+        try:
+            results = [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            with self._lock:
+                self.failed_batches += 1
+            raise
+        return (
+            np.concatenate([predictions for predictions, _ in results]),
+            np.concatenate([probabilities for _, probabilities in results])
+        )
+
+    def stats(self) -> dict:
+        """Fan-out counters and per-backend metrics."""
+        return {
+            "enabled": self.enabled,
+            "shard_rows": self.shard_rows,
+            "min_rows": self.min_rows,
+            "shard_media_type": SHARD_MEDIA_TYPE,
+            "batches": self.batches,
+            "shards": self.shards,
+            "retried_shards": self.retried_shards,
+            "failed_batches": self.failed_batches,
+            "backends": [backend.to_dict() for backend in self.backends]
+        }
+
+
+# Global coordinator instance
+_coordinator: Optional[Coordinator] = None
+
+
+def get_coordinator() -> Coordinator:
+    """Get or create the global coordinator instance."""
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = Coordinator()
+    return _coordinator
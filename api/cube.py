@@ -0,0 +1,294 @@
+"""
+Churn analytics cube over the scored population in the score store.
+
+For each model version, the customers with a current score are aggregated
+once into a base cuboid: one cell per combination of the 16 categorical
+values that occurs in the population, holding the number of customers, the
+predicted churners, the sum of churn probabilities and, per numeric column,
+the sum and number of non-missing values. A query keeps the cells matching
+its filters (slice) and sums them by the requested columns (roll-up), so
+breakdowns such as churn by contract and internet service, or mean charges
+per payment method, are computed from the cells instead of the customers.
+
+A rescoring run updates the cube in place: the rows of the customers it
+rescored are retracted and their new rows added. If the scores changed in
+another way (another process rescored, or the cube missed a run), the cube
+is rebuilt from the store on the next query.
+"""
+import threading
+import time
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .models import CATEGORICAL_COLUMNS, CATEGORICAL_DOMAINS, NUMERIC_COLUMNS
+from .scores import ScoreStore, get_score_store
+from .services import get_model_manager
+
+logger = logging.getLogger(__name__)
+
+# Value of a categorical column that is missing or outside its domain
+MISSING_VALUE = "(missing)"
+
+
+class ChurnCube:
+    """Aggregates of one model version's scored customers by categorical values."""
+
+    def __init__(self, model_version: str, run_id: int = 0):
+        """
+        Create an empty cube.
+
+        Args:
+            model_version: Model version the scores belong to
+            run_id: Rescoring run the aggregates are current as of
+        """
+        self.model_version = model_version
+        self.run_id = run_id
+        self.domains = {col: list(CATEGORICAL_DOMAINS[col]) + [MISSING_VALUE] for col in CATEGORICAL_COLUMNS}
+        sizes = np.array([len(domain) for domain in self.domains.values()], dtype=np.int64)
+        # Mixed-radix weights turning a row of codes into a cell key
+        self._weights = np.concatenate([[1], np.cumprod(sizes[:-1])]).astype(np.int64)
+        self._positions: Dict[int, int] = {}
+        self.codes = np.empty((0, len(CATEGORICAL_COLUMNS)), dtype=np.int8)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.churners = np.empty(0, dtype=np.int64)
+        self.probability_sums = np.empty(0, dtype=np.float64)
+        self.numeric_sums = np.empty((0, len(NUMERIC_COLUMNS)), dtype=np.float64)
+        self.numeric_counts = np.empty((0, len(NUMERIC_COLUMNS)), dtype=np.int64)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_population(cls, population: pd.DataFrame, model_version: str, run_id: int = 0) -> "ChurnCube":
+        """
+        Build a cube from scored customers.
+
+        Args:
+            population: Scored customers (see ScoreStore.load_scored)
+            model_version: Model version the scores belong to
+            run_id: Rescoring run the scores are current as of
+        """
+        cube = cls(model_version, run_id)
+        cube.add(population)
+        return cube
+
+    @property
+    def size(self) -> int:
+        """Number of customers aggregated."""
+        return int(self.counts.sum())
+
+    @property
+    def n_cells(self) -> int:
+        """Number of non-empty cells."""
+        return int(np.count_nonzero(self.counts))
+
+    def add(self, rows: pd.DataFrame):
+        """Add scored customers (churn_prediction, churn_probability and feature columns)."""
+        self._update(rows, 1)
+
+    def retract(self, rows: pd.DataFrame):
+        """Remove customers previously added with the same values."""
+        self._update(rows, -1)
+
+    def _encode(self, rows: pd.DataFrame) -> np.ndarray:
+        codes = np.empty((len(rows), len(self.domains)), dtype=np.int8)
+        for i, (col, domain) in enumerate(self.domains.items()):
+            column = pd.Categorical(rows[col], categories=domain[:-1]).codes
+            codes[:, i] = np.where(column < 0, len(domain) - 1, column)
+        return codes
+
+    def _cells(self, keys: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Positions of the cells of some keys, creating the missing cells."""
+        positions = np.array([self._positions.get(key, -1) for key in keys.tolist()], dtype=np.int64)
+        new = np.flatnonzero(positions < 0)
+        if len(new):
+            start = len(self.counts)
+            positions[new] = np.arange(start, start + len(new))
+            self._positions.update(zip(keys[new].tolist(), positions[new].tolist()))
+            self.codes = np.concatenate([self.codes, codes[new]])
+            self.counts = np.concatenate([self.counts, np.zeros(len(new), dtype=np.int64)])
+            self.churners = np.concatenate([self.churners, np.zeros(len(new), dtype=np.int64)])
+            self.probability_sums = np.concatenate([self.probability_sums, np.zeros(len(new))])
+            self.numeric_sums = np.concatenate([self.numeric_sums, np.zeros((len(new), len(NUMERIC_COLUMNS)))])
+            self.numeric_counts = np.concatenate(
+                [self.numeric_counts, np.zeros((len(new), len(NUMERIC_COLUMNS)), dtype=np.int64)]
+            )
+        return positions
+
+    def _update(self, rows: pd.DataFrame, sign: int):
+        if rows.empty:
+            return
+        codes = self._encode(rows)
+        keys, first, inverse = np.unique(codes @ self._weights, return_index=True, return_inverse=True)
+        n_keys = len(keys)
+        counts = np.bincount(inverse, minlength=n_keys)
+        churners = np.bincount(inverse, weights=rows["churn_prediction"].to_numpy(dtype=np.float64), minlength=n_keys)
+        probabilities = np.bincount(
+            inverse, weights=rows["churn_probability"].to_numpy(dtype=np.float64), minlength=n_keys
+        )
+        numerics = rows[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+        present = ~np.isnan(numerics)
+        numeric_sums = np.column_stack([
+            np.bincount(inverse, weights=np.where(present[:, j], numerics[:, j], 0.0), minlength=n_keys)
+            for j in range(len(NUMERIC_COLUMNS))
+        ])
+        numeric_counts = np.column_stack([
+            np.bincount(inverse, weights=present[:, j], minlength=n_keys) for j in range(len(NUMERIC_COLUMNS))
+        ])
+
+        with self._lock:
+            positions = self._cells(keys, codes[first])
+            self.counts[positions] += sign * counts
+            self.churners[positions] += sign * np.rint(churners).astype(np.int64)
+            self.probability_sums[positions] += sign * probabilities
+            self.numeric_sums[positions] += sign * numeric_sums
+            self.numeric_counts[positions] += sign * np.rint(numeric_counts).astype(np.int64)
+            # Do not leave rounding residue in cells that emptied
+            emptied = positions[self.counts[positions] <= 0]
+            self.probability_sums[emptied] = 0.0
+            self.numeric_sums[emptied] = 0.0
+
+    def query(self, group_by: Optional[List[str]] = None, filters: Optional[Dict[str, List[str]]] = None) -> dict:
+        """
+        Aggregates of the customers matching the filters, by the group-by columns.
+
+        Args:
+            group_by: Categorical columns to break down by (none: one total row)
+            filters: Allowed values per categorical column
+
+        Returns:
+            Dict with the number of customers matched and one row per group
+            (largest groups first) with its values, customers, share of the
+            matched customers, predicted churners, churn rates and numeric means
+        """
+        columns = list(self.domains)
+        group_by = list(group_by or [])
+        for col in list(group_by) + list(filters or {}):
+            if col not in self.domains:
+                raise ValueError(f"Unknown column {col!r}. Allowed: {columns}")
+
+        with self._lock:
+            mask = self.counts > 0
+            for col, values in (filters or {}).items():
+                invalid = set(values) - set(self.domains[col])
+                if invalid:
+                    raise ValueError(f"Invalid values {sorted(invalid)} for {col}. Allowed: {self.domains[col]}")
+                allowed = [self.domains[col].index(value) for value in values]
+                mask &= np.isin(self.codes[:, columns.index(col)], allowed)
+            cells = np.flatnonzero(mask)
+            codes = self.codes[cells]
+            counts = self.counts[cells]
+            churners = self.churners[cells]
+            probability_sums = self.probability_sums[cells]
+            numeric_sums = self.numeric_sums[cells]
+            numeric_counts = self.numeric_counts[cells]
+
+        if group_by:
+            group_codes = codes[:, [columns.index(col) for col in group_by]].astype(np.int64)
+            weights = np.cumprod([1] + [len(self.domains[col]) for col in group_by[:-1]]).astype(np.int64)
+            group_keys, first, inverse = np.unique(group_codes @ weights, return_index=True, return_inverse=True)
+        else:
+            group_codes = np.zeros((len(cells), 0), dtype=np.int64)
+            group_keys, first, inverse = np.zeros(1), np.zeros(1, dtype=np.int64), np.zeros(len(cells), dtype=np.int64)
+        n_groups = len(group_keys) if len(cells) else 0
+
+        totals = np.bincount(inverse, weights=counts, minlength=n_groups)
+        group_churners = np.bincount(inverse, weights=churners, minlength=n_groups)
+        group_probabilities = np.bincount(inverse, weights=probability_sums, minlength=n_groups)
+        group_sums = [np.bincount(inverse, weights=numeric_sums[:, j], minlength=n_groups) for j in range(len(NUMERIC_COLUMNS))]
+        group_counts = [np.bincount(inverse, weights=numeric_counts[:, j], minlength=n_groups) for j in range(len(NUMERIC_COLUMNS))]
+        matched = int(counts.sum())
+
+        rows = []
+        for g in np.argsort(-totals, kind="stable"):
+            customers = int(totals[g])
+            if customers == 0:
+                continue
+            rows.append({
+                "values": {col: self.domains[col][group_codes[first[g], i]] for i, col in enumerate(group_by)},
+                "customers": customers,
+                "share": round(customers / matched, 6),
+                "predicted_churners": int(group_churners[g]),
+                "predicted_churn_rate": round(float(group_churners[g]) / customers, 6),
+                "mean_churn_probability": round(float(group_probabilities[g]) / customers, 6),
+                "numeric_means": {
+                    col: round(float(group_sums[j][g] / group_counts[j][g]), 4) if group_counts[j][g] else None
+                    for j, col in enumerate(NUMERIC_COLUMNS)
+                }
+            })
+        return {
+            "model_version": self.model_version,
+            "run_id": self.run_id,
+            "population": self.size,
+            "matched": matched,
+            "cells_scanned": len(cells),
+            "rows": rows
+        }
+
+
+# Cubes built so far, keyed by model version
+_cubes: Dict[str, ChurnCube] = {}
+_cubes_lock = threading.Lock()
+
+
+def get_churn_cube(model_version: str, store: Optional[ScoreStore] = None) -> ChurnCube:
+    """
+    Get the cube of a model version's scored population, rebuilding it if the scores changed.
+
+    Raises:
+        ValueError: If the model version is not available
+    """
+    available = get_model_manager().available_models
+    if model_version not in available:
+        raise ValueError(f"Unknown model version: {model_version}. Available: {list(available)}")
+    store = store or get_score_store()
+    run_id = store.latest_run_id()
+    with _cubes_lock:
+        cube = _cubes.get(model_version)
+        if cube is None or cube.run_id != run_id:
+            start = time.perf_counter()
+            cube = ChurnCube.from_population(store.load_scored(model_version), model_version, run_id)
+            _cubes[model_version] = cube
+            logger.info(
+                f"Churn cube for {model_version} built: {cube.size} customers in {cube.n_cells} cells "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+    return cube
+
+
+def cube_run_id(model_version: str) -> Optional[int]:
+    """Run id the cached cube of a model version is current as of (None if not built)."""
+    with _cubes_lock:
+        cube = _cubes.get(model_version)
+        return cube.run_id if cube is not None else None
+
+
+def apply_rescore(
+    model_version: str,
+    base_run_id: int,
+    run_id: int,
+    retracted: pd.DataFrame,
+    added: pd.DataFrame
+):
+    """
+    Update a cached cube with the customers a rescoring run rescored.
+
+    Args:
+        model_version: Model version rescored
+        base_run_id: Latest run id when the rescoring run started
+        run_id: Id of the rescoring run
+        retracted: The customers' previous current scored rows
+        added: The customers' new scored rows
+    """
+    with _cubes_lock:
+        cube = _cubes.get(model_version)
+        if cube is None:
+            return
+        if cube.run_id != base_run_id or run_id != base_run_id + 1:
+            # Some other change to the scores is not in the cube: rebuild on the next query
+            del _cubes[model_version]
+            return
+        cube.retract(retracted)
+        cube.add(added)
+        cube.run_id = run_id
@@ -0,0 +1,316 @@
+"""
+Distillation of a teacher model into a low-latency student.
+
+The student (by default of v3_gb, saved as churn_model_v3_gb_student.pkl and
+served as version v3_gb_student) is a small ensemble of shallow gradient
+boosted trees fitted to the teacher's churn probabilities rather than to the
+0/1 labels. It is trained on the teacher's own training rows (the split of
+notebooks/03_modeling.ipynb) plus synthetic customers drawn from the input
+domains in api/models.py, so it also follows the teacher on combinations
+that are rare in the training data. Soft targets
+are fitted by giving every row twice, as churn with weight p and as no churn
+with weight 1 - p, which makes the log loss that of the teacher's p.
+
+The student keeps the teacher's fitted preprocessing. A single gradient
+boosting predict_proba call costs about 0.2 ms of sklearn input validation
+whatever the number of trees, so the student also stores its trees as flat
+arrays and scores small batches (up to FLAT_MAX_ROWS rows) by walking all
+trees one level at a time with NumPy; larger batches go through sklearn.
+
+Fidelity to the teacher (probability differences and agreement of the
+decisions, on the teacher's test rows and held-out synthetic rows), both
+models' ROC-AUC and recall on the test rows' labels, and their latencies are
+written next to the pickle (.json) and reported by GET /models.
+
+Run from the project directory:
+    python -m api.distill --teacher v3_gb
+"""
+import argparse
+import json
+import logging
+import pickle
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from .evaluation import ClassifierEvaluation, iter_labeled_chunks
+from .services import STUDENT_SUFFIX, ModelService, get_model_manager
+from .synthetic import generate_customers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEACHER = "v3_gb"
+# Synthetic customers added to the real training rows
+SYNTHETIC_ROWS = 30000
+# Train/test split the teachers were fitted with (notebooks/03_modeling.ipynb):
+# the student only learns from the teacher's training rows and both are
+# evaluated on its test rows
+TEACHER_TEST_SHARE = 0.2
+TEACHER_SPLIT_SEED = 42
+SYNTHETIC_HOLDOUT_ROWS = 5000
+# Batches up to this size are scored by the flat trees, larger ones by sklearn
+FLAT_MAX_ROWS = 64
+# Single customers timed per model for the latency report
+LATENCY_ROWS = 200
+
+
+class TreeEnsembleStudent(BaseEstimator, ClassifierMixin):
+    """Shallow gradient boosted trees fitted to a teacher's probabilities."""
+
+    def __init__(self, n_estimators: int = 40, max_depth: int = 4, learning_rate: float = 0.2, random_state: int = 42):
+        self.n_estimators = n_estimators
+        self.max_depth = max_depth
+        self.learning_rate = learning_rate
+        self.random_state = random_state
+
+    def fit(self, X: np.ndarray, probabilities: np.ndarray) -> "TreeEnsembleStudent":
+        """
+        Fit the trees to soft targets.
+
+        Args:
+            X: Encoded features (output of the teacher's preprocessor)
+            probabilities: Teacher churn probabilities of the rows
+
+        Returns:
+            The fitted student
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        n_rows = len(probabilities)
+        self.boosting_ = GradientBoostingClassifier(
+            n_estimators=self.n_estimators,
+            max_depth=self.max_depth,
+            learning_rate=self.learning_rate,
+            random_state=self.random_state
+        ).fit(
+            np.vstack([X, X]),
+            np.r_[np.ones(n_rows, dtype=int), np.zeros(n_rows, dtype=int)],
+            sample_weight=np.r_[probabilities, 1 - probabilities]
+        )
+        self.classes_ = self.boosting_.classes_
+        self.n_features_in_ = self.boosting_.n_features_in_
+        self._flatten()
+        return self
+
+    def _flatten(self):
+        """Pad every tree to the same node count and store them as (tree, node) arrays."""
+        trees = [estimator.tree_ for estimator in self.boosting_.estimators_[:, 0]]
+        n_nodes = max(tree.node_count for tree in trees)
+        shape = (len(trees), n_nodes)
+        # Node ids are global (tree * n_nodes + node), so one flat index reaches any tree
+        starts = (np.arange(len(trees)) * n_nodes)[:, None]
+        self.features_ = np.zeros(shape, dtype=np.intp)
+        self.thresholds_ = np.full(shape, np.inf)
+        self.left_ = np.broadcast_to(starts + np.arange(n_nodes), shape).copy()
+        self.right_ = self.left_.copy()
+        self.values_ = np.zeros(shape)
+        for i, tree in enumerate(trees):
+            nodes = np.arange(tree.node_count)
+            split = tree.children_left >= 0
+            # Leaves point to themselves, so every row can take max_depth steps
+            self.features_[i, nodes[split]] = tree.feature[split]
+            self.thresholds_[i, nodes[split]] = tree.threshold[split]
+            self.left_[i, nodes[split]] = starts[i, 0] + tree.children_left[split]
+            self.right_[i, nodes[split]] = starts[i, 0] + tree.children_right[split]
+            self.values_[i, :tree.node_count] = self.learning_rate * tree.value[:, 0, 0]
+        self.depth_ = max(tree.max_depth for tree in trees)
+        self.roots_ = starts[:, 0]
+        # The initial log-odds is what the trees do not account for on any row
+        row = np.zeros((1, self.n_features_in_))
+        self.init_log_odds_ = 0.0
+        self.init_log_odds_ = float(self.boosting_.decision_function(row)[0] - self.decision_function(row)[0])
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Churn log-odds of every row."""
+        if len(X) > FLAT_MAX_ROWS:
+            return self.boosting_.decision_function(X)
+        # Same float32 comparison as the sklearn trees
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots_, (len(X), len(self.roots_)))
+        features, thresholds = self.features_.ravel(), self.thresholds_.ravel()
+        left, right = self.left_.ravel(), self.right_.ravel()
+        for _ in range(self.depth_):
+            go_left = X[rows, features[nodes]] <= thresholds[nodes]
+            nodes = np.where(go_left, left[nodes], right[nodes])
+        return self.init_log_odds_ + self.values_.ravel()[nodes].sum(axis=1)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        positive = 1 / (1 + np.exp(-self.decision_function(X)))
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
+
+
+def _load_labeled(data_path: Optional[str]):
+    if data_path is None:
+        data_path = Path(__file__).parent.parent / "data" / "Telco_customer_churn.xlsx"
+    chunks = list(iter_labeled_chunks(data_path))
+    return (
+        pd.concat([features for features, _ in chunks], ignore_index=True),
+        np.concatenate([labels for _, labels in chunks])
+    )
+
+
+def _fidelity(teacher_probabilities: np.ndarray, student_probabilities: np.ndarray,
+              teacher_predictions: np.ndarray, student_predictions: np.ndarray) -> dict:
+    differences = np.abs(student_probabilities - teacher_probabilities)
+    return {
+        "rows": len(differences),
+        "mean_abs_difference": round(float(differences.mean()), 6),
+        "p95_abs_difference": round(float(np.percentile(differences, 95)), 6),
+        "max_abs_difference": round(float(differences.max()), 6),
+        "decision_agreement": round(float(np.mean(teacher_predictions == student_predictions)), 6)
+    }
+
+
+def _label_metrics(labels: np.ndarray, predictions: np.ndarray, probabilities: np.ndarray) -> dict:
+    evaluation = ClassifierEvaluation()
+    evaluation.update(labels, predictions, probabilities)
+    report = evaluation.report(thresholds=())
+    return {
+        "roc_auc": report["roc_auc"],
+        "recall": report["model_decision"]["recall"],
+        "precision": report["model_decision"]["precision"],
+        "brier_score": report["brier_score"]
+    }
+
+
+def _latency(model_service: ModelService, records: list) -> dict:
+    """Median single-customer and 1000-row batch scoring time, in milliseconds."""
+    for record in records[:20]:
+        model_service.predict_single(record)
+    single = []
+    for record in records:
+        start = time.perf_counter()
+        model_service.predict_single(record)
+        single.append((time.perf_counter() - start) * 1000)
+    batch = generate_customers(1000, seed=1)
+    model_service.score_frame(batch)
+    start = time.perf_counter()
+    model_service.score_frame(batch)
+    return {
+        "single_row_p50_ms": round(float(np.median(single)), 4),
+        "single_row_p95_ms": round(float(np.percentile(single, 95)), 4),
+        "batch_1000_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+
+def distill(
+    teacher_version: str = DEFAULT_TEACHER,
+    data_path: Optional[str] = None,
+    output_path: Optional[str] = None,
+    synthetic_rows: int = SYNTHETIC_ROWS,
+    seed: int = 42,
+    **student_params
+) -> dict:
+    """
+    Train, evaluate and save the student of a teacher model.
+
+    Args:
+        teacher_version: Model version to distill (default v3_gb)
+        data_path: Labeled training data (default data/Telco_customer_churn.xlsx)
+        output_path: Student pickle (default models/churn_model_<teacher>_student.pkl)
+        synthetic_rows: Synthetic customers added to the training rows
+        seed: Seed of the synthetic customers
+        **student_params: TreeEnsembleStudent parameters
+
+    Returns:
+        The student's report, also saved next to the pickle as JSON
+    """
+    manager = get_model_manager()
+    teacher = manager.get_model(teacher_version)
+    student_version = f"{teacher_version}{STUDENT_SUFFIX}"
+    output_path = Path(output_path) if output_path else manager.models_dir / f"churn_model_{student_version}.pkl"
+
+    features, labels = _load_labeled(data_path)
+    _, test_rows = train_test_split(
+        np.arange(len(features)), test_size=TEACHER_TEST_SHARE, random_state=TEACHER_SPLIT_SEED, stratify=labels
+    )
+    holdout = np.zeros(len(features), dtype=bool)
+    holdout[test_rows] = True
+    train = pd.concat(
+        [features[~holdout], generate_customers(synthetic_rows, seed=seed)], ignore_index=True
+    )
+    synthetic_holdout = generate_customers(SYNTHETIC_HOLDOUT_ROWS, seed=seed + 1)
+
+    preprocessor = teacher.model[:-1]
+    start = time.perf_counter()
+    _, teacher_probabilities = teacher.score_frame(train)
+    student = TreeEnsembleStudent(**student_params).fit(preprocessor.transform(train), teacher_probabilities)
+    training_s = time.perf_counter() - start
+    pipeline = Pipeline(teacher.model.steps[:-1] + [("classifier", student)])
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "wb") as f:
+        pickle.dump(pipeline, f)
+    # Evaluate the saved pickle, as the API will load it
+    student_service = ModelService(model_path=str(output_path), model_version=student_version)
+
+    fidelity, label_metrics = {}, {}
+    for name, frame in (("real_holdout", features[holdout]), ("synthetic_holdout", synthetic_holdout)):
+        teacher_predictions, teacher_scores = teacher.score_frame(frame)
+        student_predictions, student_scores = student_service.score_frame(frame)
+        fidelity[name] = _fidelity(teacher_scores, student_scores, teacher_predictions, student_predictions)
+        if name == "real_holdout":
+            label_metrics = {
+                "teacher": _label_metrics(labels[holdout], teacher_predictions, teacher_scores),
+                "student": _label_metrics(labels[holdout], student_predictions, student_scores)
+            }
+
+    records = generate_customers(LATENCY_ROWS, seed=seed + 2).to_dict("records")
+    report = {
+        "teacher": teacher_version,
+        "student": student_version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "student_params": student.get_params(),
+        "training_rows": {"real": int((~holdout).sum()), "synthetic": synthetic_rows},
+        "training_seconds": round(training_s, 1),
+        "fidelity": fidelity,
+        "holdout_labels": label_metrics,
+        "latency": {"teacher": _latency(teacher, records), "student": _latency(student_service, records)}
+    }
+    with open(output_path.with_suffix(".json"), "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Student {student_version} saved to {output_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill a model version into a low-latency student")
+    parser.add_argument("--teacher", default=DEFAULT_TEACHER)
+    parser.add_argument("--data", help="Labeled training data (default data/Telco_customer_churn.xlsx)")
+    parser.add_argument("--output", help="Student pickle path")
+    parser.add_argument("--synthetic-rows", type=int, default=SYNTHETIC_ROWS)
+    parser.add_argument("--n-estimators", type=int, default=40)
+    parser.add_argument("--max-depth", type=int, default=4)
+    parser.add_argument("--learning-rate", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = distill(
+        args.teacher,
+        data_path=args.data,
+        output_path=args.output,
+        synthetic_rows=args.synthetic_rows,
+        seed=args.seed,
+        n_estimators=args.n_estimators,
+        max_depth=args.max_depth,
+        learning_rate=args.learning_rate
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    # Run the imported module, so the pickled student refers to api.distill rather than __main__
+    from api.distill import main
+    main()
@@ -0,0 +1,287 @@
+"""
+Streaming evaluation of model versions on labeled data.
+
+A labeled extract is read in chunks and every chunk is scored by each
+requested model version in the same pass. Per model, the churn
+probabilities are folded into two fixed-size histograms (one per true
+class) with EVALUATION_BINS equal-width bins on [0, 1], so memory does not
+grow with the number of rows. From the histograms:
+
+* the confusion matrix (and recall, precision, F1...) at any threshold that
+  is a multiple of 1 / EVALUATION_BINS, via cumulative counts;
+* ROC-AUC, as the share of (churner, non-churner) pairs ranked correctly.
+  Pairs in the same bin count as ties, so the result is within
+  `roc_auc_max_error` (reported) of the exact value.
+
+The confusion matrix at the model's own decision (as in the modeling
+notebook), the Brier score and the log loss are accumulated exactly.
+
+Run from the project directory:
+    python -m api.evaluation data/Telco_customer_churn.xlsx --model-version v1_lr v3_gb
+"""
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .codecs import validate_frame
+from .services import get_model_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LABEL_COLUMN = "Churn Value"
+# Rows read and scored at a time
+EVALUATION_CHUNK_ROWS = 50000
+# Probability histogram bins per class (threshold resolution 1 / EVALUATION_BINS)
+EVALUATION_BINS = 1000
+# Thresholds reported when none are requested
+DEFAULT_THRESHOLDS = tuple(round(t, 2) for t in np.arange(0.05, 1.0, 0.05))
+# Probabilities are clipped to [eps, 1 - eps] for the log loss
+LOG_LOSS_EPSILON = 1e-15
+
+# Accepted label spellings
+_LABEL_VALUES = {"1": 1, "0": 0, "yes": 1, "no": 0, "true": 1, "false": 0}
+
+
+def read_chunks(
+    source: Union[str, Path, BinaryIO],
+    filename: Optional[str] = None,
+    chunk_rows: int = EVALUATION_CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    Read an extract chunk by chunk, without validating it.
+
+    CSV, Parquet and JSON Lines (.jsonl/.ndjson) files are streamed; Excel
+    and plain JSON files are read at once and then sliced.
+
+    Args:
+        source: File path or binary file object
+        filename: Name used to pick the format (defaults to the path)
+        chunk_rows: Rows per chunk
+
+    Returns:
+        Iterator over the raw chunks
+    """
+    name = (filename if filename is not None else str(source)).lower()
+    try:
+        if name.endswith(".csv"):
+            return pd.read_csv(source, chunksize=chunk_rows, low_memory=False)
+        elif name.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            return (
+                batch.to_pandas()
+                for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows)
+            )
+        elif name.endswith((".jsonl", ".ndjson")):
+            return pd.read_json(source, lines=True, chunksize=chunk_rows)
+        else:
+            frame = pd.read_excel(source) if name.endswith((".xlsx", ".xls")) else pd.read_json(source)
+            return (frame.iloc[start:start + chunk_rows] for start in range(0, len(frame), chunk_rows))
+    except Exception as e:
+        raise ValueError(f"Could not read data: {str(e)}")
+
+
+def iter_labeled_chunks(
+    source: Union[str, Path, BinaryIO],
+    filename: Optional[str] = None,
+    label_column: str = DEFAULT_LABEL_COLUMN,
+    chunk_rows: int = EVALUATION_CHUNK_ROWS
+) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+    """
+    Read a labeled extract chunk by chunk (see read_chunks for the formats).
+
+    Args:
+        source: File path or binary file object
+        filename: Name used to pick the format (defaults to the path)
+        label_column: Column holding the churn label (0/1 or Yes/No)
+        chunk_rows: Rows per chunk
+
+    Yields:
+        Tuples of (validated feature DataFrame, labels as an int8 array)
+    """
+    chunks = read_chunks(source, filename, chunk_rows)
+
+    offset = 0
+    for chunk in chunks:
+        if label_column not in chunk.columns:
+            raise ValueError(f"Labeled data has no label column {label_column!r}")
+        raw_labels = chunk[label_column]
+        if raw_labels.dtype.kind in "biuf":
+            labels = raw_labels.where(raw_labels.isin([0, 1]))
+        else:
+            labels = raw_labels.astype(str).str.strip().str.lower().map(_LABEL_VALUES)
+        if labels.isna().any():
+            row = int(np.argmax(labels.isna().to_numpy()))
+            raise ValueError(
+                f"Invalid label {chunk[label_column].iloc[row]!r} at row {offset + row}. Expected 0/1 or Yes/No"
+            )
+        if "Total Charges" in chunk.columns and chunk["Total Charges"].dtype.kind not in "fi":
+            # Blank totals (new customers) mean missing, as in the preprocessing notebook
+            chunk = chunk.assign(**{"Total Charges": pd.to_numeric(chunk["Total Charges"], errors="coerce")})
+        try:
+            features = validate_frame(chunk)
+        except ValueError as e:
+            raise ValueError(f"In the chunk starting at row {offset}: {str(e)}")
+        offset += len(chunk)
+        yield features, labels.to_numpy(dtype=np.int8)
+
+
+class ClassifierEvaluation:
+    """Fixed-memory evaluation state of one model version."""
+
+    def __init__(self, bins: int = EVALUATION_BINS):
+        self.bins = bins
+        # Row counts per probability bin, for true non-churners and churners
+        self.histograms = np.zeros((2, bins), dtype=np.int64)
+        # Exact confusion matrix of the model's own predictions [true][predicted]
+        self.decision_matrix = np.zeros((2, 2), dtype=np.int64)
+        self.brier_sum = 0.0
+        self.log_loss_sum = 0.0
+
+    def update(self, labels: np.ndarray, predictions: np.ndarray, probabilities: np.ndarray):
+        """Fold a scored chunk into the state."""
+        labels = labels.astype(np.int64)
+        bin_index = np.minimum((probabilities * self.bins).astype(np.int64), self.bins - 1)
+        self.histograms += np.bincount(labels * self.bins + bin_index, minlength=2 * self.bins).reshape(2, self.bins)
+        self.decision_matrix += np.bincount(
+            labels * 2 + np.asarray(predictions, dtype=np.int64), minlength=4
+        ).reshape(2, 2)
+        self.brier_sum += float(np.sum((probabilities - labels) ** 2))
+        clipped = np.clip(probabilities, LOG_LOSS_EPSILON, 1 - LOG_LOSS_EPSILON)
+        self.log_loss_sum -= float(np.sum(np.where(labels == 1, np.log(clipped), np.log1p(-clipped))))
+
+    @staticmethod
+    def _metrics(tn: int, fp: int, fn: int, tp: int) -> dict:
+        def ratio(num: int, den: int) -> Optional[float]:
+            return round(num / den, 6) if den else None
+
+        precision, recall = ratio(tp, tp + fp), ratio(tp, tp + fn)
+        return {
+            "confusion_matrix": [[int(tn), int(fp)], [int(fn), int(tp)]],
+            "recall": recall,
+            "precision": precision,
+            "specificity": ratio(tn, tn + fp),
+            "accuracy": ratio(tp + tn, tn + fp + fn + tp),
+            "f1": round(2 * precision * recall / (precision + recall), 6) if precision and recall else 0.0
+        }
+
+    def threshold_metrics(self, threshold: float) -> dict:
+        """Metrics when probabilities at or above the threshold (rounded to a bin edge) are churn."""
+        edge = int(round(threshold * self.bins))
+        negatives, positives = self.histograms
+        fp, tp = int(negatives[edge:].sum()), int(positives[edge:].sum())
+        tn, fn = int(negatives[:edge].sum()), int(positives[:edge].sum())
+        return {"threshold": edge / self.bins, **self._metrics(tn, fp, fn, tp)}
+
+    def report(self, thresholds: Sequence[float] = DEFAULT_THRESHOLDS) -> dict:
+        """Evaluation results for the rows seen so far."""
+        negatives, positives = self.histograms
+        n_neg, n_pos = int(negatives.sum()), int(positives.sum())
+        rows = n_neg + n_pos
+        report = {
+            "rows": rows,
+            "churn_rate": round(n_pos / rows, 6) if rows else None,
+            "model_decision": self._metrics(*self.decision_matrix.ravel().tolist()),
+            "brier_score": round(self.brier_sum / rows, 6) if rows else None,
+            "log_loss": round(self.log_loss_sum / rows, 6) if rows else None,
+            "roc_auc": None,
+            "roc_auc_max_error": None
+        }
+        if n_neg and n_pos:
+            # Churners in higher bins than each non-churner, plus half of the ties within its bin
+            positives_above = np.cumsum(positives[::-1])[::-1] - positives
+            pairs = n_neg * n_pos
+            report["roc_auc"] = round(float(np.sum(negatives * (positives_above + 0.5 * positives)) / pairs), 6)
+            report["roc_auc_max_error"] = round(float(np.sum(negatives * positives) / 2 / pairs), 6)
+
+        report["thresholds"] = [self.threshold_metrics(t) for t in thresholds]
+        if n_pos:
+            # Best F1 over every bin edge, not only the requested thresholds
+            tp = np.cumsum(positives[::-1])[::-1]
+            predicted = tp + np.cumsum(negatives[::-1])[::-1]
+            f1 = 2 * tp / (predicted + n_pos)
+            best = int(np.argmax(f1))
+            report["best_f1_threshold"] = {"threshold": best / self.bins, "f1": round(float(f1[best]), 6)}
+        return report
+
+
+def evaluate_stream(
+    chunks: Iterator[Tuple[pd.DataFrame, np.ndarray]],
+    model_versions: Sequence[str],
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+    bins: int = EVALUATION_BINS,
+    score: Optional[Callable] = None
+) -> dict:
+    """
+    Evaluate several model versions in one pass over labeled chunks.
+
+    Args:
+        chunks: Labeled chunks (see iter_labeled_chunks)
+        model_versions: Model versions to evaluate
+        thresholds: Thresholds to report confusion matrices for
+        bins: Probability histogram bins per class
+        score: Function scoring a chunk with a model service, returning
+            (predictions, probabilities) (default: the service's score_batch)
+
+    Returns:
+        Report with the metrics of every model version
+    """
+    if not model_versions:
+        raise ValueError("At least one model version is required")
+    for threshold in thresholds:
+        if not 0 <= threshold <= 1:
+            raise ValueError(f"Thresholds must be between 0 and 1, got {threshold}")
+    score = score or (lambda model_service, features: model_service.score_batch(features))
+    services = {version: get_model_service(model_version=version) for version in dict.fromkeys(model_versions)}
+    states: Dict[str, ClassifierEvaluation] = {version: ClassifierEvaluation(bins) for version in services}
+    seconds = dict.fromkeys(services, 0.0)
+
+    started = time.perf_counter()
+    n_chunks = 0
+    for features, labels in chunks:
+        n_chunks += 1
+        for version, model_service in services.items():
+            start = time.perf_counter()
+            predictions, probabilities = score(model_service, features)
+            seconds[version] += time.perf_counter() - start
+            states[version].update(labels, predictions, probabilities)
+
+    rows = int(next(iter(states.values())).histograms.sum())
+    if rows == 0:
+        raise ValueError("No labeled rows to evaluate")
+    return {
+        "rows": rows,
+        "chunks": n_chunks,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "models": {
+            version: {**state.report(thresholds), "scoring_seconds": round(seconds[version], 3)}
+            for version, state in states.items()
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate model versions on labeled data, streaming")
+    parser.add_argument("data", help="Labeled CSV, Parquet, JSON Lines, Excel or JSON file")
+    parser.add_argument("--model-version", nargs="+", default=["v1_lr"])
+    parser.add_argument("--label-column", default=DEFAULT_LABEL_COLUMN)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS))
+    parser.add_argument("--chunk-rows", type=int, default=EVALUATION_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = evaluate_stream(
+        iter_labeled_chunks(args.data, label_column=args.label_column, chunk_rows=args.chunk_rows),
+        args.model_version,
+        thresholds=args.thresholds
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Per-prediction feature attributions, vectorized over a batch.
+
+* Logistic regression: exact contributions, coefficient x transformed value,
+  in log-odds units.
+* Tree ensembles (random forest, gradient boosting): path attribution in the
+  spirit of TreeSHAP (Saabas method). Each split on a customer's decision path
+  credits the change in node value to the split feature. Since a path is
+  determined by its leaf, the per-leaf contributions of every tree are
+  precomputed once; a whole batch then costs one apply() call plus a single
+  sparse product of the leaf indicator with that table. Contributions plus the
+  base value add up exactly to the model output (log-odds for gradient
+  boosting, probability for random forest).
+
+Attributions over the encoded features are summed back to the 20 original
+input columns.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .models import EXPECTED_COLUMNS
+
+
+def _feature_groups(preprocessor) -> np.ndarray:
+    """Index of the original input column behind each encoded feature."""
+    n_out = sum(s.stop - s.start for s in preprocessor.output_indices_.values())
+    groups = np.full(n_out, -1, dtype=int)
+
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == "remainder" or transformer == "drop":
+            continue
+        out = preprocessor.output_indices_[name]
+        col_idx = [EXPECTED_COLUMNS.index(col) for col in columns]
+        if out.stop - out.start == len(columns):
+            groups[out] = col_idx
+            continue
+        # One-hot encoded block: one output per category of each column
+        steps = getattr(transformer, "steps", [(None, transformer)])
+        encoder = next(step for _, step in reversed(steps) if hasattr(step, "categories_"))
+        sizes = [len(categories) for categories in encoder.categories_]
+        if getattr(encoder, "drop_idx_", None) is not None:
+            sizes = [size - (idx is not None) for size, idx in zip(sizes, encoder.drop_idx_)]
+        groups[out] = np.repeat(col_idx, sizes)
+
+    if (groups < 0).any():
+        raise ValueError("Could not map every encoded feature back to an input column")
+    return groups
+
+
+def _leaf_contributions(tree, node_values: np.ndarray, n_features: int, scale: float) -> np.ndarray:
+    """
+    Node-by-feature table of accumulated contributions from the root.
+
+    Row `node` holds, per split feature on the path to `node`, the sum of
+    scale * (value[child] - value[parent]) over the splits on that feature.
+    """
+    table = np.zeros((tree.node_count, n_features))
+    # sklearn numbers nodes depth-first, so a parent always precedes its children
+    for parent in np.flatnonzero(tree.children_left >= 0):
+        feature = tree.feature[parent]
+        for child in (tree.children_left[parent], tree.children_right[parent]):
+            table[child] = table[parent]
+            table[child, feature] += scale * (node_values[child] - node_values[parent])
+    return table
+
+
+class ModelExplainer:
+    """Vectorized attribution for a fitted preprocessing + classifier pipeline."""
+
+    def __init__(self, pipeline):
+        """
+        Prepare the explainer.
+
+        Args:
+            pipeline: Fitted sklearn Pipeline with a "preprocessor" step and a final classifier
+        """
+        self.preprocessor = pipeline[:-1]
+        # Distilled students (api/distill.py) are explained through their trees
+        self.classifier = getattr(pipeline[-1], "boosting_", pipeline[-1])
+        column_transformer = pipeline.named_steps.get("preprocessor", pipeline[0])
+        groups = _feature_groups(column_transformer)
+        self.n_features = len(groups)
+        # Encoded features -> original columns, as a sparse summing matrix
+        self.group_matrix = sparse.csr_matrix(
+            (np.ones(len(groups)), (np.arange(len(groups)), groups)),
+            shape=(len(groups), len(EXPECTED_COLUMNS))
+        )
+
+        name = type(self.classifier).__name__
+        if hasattr(self.classifier, "coef_"):
+            self.method = "linear"
+            self.units = "log_odds"
+            self.base_value = float(np.ravel(self.classifier.intercept_)[0])
+        elif name == "GradientBoostingClassifier":
+            self.method = "tree_path"
+            self.units = "log_odds"
+            self._init_gradient_boosting()
+        elif name == "RandomForestClassifier":
+            self.method = "tree_path"
+            self.units = "probability"
+            self._init_random_forest()
+        else:
+            raise ValueError(f"Explanations are not supported for {name}")
+
+    def _init_gradient_boosting(self):
+        gb = self.classifier
+        if gb.estimators_.shape[1] != 1:
+            raise ValueError("Explanations are only supported for binary gradient boosting")
+        prior = gb.init_.class_prior_[1]
+        self.base_value = float(np.log(prior / (1 - prior)))
+        tables = []
+        for estimator in gb.estimators_[:, 0]:
+            tree = estimator.tree_
+            values = tree.value[:, 0, 0]
+            self.base_value += gb.learning_rate * float(values[0])
+            tables.append(_leaf_contributions(tree, values, self.n_features, gb.learning_rate))
+        self._stack_tables(tables)
+
+    def _init_random_forest(self):
+        rf = self.classifier
+        positive = list(rf.classes_).index(1)
+        scale = 1.0 / len(rf.estimators_)
+        self.base_value = 0.0
+        tables = []
+        for estimator in rf.estimators_:
+            tree = estimator.tree_
+            counts = tree.value[:, 0, :]
+            values = counts[:, positive] / counts.sum(axis=1)
+            self.base_value += scale * float(values[0])
+            tables.append(_leaf_contributions(tree, values, self.n_features, scale))
+        self._stack_tables(tables)
+
+    def _stack_tables(self, tables: List[np.ndarray]):
+        """Concatenate the per-tree tables; leaf ids are offset per tree."""
+        self.leaf_table = np.vstack(tables)
+        self.node_offsets = np.cumsum([0] + [len(table) for table in tables[:-1]])
+
+    def explain(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Attribute the model output of every row to the original input columns.
+
+        Args:
+            df: DataFrame with the expected feature columns
+
+        Returns:
+            Array of shape (n_rows, 20) aligned with EXPECTED_COLUMNS
+        """
+        X = self.preprocessor.transform(df.reindex(columns=EXPECTED_COLUMNS))
+        if sparse.issparse(X):
+            X = X.toarray()
+        X = np.asarray(X, dtype=np.float32 if self.method == "tree_path" else np.float64)
+
+        if self.method == "linear":
+            contributions = X * np.ravel(self.classifier.coef_)
+        else:
+            n_rows, n_trees = X.shape[0], len(self.node_offsets)
+            leaves = self.classifier.apply(X).reshape(n_rows, n_trees) + self.node_offsets
+            indicator = sparse.csr_matrix(
+                (np.ones(leaves.size), leaves.ravel(), np.arange(0, leaves.size + 1, n_trees)),
+                shape=(n_rows, len(self.leaf_table))
+            )
+            contributions = indicator @ self.leaf_table
+
+        return np.asarray(self.group_matrix.T.dot(contributions.T).T)
+
+
+def top_contributions(
+    contributions: np.ndarray,
+    top_k: Optional[int] = None
+) -> List[List[Tuple[str, float]]]:
+    """
+    Rank the contributions of each row by absolute value.
+
+    Args:
+        contributions: Array of shape (n_rows, 20) from ModelExplainer.explain
+        top_k: Keep only the k largest contributors per row (all if None)
+
+    Returns:
+        Per row, a list of (column, contribution) pairs, largest first
+    """
+    n_cols = contributions.shape[1]
+    k = n_cols if top_k is None else min(top_k, n_cols)
+    order = np.argsort(-np.abs(contributions), axis=1)[:, :k]
+    ranked = np.take_along_axis(contributions, order, axis=1)
+    return [
+        [(EXPECTED_COLUMNS[col], float(value)) for col, value in zip(cols, values)]
+        for cols, values in zip(order, ranked)
+    ]
+
+
+# Explainers built so far, keyed by model path
+_explainers: dict = {}
+
+
+def get_explainer(model_service) -> ModelExplainer:
+    """Get the explainer of a loaded model service, building it on first use."""
+    key = str(model_service.model_path)
+    if key not in _explainers:
+        _explainers[key] = ModelExplainer(model_service.model)
+    return _explainers[key]
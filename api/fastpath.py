@@ -0,0 +1,286 @@
+"""
+Allocation-light scoring path for the trained pipelines.
+
+The sklearn pipelines (ColumnTransformer of median imputer + StandardScaler
+for the numeric columns and most-frequent imputer + OneHotEncoder for the
+categorical ones, then a classifier) allocate several intermediate copies of
+every batch: the imputed and scaled numeric block, the string-validated
+categorical block, the sparse one-hot matrix, and the stacked result.
+
+CompiledPipeline replays the fitted preprocessing with the same parameters
+and the same floating point operations, writing straight into a reusable
+per-thread matrix of the encoded width (4 numeric + 43 one-hot columns). The
+classifier then scores that matrix directly, so the results are identical to
+the pipeline's. The matrix uses the dtype the classifier works in (float32
+for tree ensembles, which would otherwise convert a float64 input), and
+batches larger than the buffer are scored in buffer-sized pieces so memory
+per thread stays bounded.
+
+records_to_frame builds a batch from per-row dicts column by column, which
+avoids pandas' row-wise construction and string dtype inference. Single
+customers skip pandas altogether (score_record): each value is looked up in
+a dict of one-hot positions and written into the first buffer row.
+
+Pipelines of any other shape are not compiled and keep using sklearn.
+"""
+import threading
+import logging
+from operator import itemgetter
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rows of the largest per-thread feature buffer; larger batches are scored in pieces
+MAX_BUFFER_ROWS = 16384
+# Estimator modules whose predict_proba works in float32
+_FLOAT32_MODULES = ("sklearn.ensemble._gb", "sklearn.ensemble._forest", "sklearn.tree")
+
+
+class NotCompilable(ValueError):
+    """Raised when a pipeline does not have the structure CompiledPipeline replays."""
+
+
+def _step(pipeline, cls_name: str, position: int):
+    steps = getattr(pipeline, "steps", None)
+    if steps is None or len(steps) != 2 or type(steps[position][1]).__name__ != cls_name:
+        raise NotCompilable(f"Expected {cls_name} as step {position} of {pipeline!r}")
+    return steps[position][1]
+
+
+def records_to_frame(records: List[dict], columns: List[str], numeric_columns: List[str]) -> pd.DataFrame:
+    """
+    Build a feature frame from per-row dicts, one column at a time.
+
+    Numeric columns become float64 arrays (None as NaN); the others stay
+    object arrays, without string dtype inference.
+
+    Args:
+        records: One dict per row with at least the given columns
+        columns: Columns to extract, in order
+        numeric_columns: Columns converted to float64
+
+    Returns:
+        DataFrame with the given columns
+    """
+    numeric = set(numeric_columns)
+    data = {}
+    for col in columns:
+        try:
+            values = list(map(itemgetter(col), records))
+        except KeyError:
+            missing = [c for c in columns if any(c not in record for record in records)]
+            raise ValueError(f"Missing required columns: {set(missing)}")
+        if col in numeric:
+            data[col] = np.array(values, dtype=np.float64)
+        else:
+            array = np.empty(len(values), dtype=object)
+            array[:] = values
+            data[col] = pd.Series(array, dtype=object, copy=False)
+    return pd.DataFrame(data, columns=columns, copy=False)
+
+
+class _Buffers(threading.local):
+    """Per-thread feature matrix and scratch arrays of one compiled pipeline."""
+
+    def __init__(self):
+        self.capacity = 0
+        self.matrix = None
+        self.numeric = None
+        self.row_starts = None
+        self.flat_index = None
+
+
+class CompiledPipeline:
+    """Fitted preprocessing replayed into reusable buffers, followed by the classifier."""
+
+    def __init__(self, pipeline):
+        """
+        Extract the fitted parameters of a pipeline.
+
+        Args:
+            pipeline: Fitted sklearn Pipeline (preprocessor, classifier)
+
+        Raises:
+            NotCompilable: If the pipeline has another structure
+        """
+        steps = getattr(pipeline, "steps", None)
+        if not steps or len(steps) != 2 or type(steps[0][1]).__name__ != "ColumnTransformer":
+            raise NotCompilable("Expected a (ColumnTransformer, classifier) pipeline")
+        preprocessor, self.estimator = steps[0][1], steps[1][1]
+        if not hasattr(self.estimator, "predict_proba"):
+            raise NotCompilable("The classifier has no predict_proba")
+        if getattr(preprocessor, "sparse_output_", False):
+            raise NotCompilable("Sparse preprocessor output is not supported")
+
+        transformers = [
+            (name, transformer, list(columns))
+            for name, transformer, columns in preprocessor.transformers_
+            if not (name == "remainder" and transformer == "drop")
+        ]
+        if [name for name, _, _ in transformers] != ["num", "cat"]:
+            raise NotCompilable("Expected the num and cat transformers")
+        (_, numeric, self.numeric_columns), (_, categorical, self.categorical_columns) = transformers
+
+        numeric_imputer, scaler = _step(numeric, "SimpleImputer", 0), _step(numeric, "StandardScaler", 1)
+        if numeric_imputer.strategy not in ("median", "mean") or getattr(numeric_imputer, "add_indicator", False):
+            raise NotCompilable("Unsupported numeric imputer")
+        self.numeric_fill = numeric_imputer.statistics_.astype(np.float64)
+        self.mean = scaler.mean_ if scaler.with_mean else None
+        self.scale = scaler.scale_ if scaler.with_std else None
+
+        categorical_imputer, encoder = _step(categorical, "SimpleImputer", 0), _step(categorical, "OneHotEncoder", 1)
+        if categorical_imputer.strategy != "most_frequent" or getattr(categorical_imputer, "add_indicator", False):
+            raise NotCompilable("Unsupported categorical imputer")
+        if encoder.drop_idx_ is not None or encoder.handle_unknown != "ignore":
+            raise NotCompilable("Only OneHotEncoder(handle_unknown='ignore') without drop is supported")
+        if getattr(encoder, "_infrequent_enabled", False):
+            raise NotCompilable("Infrequent categories are not supported")
+
+        n_numeric = len(self.numeric_columns)
+        self.categories = [pd.Index(categories, dtype=object) for categories in encoder.categories_]
+        self.offsets = n_numeric + np.concatenate([[0], np.cumsum([len(c) for c in self.categories])[:-1]])
+        self.fill_codes = [
+            index.get_loc(value) if value in index else -1
+            for index, value in zip(self.categories, categorical_imputer.statistics_)
+        ]
+        # Feature position of each category, for single records
+        self.positions = [
+            {value: offset + code for code, value in enumerate(index)}
+            for index, offset in zip(self.categories, self.offsets.tolist())
+        ]
+        self.width = n_numeric + sum(len(c) for c in self.categories)
+        if self.width != getattr(self.estimator, "n_features_in_", self.width):
+            raise NotCompilable("Encoded width does not match the classifier")
+
+        self.dtype = np.float32 if type(self.estimator).__module__.startswith(_FLOAT32_MODULES) else np.float64
+        self.classes = self.estimator.classes_
+        self._buffers = _Buffers()
+
+    def _buffers_for(self, n_rows: int) -> _Buffers:
+        """This thread's buffers, grown (by powers of two) to hold n_rows."""
+        buffers = self._buffers
+        if buffers.matrix is None or buffers.capacity < n_rows:
+            capacity = min(MAX_BUFFER_ROWS, 1 << max(n_rows - 1, 0).bit_length())
+            buffers.matrix = np.zeros((capacity, self.width), dtype=self.dtype)
+            buffers.numeric = np.empty((capacity, len(self.numeric_columns)), dtype=np.float64)
+            buffers.row_starts = np.arange(capacity, dtype=np.int64) * self.width
+            buffers.flat_index = np.empty(capacity, dtype=np.int64)
+            buffers.capacity = capacity
+        return buffers
+
+    def transform(self, df: pd.DataFrame, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Encode rows [start, stop) of a batch into this thread's feature matrix.
+
+        Returns:
+            View of the feature matrix; valid until the next call on this thread
+        """
+        stop = len(df) if stop is None else stop
+        n_rows = stop - start
+        buffers = self._buffers_for(n_rows)
+        matrix = buffers.matrix[:n_rows]
+
+        # Numeric block: impute, then scale, in float64 as sklearn does
+        numeric = buffers.numeric[:n_rows]
+        for j, col in enumerate(self.numeric_columns):
+            np.copyto(numeric[:, j], df[col].to_numpy()[start:stop], casting="unsafe")
+        missing = np.isnan(numeric)
+        if missing.any():
+            np.copyto(numeric, np.broadcast_to(self.numeric_fill, numeric.shape), where=missing)
+        if self.mean is not None:
+            numeric -= self.mean
+        if self.scale is not None:
+            numeric /= self.scale
+        matrix[:, :numeric.shape[1]] = numeric
+
+        # One-hot block: set one cell per row and column at a flat offset
+        matrix[:, numeric.shape[1]:] = 0
+        flat = buffers.matrix.reshape(-1)
+        flat_index = buffers.flat_index[:n_rows]
+        for col, index, offset, fill_code in zip(
+            self.categorical_columns, self.categories, self.offsets, self.fill_codes
+        ):
+            values = df[col].to_numpy()[start:stop]
+            # An object Index skips pandas' string inference of the looked-up values
+            codes = index.get_indexer(pd.Index(values, dtype=object, copy=False))
+            valid = None
+            if (codes < 0).any():
+                # Missing values take the imputed category; unknown ones stay all zero
+                codes[pd.isna(values)] = fill_code
+                valid = codes >= 0
+            np.add(buffers.row_starts[:n_rows], codes, out=flat_index)
+            flat_index += offset
+            flat[flat_index if valid is None else flat_index[valid]] = 1
+        return matrix
+
+    def score_record(self, record: dict) -> Tuple[int, float]:
+        """
+        Score a single customer without building a DataFrame.
+
+        Args:
+            record: Dict with (at least) the pipeline's input columns
+
+        Returns:
+            Tuple of (prediction, probability)
+        """
+        buffers = self._buffers_for(1)
+        row = buffers.matrix[0]
+        row[:] = 0
+        for j, col in enumerate(self.numeric_columns):
+            value = record[col]
+            value = self.numeric_fill[j] if value is None or value != value else float(value)
+            if self.mean is not None:
+                value -= self.mean[j]
+            if self.scale is not None:
+                value /= self.scale[j]
+            row[j] = value
+        for col, positions, fill_code, offset in zip(
+            self.categorical_columns, self.positions, self.fill_codes, self.offsets.tolist()
+        ):
+            value = record[col]
+            if value is None or value != value:
+                if fill_code >= 0:
+                    row[offset + fill_code] = 1
+                continue
+            # Unknown categories leave the group all zero
+            position = positions.get(value)
+            if position is not None:
+                row[position] = 1
+        proba = self.estimator.predict_proba(buffers.matrix[:1])
+        return self.classes[int(np.argmax(proba[0]))].item(), float(proba[0, 1])
+
+    def score(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score a batch.
+
+        Args:
+            df: DataFrame with (at least) the pipeline's input columns
+
+        Returns:
+            Tuple of (predictions, probabilities) arrays
+        """
+        n_rows = len(df)
+        if n_rows <= MAX_BUFFER_ROWS:
+            proba = self.estimator.predict_proba(self.transform(df))
+            return self.classes[np.argmax(proba, axis=1)], proba[:, 1]
+
+        predictions = np.empty(n_rows, dtype=self.classes.dtype)
+        probabilities = np.empty(n_rows, dtype=np.float64)
+        for start in range(0, n_rows, MAX_BUFFER_ROWS):
+            stop = min(start + MAX_BUFFER_ROWS, n_rows)
+            proba = self.estimator.predict_proba(self.transform(df, start, stop))
+            predictions[start:stop] = self.classes[np.argmax(proba, axis=1)]
+            probabilities[start:stop] = proba[:, 1]
+        return predictions, probabilities
+
+
+def compile_pipeline(pipeline) -> Optional[CompiledPipeline]:
+    """Compile a fitted pipeline, or None if its structure is not supported."""
+    try:
+        return CompiledPipeline(pipeline)
+    except NotCompilable as e:
+        logger.info(f"Scoring through sklearn: {str(e)}")
+        return None
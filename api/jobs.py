@@ -0,0 +1,480 @@
+"""
+Asynchronous batch jobs backed by a local SQLite database.
+
+A submitted batch is stored in chunks and processed by background worker
+threads that score through the ModelManager. Inside the API, every chunk is
+admitted on the bulk lane of the admission controller, so jobs yield the
+cores to interactive requests like large batches do. Progress is committed chunk by
+chunk, so a job interrupted by a restart resumes where it stopped, and the
+results can be downloaded in pages while the job is still running.
+"""
+import asyncio
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .admission import BULK, AdmissionRejected, get_admission_controller
+from .services import get_model_manager
+from .codecs import validate_frame
+
+logger = logging.getLogger(__name__)
+
+# Rows scored (and committed) per unit of work
+JOB_CHUNK_SIZE = 1000
+# A running job whose progress has not moved for this long is considered orphaned
+JOB_LEASE_SECONDS = 120
+# How often idle workers look for new work
+JOB_POLL_SECONDS = 1.0
+
+JOB_STATUSES = ("queued", "running", "completed", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    model_version TEXT NOT NULL,
+    status TEXT NOT NULL,
+    source TEXT,
+    total INTEGER NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, model_version, created_at);
+CREATE TABLE IF NOT EXISTS job_inputs (
+    job_id TEXT NOT NULL,
+    chunk INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (job_id, chunk)
+);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    customer_index INTEGER NOT NULL,
+    churn_prediction INTEGER NOT NULL,
+    churn_probability REAL NOT NULL,
+    PRIMARY KEY (job_id, customer_index)
+);
+"""
+
+
+def _parse_concurrency(value: Optional[str]) -> Dict[str, int]:
+    """Parse "v1_lr=2,v2_rf=1" into a dict."""
+    limits = {}
+    if not value:
+        return limits
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        key, limit = item.split("=", 1)
+        limits[key.strip()] = max(int(limit), 0)
+    return limits
+
+
+def read_upload(content: bytes, filename: Optional[str]) -> pd.DataFrame:
+    """
+    Parse an uploaded batch file into validated feature rows.
+
+    Args:
+        content: File content
+        filename: Uploaded file name; .csv files are read as CSV, anything else as JSON
+                  (an array of customers, {"customers": [...]}, or one array per column)
+
+    Returns:
+        Validated DataFrame with the expected feature columns
+    """
+    try:
+        if filename and filename.lower().endswith(".csv"):
+            df = pd.read_csv(io.BytesIO(content))
+        else:
+            payload = json.loads(content)
+            if isinstance(payload, dict) and "customers" in payload:
+                payload = payload["customers"]
+            df = pd.DataFrame(payload)
+    except Exception as e:
+        raise ValueError(f"Could not read uploaded file: {str(e)}")
+    return validate_frame(df)
+
+
+class JobStore:
+    """Persistent job state, inputs and results in SQLite."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Args:
+            db_path: Path to the SQLite file. Defaults to JOBS_DB_PATH or data/jobs.db.
+        """
+        if db_path is None:
+            db_path = os.getenv("JOBS_DB_PATH")
+            if db_path is None:
+                base_dir = Path(__file__).parent.parent
+                db_path = base_dir / "data" / "jobs.db"
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create_job(self, df: pd.DataFrame, model_version: str, source: str = "json") -> dict:
+        """
+        Store a new job and its input rows.
+
+        Args:
+            df: Validated feature rows
+            model_version: Model version to score with
+            source: Where the rows came from (json or the uploaded file name)
+
+        Returns:
+            The job record
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        chunks = [
+            (
+                job_id,
+                idx,
+                json.dumps({
+                    col: df[col].iloc[start:start + JOB_CHUNK_SIZE].tolist()
+                    for col in df.columns
+                })
+            )
+            for idx, start in enumerate(range(0, len(df), JOB_CHUNK_SIZE))
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO job_inputs (job_id, chunk, payload) VALUES (?, ?, ?)",
+                chunks
+            )
+            conn.execute(
+                "INSERT INTO jobs (id, model_version, status, source, total, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, model_version, source, len(df), now, now)
+            )
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Get a job record by id."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[dict]:
+        """List the most recent jobs, optionally filtered by status."""
+        query = "SELECT * FROM jobs"
+        params: tuple = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._connect() as conn:
+            rows = conn.execute(query, params + (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim_job(self, model_version: str) -> Optional[dict]:
+        """
+        Atomically move the oldest queued job of a model version to running.
+
+        Safe across threads and processes sharing the same database file.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' AND model_version = ? "
+                "ORDER BY created_at LIMIT 1",
+                (model_version,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?), "
+                "updated_at = ? WHERE id = ?",
+                (now, now, row["id"])
+            )
+        return self.get_job(row["id"])
+
+    def requeue_stale(self, lease_seconds: float = JOB_LEASE_SECONDS) -> int:
+        """Put running jobs whose worker stopped making progress back in the queue."""
+        cutoff = time.time() - lease_seconds
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND updated_at < ?",
+                (cutoff,)
+            )
+        return cursor.rowcount
+
+    def queued_versions(self) -> List[str]:
+        """Model versions that have queued jobs."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT model_version FROM jobs WHERE status = 'queued'"
+            ).fetchall()
+        return [row["model_version"] for row in rows]
+
+    def load_chunk(self, job_id: str, chunk: int) -> pd.DataFrame:
+        """Load one chunk of input rows."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload FROM job_inputs WHERE job_id = ? AND chunk = ?",
+                (job_id, chunk)
+            ).fetchone()
+        if row is None:
+            raise ValueError(f"Input chunk {chunk} of job {job_id} is missing")
+        return pd.DataFrame(json.loads(row["payload"]))
+
+    def save_chunk_results(
+        self,
+        job_id: str,
+        start_index: int,
+        predictions: np.ndarray,
+        probabilities: np.ndarray
+    ):
+        """Store the results of one chunk and advance the job progress."""
+        rows = [
+            (job_id, start_index + idx, int(pred), float(prob))
+            for idx, (pred, prob) in enumerate(zip(predictions, probabilities))
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_results "
+                "(job_id, customer_index, churn_prediction, churn_probability) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "UPDATE jobs SET processed = ?, updated_at = ? WHERE id = ?",
+                (start_index + len(rows), time.time(), job_id)
+            )
+
+    def release_job(self, job_id: str):
+        """Put a running job back in the queue (e.g. on shutdown)."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE id = ? AND status = 'running'",
+                (time.time(), job_id)
+            )
+
+    def finish_job(self, job_id: str, error: Optional[str] = None):
+        """Mark a job completed (or failed with an error message)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                ("failed" if error else "completed", error, now, now, job_id)
+            )
+            if error is None:
+                # Inputs are no longer needed once every row has a result
+                conn.execute("DELETE FROM job_inputs WHERE job_id = ?", (job_id,))
+
+    def get_results(self, job_id: str, offset: int = 0, limit: int = 1000) -> List[dict]:
+        """Get a page of results ordered by customer index."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT customer_index, churn_prediction, churn_probability FROM job_results "
+                "WHERE job_id = ? AND customer_index >= ? ORDER BY customer_index LIMIT ?",
+                (job_id, offset, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+class JobRunner:
+    """Background worker threads that process queued jobs."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: Optional[int] = None,
+        concurrency: Optional[Dict[str, int]] = None
+    ):
+        """
+        Initialize the runner.
+
+        Args:
+            store: Job store to process
+            workers: Number of worker threads. Defaults to JOB_WORKERS or 2.
+            concurrency: Maximum concurrent jobs per model version. Defaults to
+                         JOB_CONCURRENCY (e.g. "v1_lr=2,v2_rf=1"); unlisted
+                         versions get one slot.
+        """
+        self.store = store
+        self.workers = workers if workers is not None else int(os.getenv("JOB_WORKERS", "2"))
+        if concurrency is None:
+            concurrency = _parse_concurrency(os.getenv("JOB_CONCURRENCY"))
+        self.concurrency = concurrency
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._slots_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _slot(self, model_version: str) -> threading.BoundedSemaphore:
+        with self._slots_lock:
+            if model_version not in self._slots:
+                limit = self.concurrency.get(model_version, 1)
+                self._slots[model_version] = threading.BoundedSemaphore(limit) if limit else None
+            return self._slots[model_version]
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        Requeue orphaned jobs and start the worker threads.
+
+        Args:
+            loop: Event loop of the admission controller; when given, chunks
+                  are scored on its bulk lane instead of directly
+        """
+        self._loop = loop
+        requeued = self.store.requeue_stale()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted job(s)")
+        self._stop.clear()
+        for idx in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the workers after their current chunk."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake idle workers after a submission."""
+        self._wakeup.set()
+
+    def _claim(self) -> Optional[tuple]:
+        """Claim a queued job for a model version that has a free slot."""
+        for model_version in self.store.queued_versions():
+            slot = self._slot(model_version)
+            if slot is None or not slot.acquire(blocking=False):
+                continue
+            job = self.store.claim_job(model_version)
+            if job is not None:
+                return job, slot
+            slot.release()
+        return None
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self._claim()
+                if claimed is None:
+                    self.store.requeue_stale()
+                    self._wakeup.wait(JOB_POLL_SECONDS)
+                    self._wakeup.clear()
+                    continue
+                job, slot = claimed
+                try:
+                    self._process(job)
+                finally:
+                    slot.release()
+            except Exception as e:
+                logger.error(f"Job worker error: {str(e)}", exc_info=True)
+                self._stop.wait(JOB_POLL_SECONDS)
+
+    def _process(self, job: dict):
+        """Score the remaining chunks of a job."""
+        job_id = job["id"]
+        try:
+            model_service = get_model_manager().get_model(job["model_version"])
+            start = job["processed"]
+            while start < job["total"]:
+                if self._stop.is_set():
+                    # Progress is committed; the next start resumes from here
+                    self.store.release_job(job_id)
+                    return
+                chunk = start // JOB_CHUNK_SIZE
+                df = self.store.load_chunk(job_id, chunk)
+                # Skip rows already stored if a previous run stopped mid-chunk
+                offset = start - chunk * JOB_CHUNK_SIZE
+                scored = self._score(model_service, df.iloc[offset:])
+                if scored is None:
+                    self.store.release_job(job_id)
+                    return
+                predictions, probabilities = scored
+                self.store.save_chunk_results(job_id, start, predictions, probabilities)
+                start += len(df) - offset
+            self.store.finish_job(job_id)
+            logger.info(f"Job {job_id} completed ({job['total']} rows)")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self.store.finish_job(job_id, error=str(e))
+
+
+    def _score(self, model_service, df: pd.DataFrame) -> Optional[tuple]:
+        """
+        Score a chunk, on the bulk lane if the runner was started with a loop.
+
+        Returns:
+            Tuple of (predictions, probabilities), or None if the runner was
+            stopped first
+        """
+        if self._loop is None:
+            return model_service.predict_frame(df)
+        controller = get_admission_controller()
+        while not self._stop.is_set():
+            work = asyncio.run_coroutine_threadsafe(
+                controller.run(BULK, model_service.predict_frame, df), self._loop
+            )
+            try:
+                # Wake up regularly: stop() blocks the loop while joining this thread
+                while True:
+                    try:
+                        return work.result(timeout=JOB_POLL_SECONDS)
+                    except FutureTimeoutError:
+                        if self._stop.is_set():
+                            work.cancel()
+                            return None
+            except AdmissionRejected:
+                # The bulk queue is full: retry, jobs are not in a hurry
+                self._stop.wait(JOB_POLL_SECONDS)
+        return None
+
+
+# Global job store and runner instances
+_job_store: Optional[JobStore] = None
+_job_runner: Optional[JobRunner] = None
+
+
+def get_job_store() -> JobStore:
+    """Get or create the global job store instance."""
+    global _job_store
+    if _job_store is None:
+        _job_store = JobStore()
+    return _job_store
+
+
+def get_job_runner() -> JobRunner:
+    """Get or create the global job runner instance."""
+    global _job_runner
+    if _job_runner is None:
+        _job_runner = JobRunner(get_job_store())
+    return _job_runner
@@ -0,0 +1,535 @@
+"""
+HTTP load generator and capacity-planning report for the API.
+
+For each model version, a traffic mix of single predictions and batch
+predictions is sent to a running server at a rising request rate until a
+latency SLO is breached. The result is a throughput-versus-latency curve per
+model version and the highest rate that met the SLO, per server core.
+
+* Open loop: requests are sent on a fixed schedule at the target rate, by up
+  to --concurrency keep-alive connections, whatever the server's response
+  time. Latency is measured from the scheduled send time, so time spent
+  waiting for a free connection counts (no coordinated omission).
+* Ramp: each step runs for --step-seconds at a rate --ramp-factor times the
+  previous one. The ramp stops at the first step whose latency percentile
+  exceeds the SLO, whose error rate exceeds --max-error-rate, or whose
+  throughput falls short of 90% of the target (saturation).
+* Mix: --mix "single=0.9,batch10=0.08,batch100=0.02" weighs the request
+  types: `single` posts one customer to /predict, `batchN` posts N customers
+  to /predict/batch. Customers come from sample_data.json, completed with
+  synthetic customers of the same format.
+* Server: with --start-server, api/serve.py is started on a free port (with
+  --server-cpus it is pinned to those cores) and its CPU use is read from
+  /proc. Otherwise --url targets an already running server, and
+  --server-cores tells how many cores it has.
+
+Requests per second per core = highest passing rate / server cores. Run the
+load generator on other cores than the server (e.g. --server-cpus 0-3 on an
+8-core machine) so they do not compete; steps where the generator itself
+fell behind its schedule are flagged.
+
+Run from the project directory:
+    python -m api.loadtest --start-server --server-cpus 0-1 --model-version v1_lr v3_gb
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .admission import usable_cores
+from .synthetic import generate_customers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIX = "single=0.9,batch10=0.08,batch100=0.02"
+DEFAULT_SAMPLE_DATA = Path(__file__).parent.parent / "sample_data.json"
+# Share of the target rate a step must achieve not to count as saturated
+SATURATION_RATIO = 0.9
+# Average lateness of the generator's schedule that marks a step as client-bound
+GENERATOR_LAG_MS = 5.0
+# Distinct payloads prepared per request type
+PAYLOAD_VARIANTS = 64
+
+
+def parse_mix(value: str) -> List[Tuple[str, int, float]]:
+    """
+    Parse a traffic mix, e.g. "single=0.9,batch100=0.1".
+
+    Returns:
+        List of (name, customers per request, weight) with weights summing to 1
+    """
+    mix = []
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, sep, weight = item.partition("=")
+        name = name.strip()
+        if name == "single":
+            size = 1
+        elif name.startswith("batch") and name[5:].isdigit() and int(name[5:]) > 0:
+            size = int(name[5:])
+        else:
+            raise ValueError(f"Invalid mix entry {item!r}. Expected single=<weight> or batch<N>=<weight>")
+        try:
+            weight = float(weight) if sep else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid weight in mix entry {item!r}")
+        if weight < 0:
+            raise ValueError(f"Negative weight in mix entry {item!r}")
+        mix.append((name, size, weight))
+    total = sum(weight for _, _, weight in mix)
+    if not mix or total <= 0:
+        raise ValueError("The traffic mix needs at least one request type with a positive weight")
+    return [(name, size, weight / total) for name, size, weight in mix]
+
+
+def load_customers(sample_path: Optional[Path], n_rows: int) -> List[dict]:
+    """Customers from a sample file (JSON array), completed with synthetic ones."""
+    customers = []
+    if sample_path is not None and Path(sample_path).exists():
+        with open(sample_path) as f:
+            customers = json.load(f)
+        if not isinstance(customers, list):
+            raise ValueError(f"{sample_path} must hold a JSON array of customers")
+    if len(customers) < n_rows:
+        synthetic = generate_customers(n_rows - len(customers), seed=len(customers))
+        customers += json.loads(synthetic.to_json(orient="records"))
+    return customers
+
+
+class RequestPlan:
+    """Pre-encoded request bodies of a traffic mix for one model version."""
+
+    def __init__(self, mix: List[Tuple[str, int, float]], model_version: str, customers: List[dict]):
+        self.names = [name for name, _, _ in mix]
+        self.sizes = {name: size for name, size, _ in mix}
+        self.weights = [weight for _, _, weight in mix]
+        self.paths = {
+            name: (
+                f"/predict?model_version={model_version}" if size == 1
+                else f"/predict/batch?model_version={model_version}"
+            )
+            for name, size, _ in mix
+        }
+        self.bodies: Dict[str, List[bytes]] = {}
+        for name, size, _ in mix:
+            variants = []
+            for variant in range(PAYLOAD_VARIANTS):
+                start = (variant * size) % len(customers)
+                rows = [customers[(start + i) % len(customers)] for i in range(size)]
+                payload = rows[0] if size == 1 else {"customers": rows}
+                variants.append(json.dumps(payload).encode())
+            self.bodies[name] = variants
+
+    def draw(self, rng: random.Random) -> Tuple[str, str, bytes]:
+        """Pick a request: (type name, path, body)."""
+        name = rng.choices(self.names, weights=self.weights)[0]
+        return name, self.paths[name], rng.choice(self.bodies[name])
+
+
+class LoadClient:
+    """Keep-alive HTTP connections to the server, one per sending thread."""
+
+    def __init__(self, url: str, timeout: float):
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Invalid server URL: {url}")
+        self._connection_class = (
+            http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        )
+        self.host, self.port = parts.hostname, parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None) -> int:
+        """Send a request and read the whole response; returns the status (0 on connection errors)."""
+        conn = getattr(self._local, "conn", None)
+        for attempt in range(2):
+            if conn is None:
+                conn = self._connection_class(self.host, self.port, timeout=self.timeout)
+                self._local.conn = conn
+            try:
+                headers = {"Content-Type": "application/json"} if body is not None else {}
+                conn.request(method, self.base_path + path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.will_close:
+                    conn.close()
+                    self._local.conn = None
+                return response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = self._local.conn = None
+                if attempt:
+                    return 0
+        return 0
+
+    def wait_until_healthy(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.request("GET", "/health") == 200:
+                return
+            time.sleep(0.5)
+        raise RuntimeError(f"Server at {self.host}:{self.port} did not become healthy within {timeout:.0f}s")
+
+
+def _process_tree_cpu_seconds(pid: int) -> Optional[float]:
+    """User + system CPU time of a process and its descendants, from /proc (None elsewhere)."""
+    ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+    total, pending = 0.0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/stat") as f:
+                # Fields after the parenthesised command name; utime and stime are 14th and 15th
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / ticks
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, IndexError, ValueError):
+            if current == pid:
+                return None
+    return total
+
+
+class LocalServer:
+    """api/serve.py started on a free local port, optionally pinned to some cores."""
+
+    def __init__(self, workers: int, cpus: Optional[List[int]] = None, env: Optional[dict] = None):
+        self.workers = workers
+        self.cpus = cpus
+        self.env = env or {}
+        self.process: Optional[subprocess.Popen] = None
+        self.port: Optional[int] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def cores(self) -> int:
+        """Cores the server may use: its workers, at most the pinned cores."""
+        available = len(self.cpus) if self.cpus else usable_cores()
+        return min(self.workers, available)
+
+    def cpu_seconds(self) -> Optional[float]:
+        return _process_tree_cpu_seconds(self.process.pid) if self.process else None
+
+    def start(self, timeout: float = 300) -> "LocalServer":
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        cpus = self.cpus
+        self.process = subprocess.Popen(
+            [
+                sys.executable, str(Path(__file__).parent / "serve.py"),
+                "--host", "127.0.0.1", "--port", str(self.port),
+                "--workers", str(self.workers), "--log-level", "warning"
+            ],
+            cwd=str(Path(__file__).parent.parent),
+            env={**os.environ, **self.env},
+            preexec_fn=(lambda: os.sched_setaffinity(0, cpus)) if cpus else None
+        )
+        try:
+            LoadClient(self.url, timeout=5).wait_until_healthy(timeout)
+        except Exception:
+            self.stop()
+            raise
+        logger.info(f"Server started on {self.url} (pid {self.process.pid}, {self.workers} workers)")
+        return self
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run_step(
+    client: LoadClient,
+    plan: RequestPlan,
+    target_rps: float,
+    duration: float,
+    concurrency: int,
+    server: Optional[LocalServer] = None,
+    seed: int = 0
+) -> dict:
+    """
+    Send requests at a fixed rate for a while.
+
+    Returns:
+        Throughput, latency percentiles, errors and (with a local server) CPU use of the step
+    """
+    rng = random.Random(seed)
+    n_requests = max(1, int(target_rps * duration))
+    latencies = np.full(n_requests, np.nan)
+    statuses = np.zeros(n_requests, dtype=np.int32)
+    rows = np.zeros(n_requests, dtype=np.int64)
+    lateness = np.zeros(n_requests)
+
+    def send(index: int, scheduled: float, name: str, path: str, body: bytes):
+        statuses[index] = client.request("POST", path, body)
+        latencies[index] = (time.perf_counter() - scheduled) * 1000
+        rows[index] = plan.sizes[name]
+
+    cpu_start = server.cpu_seconds() if server else None
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="loadtest") as executor:
+        start = time.perf_counter()
+        for index in range(n_requests):
+            scheduled = start + index / target_rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            lateness[index] = max(0.0, time.perf_counter() - scheduled) * 1000
+            executor.submit(send, index, scheduled, *plan.draw(rng))
+    # The last request is scheduled just before `duration` ends; do not count the step as shorter
+    elapsed = max(time.perf_counter() - start, duration)
+    cpu_end = server.cpu_seconds() if server else None
+
+    ok = statuses == 200
+    completed = int(ok.sum())
+    step = {
+        "target_rps": round(target_rps, 2),
+        "requests": n_requests,
+        "achieved_rps": round(completed / elapsed, 2),
+        "rows_per_second": round(float(rows[ok].sum()) / elapsed, 1),
+        "error_rate": round(1 - completed / n_requests, 4),
+        "rejected": int((statuses == 503).sum()),
+        "failed": int(((statuses != 200) & (statuses != 503)).sum()),
+        "latency_ms": {
+            f"p{q}": round(float(np.percentile(latencies[ok], q)), 2) if completed else None
+            for q in (50, 90, 95, 99)
+        },
+        "generator_lag_ms": round(float(lateness.mean()), 2),
+        "server_cpu_cores": None
+    }
+    if cpu_start is not None and cpu_end is not None:
+        step["server_cpu_cores"] = round((cpu_end - cpu_start) / elapsed, 2)
+    return step
+
+
+def ramp(
+    client: LoadClient,
+    plan: RequestPlan,
+    slo_ms: float,
+    slo_percentile: int = 95,
+    start_rps: float = 5.0,
+    ramp_factor: float = 1.5,
+    max_steps: int = 20,
+    step_seconds: float = 10.0,
+    concurrency: int = 32,
+    max_error_rate: float = 0.01,
+    server: Optional[LocalServer] = None
+) -> dict:
+    """
+    Raise the request rate step by step until the SLO is breached.
+
+    Returns:
+        The steps run, the reason the ramp stopped and the highest passing rate
+    """
+    steps, best, stop_reason = [], None, "max_steps"
+    rps = start_rps
+    for index in range(max_steps):
+        step = run_step(client, plan, rps, step_seconds, concurrency, server=server, seed=index)
+        latency = step["latency_ms"][f"p{slo_percentile}"]
+        reasons = []
+        if latency is None or latency > slo_ms:
+            reasons.append(f"p{slo_percentile} {latency} ms > {slo_ms} ms")
+        if step["error_rate"] > max_error_rate:
+            reasons.append(f"error rate {step['error_rate']} > {max_error_rate}")
+        if step["achieved_rps"] < SATURATION_RATIO * rps:
+            reasons.append(f"throughput {step['achieved_rps']} < {SATURATION_RATIO:.0%} of {rps:.1f} rps")
+        step["meets_slo"] = not reasons
+        step["generator_bound"] = step["generator_lag_ms"] > GENERATOR_LAG_MS
+        steps.append(step)
+        logger.info(
+            f"{rps:8.1f} rps -> {step['achieved_rps']:8.1f} rps, "
+            f"p{slo_percentile} {latency} ms, errors {step['error_rate']:.2%}"
+            + (f" [{'; '.join(reasons)}]" if reasons else "")
+        )
+        if reasons:
+            stop_reason = "; ".join(reasons)
+            break
+        best = step
+        rps *= ramp_factor
+    return {"steps": steps, "stop_reason": stop_reason, "max_rps_within_slo": best["achieved_rps"] if best else 0.0}
+
+
+def capacity_report(
+    client: LoadClient,
+    model_versions: List[str],
+    mix: List[Tuple[str, int, float]],
+    customers: List[dict],
+    server_cores: int,
+    slo_ms: float,
+    warmup_seconds: float = 5.0,
+    server: Optional[LocalServer] = None,
+    **ramp_options
+) -> dict:
+    """
+    Ramp the traffic mix of every model version and recommend a rate per core.
+
+    Args:
+        client: Client of the server under test
+        model_versions: Model versions to test, one after the other
+        mix: Traffic mix (see parse_mix)
+        customers: Customers used in the payloads
+        server_cores: Cores available to the server
+        slo_ms: Latency SLO of the chosen percentile, in milliseconds
+        warmup_seconds: Traffic at the starting rate sent before each ramp, not reported
+        server: Local server, for CPU measurements
+        **ramp_options: Options of ramp()
+
+    Returns:
+        Report with a curve and a recommendation per model version
+    """
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "mix": [{"type": name, "customers": size, "share": round(weight, 4)} for name, size, weight in mix],
+        "slo": {"percentile": ramp_options.get("slo_percentile", 95), "latency_ms": slo_ms},
+        "server_cores": server_cores,
+        "models": {}
+    }
+    for model_version in model_versions:
+        plan = RequestPlan(mix, model_version, customers)
+        if warmup_seconds > 0:
+            run_step(
+                client, plan, ramp_options.get("start_rps", 5.0), warmup_seconds,
+                ramp_options.get("concurrency", 32)
+            )
+        result = ramp(client, plan, slo_ms, server=server, **ramp_options)
+        best_rps = result["max_rps_within_slo"]
+        result["recommended_rps_per_core"] = round(best_rps / server_cores, 2) if server_cores else None
+        result["generator_bound_steps"] = sum(step["generator_bound"] for step in result["steps"])
+        report["models"][model_version] = result
+    return report
+
+
+def _format_report(report: dict) -> str:
+    slo = report["slo"]
+    lines = [
+        f"SLO p{slo['percentile']} <= {slo['latency_ms']} ms, server cores: {report['server_cores']}, "
+        f"mix: " + ", ".join(f"{m['type']} {m['share']:.0%}" for m in report["mix"])
+    ]
+    for model_version, result in report["models"].items():
+        lines.append("")
+        lines.append(f"{model_version}: {result['recommended_rps_per_core']} rps per core "
+                     f"(max {result['max_rps_within_slo']} rps within SLO; stopped: {result['stop_reason']})")
+        lines.append(f"{'target':>9} {'achieved':>9} {'rows/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} "
+                     f"{'errors':>7} {'cpu':>5}")
+        for step in result["steps"]:
+            latency = step["latency_ms"]
+            lines.append(
+                f"{step['target_rps']:9.1f} {step['achieved_rps']:9.1f} {step['rows_per_second']:9.1f} "
+                f"{latency['p50'] or float('nan'):8.1f} {latency['p95'] or float('nan'):8.1f} "
+                f"{latency['p99'] or float('nan'):8.1f} {step['error_rate']:7.2%} "
+                + (f"{step['server_cpu_cores']:5.2f}  " if step['server_cpu_cores'] is not None else f"{'-':>5}  ")
+                + ("ok" if step["meets_slo"] else "SLO breached")
+                + (" (generator lagging)" if step["generator_bound"] else "")
+            )
+    return "\n".join(lines)
+
+
+def _parse_cpus(value: Optional[str]) -> Optional[List[int]]:
+    """Parse a CPU list such as "0-3,6"."""
+    if not value:
+        return None
+    cpus = []
+    for part in value.split(","):
+        low, _, high = part.partition("-")
+        cpus.extend(range(int(low), int(high or low) + 1))
+    return cpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API and recommend requests per second per core")
+    parser.add_argument("--url", help="Server to test (e.g. http://127.0.0.1:8000)")
+    parser.add_argument("--start-server", action="store_true", help="Start api/serve.py on a free local port")
+    parser.add_argument("--server-workers", type=int, default=0, help="Workers of the started server (default: its cores)")
+    parser.add_argument("--server-cpus", help="Pin the started server to these CPUs, e.g. 0-3")
+    parser.add_argument("--server-cores", type=int, help="Cores of the --url server (for rps per core)")
+    parser.add_argument("--model-version", nargs="+", default=["v1_lr", "v3_gb"])
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--payloads", default=str(DEFAULT_SAMPLE_DATA), help="JSON array of customers")
+    parser.add_argument("--slo-ms", type=float, default=100.0)
+    parser.add_argument("--slo-percentile", type=int, default=95, choices=(50, 90, 95, 99))
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--start-rps", type=float, default=5.0)
+    parser.add_argument("--ramp-factor", type=float, default=1.5)
+    parser.add_argument("--max-steps", type=int, default=20)
+    parser.add_argument("--step-seconds", type=float, default=10.0)
+    parser.add_argument("--warmup-seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum requests in flight")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if bool(args.url) == args.start_server:
+        parser.error("Give either --url or --start-server")
+    if args.ramp_factor <= 1:
+        parser.error("--ramp-factor must be greater than 1")
+
+    mix = parse_mix(args.mix)
+    largest = max(size for _, size, _ in mix)
+    customers = load_customers(Path(args.payloads), max(largest * 4, 1000))
+    options = dict(
+        slo_percentile=args.slo_percentile,
+        start_rps=args.start_rps,
+        ramp_factor=args.ramp_factor,
+        max_steps=args.max_steps,
+        step_seconds=args.step_seconds,
+        concurrency=args.concurrency,
+        max_error_rate=args.max_error_rate
+    )
+
+    if args.start_server:
+        cpus = _parse_cpus(args.server_cpus)
+        workers = args.server_workers or (len(cpus) if cpus else usable_cores())
+        with LocalServer(workers, cpus) as server:
+            client = LoadClient(server.url, args.timeout)
+            report = capacity_report(
+                client, args.model_version, mix, customers, server.cores, args.slo_ms,
+                warmup_seconds=args.warmup_seconds, server=server, **options
+            )
+    else:
+        client = LoadClient(args.url, args.timeout)
+        client.wait_until_healthy(30)
+        report = capacity_report(
+            client, args.model_version, mix, customers, args.server_cores or 0, args.slo_ms,
+            warmup_seconds=args.warmup_seconds, **options
+        )
+
+    print(_format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 """
 FastAPI application for Churn Prediction Model.
 """
-from fastapi import FastAPI, HTTPException, Query, status
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, List
+from fastapi.concurrency import run_in_threadpool
+from anyio import from_thread
+from typing import Callable, Optional, List
+import asyncio
 import logging
 import os
+import time
+import numpy as np
+import pandas as pd
 from contextlib import asynccontextmanager
 
 from .models import (
@@ -16,9 +22,53 @@ from .models import (
     BatchPredictionResponse,
     BatchPredictionResult,
     HealthResponse,
-    ErrorResponse
+    ErrorResponse,
+    FeatureContribution,
+    PredictionExplanation,
+    JobInfo,
+    JobResult,
+    JobResultsPage,
+    TopRiskQuery,
+    TopRiskResponse,
+    AtRiskCustomer,
+    CubeQuery,
+    CubeResponse,
+    WhatIfRequest,
+    WhatIfResponse,
+    WhatIfScenario
 )
 from .services import get_model_service, get_model_manager
+from .monitoring import get_drift_monitor
+from .codecs import (
+    MEDIA_JSON,
+    MEDIA_ARROW,
+    MEDIA_MSGPACK,
+    UnsupportedMediaType,
+    decode_columnar,
+    encode_columnar,
+    negotiate_media_type,
+    validate_frame
+)
+from .jobs import JOB_STATUSES, get_job_runner, get_job_store, read_upload
+from .explain import get_explainer, top_contributions
+from .scores import DEFAULT_ID_COLUMN, get_score_store, read_snapshot, rescore_snapshot
+from .population import get_population_index
+from .cube import get_churn_cube
+from .whatif import WhatIfSweep
+from .coordinator import SHARD_HEADER, BackendsUnavailable, get_coordinator
+from .workers import get_worker_pool
+from .evaluation import DEFAULT_LABEL_COLUMN, DEFAULT_THRESHOLDS, evaluate_stream, iter_labeled_chunks
+from .admission import (
+    BULK,
+    BULK_SLICE_ROWS,
+    INTERACTIVE,
+    AdmissionRejected,
+    ClientDisconnected,
+    Deadline,
+    DeadlineExceeded,
+    RequestCancelled,
+    get_admission_controller
+)
 
 # Configure logging
 logging.basicConfig(
@@ -30,6 +80,17 @@ logger = logging.getLogger(__name__)
 # API version
 API_VERSION = "1.0.0"
 
+# Maximum rows accepted by the columnar batch endpoint
+MAX_COLUMNAR_BATCH_SIZE = 100000
+
+# Time budget of a request in milliseconds, counted from its arrival (or the deadline_ms query parameter)
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+# Set on responses holding the results of only the first customers of a batch
+PARTIAL_HEADER = "X-Partial-Results"
+
+# Maximum rows explained per request (bounds the added latency)
+MAX_EXPLAIN_ROWS = 1000
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -46,10 +107,24 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error during startup: {str(e)}")
     
+    try:
+        # Build the drift baseline now rather than on the first scored request
+        get_drift_monitor().baseline
+    except Exception as e:
+        logger.warning(f"Drift monitoring disabled: {str(e)}")
+    
+    try:
+        # Resume interrupted batch jobs and start processing the queue
+        get_job_runner().start(asyncio.get_running_loop())
+    except Exception as e:
+        logger.error(f"Error starting job workers: {str(e)}")
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Churn Prediction API...")
+    get_job_runner().stop()
+    get_worker_pool().stop()
 
 
 # Create FastAPI app
@@ -93,6 +168,21 @@ app.add_middleware(
 )
 
 
+class RequestClockMiddleware:
+    """Record when each request arrived, so deadlines include the time spent reading the body."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["received_at"] = time.monotonic()
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(RequestClockMiddleware)
+
+
 # Exception handlers
 @app.exception_handler(ValueError)
 async def value_error_handler(request, exc):
@@ -120,6 +210,46 @@ async def runtime_error_handler(request, exc):
     )
 
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc):
+    """Handle requests turned away by admission control."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"},
+        content={
+            "error": "Server busy",
+            "detail": str(exc),
+            "status_code": status.HTTP_503_SERVICE_UNAVAILABLE
+        }
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request, exc):
+    """Handle requests whose deadline passed before their results were ready."""
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={
+            "error": "Deadline exceeded",
+            "detail": str(exc),
+            "status_code": status.HTTP_504_GATEWAY_TIMEOUT
+        }
+    )
+
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request, exc):
+    """Handle requests abandoned by their client (the response is not delivered)."""
+    return JSONResponse(
+        status_code=499,
+        content={
+            "error": "Client closed request",
+            "detail": str(exc),
+            "status_code": 499
+        }
+    )
+
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """Handle general exceptions."""
@@ -273,11 +403,17 @@ async def model_info(model_version: str = Query("v1_lr", description="Model vers
                 detail=f"Model {model_version} is not loaded"
             )
         
+        row_latency_ms = model_service.row_latency_ms()
         return {
             "model_version": model_version,
             "model_path": str(model_service.model_path),
             "model_loaded": True,
-            "model_type": type(model_service.model).__name__
+            "model_type": type(model_service.model).__name__,
+            "warm": model_service.is_warm,
+            "warmup_timings": model_service.warmup_timings,
+            "row_latency_ms": round(row_latency_ms, 4) if row_latency_ms is not None else None,
+            "row_latency": model_service.row_latency.to_dict(),
+            "batch_deduplication": model_service.dedup_report()
         }
     except ValueError as e:
         raise HTTPException(
@@ -294,6 +430,316 @@ async def model_info(model_version: str = Query("v1_lr", description="Model vers
         )
 
 
+@app.post(
+    "/evaluate",
+    tags=["Models"],
+    summary="Evaluate models on labeled data",
+    description=(
+        "Upload a labeled extract (CSV, Parquet, JSON Lines, Excel or JSON) with the feature columns "
+        "and a churn label. The file is streamed in chunks through every requested model version "
+        "in one pass; the report holds confusion matrices per threshold, ROC-AUC, Brier score and log loss."
+    )
+)
+async def evaluate_models(
+    file: UploadFile = File(..., description="Labeled extract with the feature columns and a label column"),
+    model_version: List[str] = Query(["v1_lr"], description="Model versions to evaluate (repeatable)"),
+    label_column: str = Query(DEFAULT_LABEL_COLUMN, description="Column holding the churn label (0/1 or Yes/No)"),
+    threshold: Optional[List[float]] = Query(None, description="Thresholds to report (repeatable; default 0.05 to 0.95)")
+):
+    """Evaluate model versions on an uploaded labeled extract."""
+    try:
+        chunks = iter_labeled_chunks(file.file, filename=file.filename or "", label_column=label_column)
+        return await run_in_threadpool(
+            evaluate_stream, chunks, model_version, thresholds=threshold or DEFAULT_THRESHOLDS, score=_bulk_score
+        )
+    except AdmissionRejected:
+        raise
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Evaluation error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred during evaluation"
+        )
+
+
+@app.get(
+    "/monitoring/drift",
+    tags=["Monitoring"],
+    summary="Drift report",
+    description="Compare live feature and prediction distributions with the training baseline (PSI/KS)"
+)
+async def drift_report(model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, or v3_gb")):
+    """Get the drift and data-quality report for live traffic."""
+    try:
+        model_service = get_model_service(model_version=model_version)
+        monitor = get_drift_monitor()
+        return monitor.drift_report(model_version, scorer=model_service.score_frame)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error computing drift report: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error computing drift report"
+        )
+
+
+@app.post(
+    "/monitoring/reset",
+    tags=["Monitoring"],
+    summary="Reset drift monitor",
+    description="Clear the live distribution sketches (e.g. after a deploy)"
+)
+async def reset_drift_monitor():
+    """Reset the live drift sketches."""
+    get_drift_monitor().reset()
+    return {"message": "Drift monitor reset"}
+
+
+@app.get(
+    "/shadow/stats",
+    tags=["Monitoring"],
+    summary="Shadow model comparison",
+    description=(
+        "Agreement and probability differences between each primary model and its shadow model "
+        "(SHADOW_MODELS) on the sampled live traffic"
+    )
+)
+async def shadow_stats():
+    """Get the shadow scoring aggregates per primary model version."""
+    return {
+        model_key: scorer.stats()
+        for model_key, scorer in get_model_manager().shadow_scorers().items()
+    }
+
+
+@app.post(
+    "/shadow/reset",
+    tags=["Monitoring"],
+    summary="Reset shadow statistics",
+    description="Clear the shadow comparison aggregates (e.g. after replacing a shadow model)"
+)
+async def reset_shadow_stats():
+    """Reset the shadow scoring aggregates."""
+    for scorer in get_model_manager().shadow_scorers().values():
+        scorer.reset()
+    return {"message": "Shadow statistics reset"}
+
+
+@app.get(
+    "/admission/stats",
+    tags=["Monitoring"],
+    summary="Admission control statistics",
+    description="Concurrency, queue depth, rejections and wait/service times of the interactive and bulk lanes"
+)
+async def admission_stats():
+    """Get per-lane admission control metrics."""
+    return get_admission_controller().stats()
+
+
+@app.get(
+    "/coordinator/stats",
+    tags=["Monitoring"],
+    summary="Coordinator statistics",
+    description="Shard fan-out counters and per-backend connections, failures and latency"
+)
+async def coordinator_stats():
+    """Get coordinator fan-out metrics per backend."""
+    return get_coordinator().stats()
+
+
+@app.get(
+    "/workers/stats",
+    tags=["Monitoring"],
+    summary="Model worker processes",
+    description="Health, restarts and CPU usage of the per-model worker processes (MODEL_EXECUTION_MODE=process)"
+)
+async def worker_stats():
+    """Get per-model worker process health and CPU usage."""
+    return get_worker_pool().stats()
+
+
+def _explain(
+    model_service,
+    customers_data: List[dict],
+    top_k: Optional[int],
+    response: Response
+) -> List[PredictionExplanation]:
+    """
+    Explain the predictions for a list of customers.
+    
+    The time spent is reported in the X-Explanation-Time-Ms response header.
+    """
+    if len(customers_data) > MAX_EXPLAIN_ROWS:
+        raise ValueError(
+            f"Too many customers to explain. Maximum {MAX_EXPLAIN_ROWS} per request "
+            f"(use pagination), got {len(customers_data)}"
+        )
+    
+    start = time.perf_counter()
+    explainer = get_explainer(model_service)
+    contributions = explainer.explain(pd.DataFrame(customers_data))
+    explanations = [
+        PredictionExplanation(
+            method=explainer.method,
+            units=explainer.units,
+            base_value=explainer.base_value,
+            contributions=[
+                FeatureContribution(feature=feature, contribution=value)
+                for feature, value in ranked
+            ]
+        )
+        for ranked in top_contributions(contributions, top_k)
+    ]
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    response.headers["X-Explanation-Time-Ms"] = f"{elapsed_ms:.2f}"
+    return explanations
+
+
+def request_deadline(
+    request: Request,
+    deadline_ms: Optional[float] = Query(
+        None, gt=0, description=f"Time budget in milliseconds from the request's arrival (or the {DEADLINE_HEADER} header)"
+    )
+) -> Optional[Deadline]:
+    """Deadline of a request from the header or query parameter (the tighter one if both are given)."""
+    budgets = [deadline_ms] if deadline_ms is not None else []
+    header = request.headers.get(DEADLINE_HEADER)
+    if header is not None:
+        try:
+            budgets.append(float(header))
+        except ValueError:
+            budgets.append(-1.0)
+        if not budgets[-1] > 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid {DEADLINE_HEADER} header {header!r}. Expected a positive number of milliseconds"
+            )
+    if not budgets:
+        return None
+    return Deadline(min(budgets), getattr(request.state, "received_at", None))
+
+
+async def _score_slices(
+    score: Callable,
+    n_rows: int,
+    take: Callable,
+    deadline: Optional[Deadline] = None,
+    http_request: Optional[Request] = None,
+    allow_partial: bool = False
+):
+    """
+    Score a batch slice by slice through admission control.
+
+    Large batches go to the bulk lane and every slice is admitted
+    separately, so interactive requests can be admitted between slices.
+    Before each slice, the batch is stopped if its deadline has passed
+    (DeadlineExceeded) or its client has disconnected (ClientDisconnected),
+    so the slot goes to other work instead.
+
+    Args:
+        score: Scoring function taking a slice
+        n_rows: Rows in the batch
+        take: Function returning the slice of rows [start, stop)
+        deadline: Request deadline
+        http_request: Request whose client is checked for disconnection
+        allow_partial: On deadline, return the slices scored so far instead of failing
+
+    Returns:
+        Tuple of (predictions, probabilities, complete) where complete is
+        False if only the first rows were scored
+    """
+    controller = get_admission_controller()
+    lane = controller.lane_for_batch(n_rows)
+    predictions, probabilities = [], []
+    starts = range(0, n_rows, BULK_SLICE_ROWS)
+    for done, start in enumerate(starts):
+        reason = None
+        if deadline is not None and deadline.expired():
+            reason = "deadline_exceeded"
+        elif http_request is not None and await http_request.is_disconnected():
+            reason = "client_disconnected"
+        if reason is None:
+            try:
+                preds, probs = await controller.run(
+                    lane, score, take(start, start + BULK_SLICE_ROWS), deadline=deadline
+                )
+                predictions.append(preds)
+                probabilities.append(probs)
+                continue
+            except DeadlineExceeded:
+                reason = "deadline_exceeded"
+
+        partial = reason == "deadline_exceeded" and allow_partial and bool(predictions)
+        controller.record_cancellation(reason, len(starts) - done, n_rows - start, partial=partial)
+        if partial:
+            logger.info(f"Deadline passed after {start} of {n_rows} rows; returning partial results")
+            return np.concatenate(predictions), np.concatenate(probabilities), False
+        if reason == "client_disconnected":
+            raise ClientDisconnected(f"Client disconnected after {start} of {n_rows} rows were scored")
+        raise DeadlineExceeded(
+            f"Request deadline of {deadline.budget_ms:g} ms passed after {start} of {n_rows} rows were scored"
+        )
+    if not predictions:
+        return np.array([], dtype=int), np.array([], dtype=float), True
+    return np.concatenate(predictions), np.concatenate(probabilities), True
+
+
+async def _score_batch(model_service, customers_data: List[dict], **options):
+    """
+    Score a list of customers through admission control (see _score_slices for the options).
+
+    Returns:
+        Tuple of (predictions, probabilities, complete)
+    """
+    return await _score_slices(
+        model_service.predict_arrays, len(customers_data), lambda start, stop: customers_data[start:stop], **options
+    )
+
+
+async def _score_frame(model_service, df: pd.DataFrame, **options):
+    """Columnar counterpart of _score_batch; returns (predictions, probabilities, complete)."""
+    return await _score_slices(
+        model_service.predict_frame, len(df), lambda start, stop: df.iloc[start:stop], **options
+    )
+
+
+def _bulk_score(model_service, df: pd.DataFrame):
+    """
+    Score rows on the bulk lane, one admitted slice at a time.
+
+    For blocking code run with run_in_threadpool (rescoring, evaluation),
+    which would otherwise score whole chunks outside admission control.
+
+    Returns:
+        Tuple of (predictions, probabilities)
+    """
+    controller = get_admission_controller()
+    predictions, probabilities = [], []
+    for start in range(0, len(df), BULK_SLICE_ROWS):
+        preds, probs = from_thread.run(
+            controller.run, BULK, model_service.score_batch, df.iloc[start:start + BULK_SLICE_ROWS]
+        )
+        predictions.append(preds)
+        probabilities.append(probs)
+    if not predictions:
+        return np.array([], dtype=int), np.array([], dtype=float)
+    return np.concatenate(predictions), np.concatenate(probabilities)
+
+
 @app.post(
     "/predict",
     response_model=PredictionResult,
@@ -308,17 +754,31 @@ async def model_info(model_version: str = Query("v1_lr", description="Model vers
 )
 async def predict_single(
     customer: CustomerInput,
-    model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, or v3_gb")
+    response: Response,
+    model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, v3_gb or v3_gb_student"),
+    explain: bool = Query(False, description="Include per-feature contributions"),
+    top_k: Optional[int] = Query(None, ge=1, le=20, description="Only return the k largest contributions"),
+    latency_budget_ms: Optional[float] = Query(
+        None, gt=0, description="Scoring time allowed; falls back to the distilled student if the model is slower"
+    )
 ):
     """
     Predict churn for a single customer.
     
+    With a latency budget, the model version is replaced by its distilled
+    student (e.g. v3_gb -> v3_gb_student) when the requested model's
+    expected scoring time exceeds the budget. The version used is returned
+    in the X-Model-Version header.
+    
     Returns:
     - churn_prediction: 0 (No churn) or 1 (Churn)
     - churn_probability: Probability of churn (0-1)
     - churn_label: "Yes" or "No"
     """
     try:
+        if latency_budget_ms is not None:
+            model_version = await run_in_threadpool(get_model_manager().select_model, model_version, latency_budget_ms)
+        response.headers["X-Model-Version"] = model_version
         model_service = get_model_service(model_version=model_version)
         
         if not model_service.is_loaded():
@@ -330,13 +790,24 @@ async def predict_single(
         # Convert Pydantic model to dict
         customer_dict = customer.model_dump(by_alias=True)
         
-        # Make prediction
-        prediction, probability = model_service.predict_single(customer_dict)
+        # Make prediction on a scoring slot of the interactive lane
+        controller = get_admission_controller()
+        prediction, probability = await controller.run(
+            INTERACTIVE, model_service.predict_single, customer_dict
+        )
+        
+        explanation = None
+        if explain:
+            explanations = await controller.run(
+                INTERACTIVE, _explain, model_service, [customer_dict], top_k, response
+            )
+            explanation = explanations[0]
         
         return PredictionResult(
             churn_prediction=prediction,
             churn_probability=probability,
-            churn_label="Yes" if prediction == 1 else "No"
+            churn_label="Yes" if prediction == 1 else "No",
+            explanation=explanation
         )
     
     except ValueError as e:
@@ -344,7 +815,7 @@ async def predict_single(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
-    except HTTPException:
+    except (HTTPException, AdmissionRejected):
         raise
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}", exc_info=True)
@@ -362,9 +833,16 @@ async def predict_single(
     summary="Single prediction (Logistic Regression)",
     description="Predict churn using Logistic Regression model (v1_lr)"
 )
-async def predict_v1_lr(customer: CustomerInput):
+async def predict_v1_lr(
+    customer: CustomerInput,
+    response: Response,
+    explain: bool = Query(False, description="Include per-feature contributions"),
+    top_k: Optional[int] = Query(None, ge=1, le=20, description="Only return the k largest contributions")
+):
     """Predict churn using Logistic Regression model."""
-    return await predict_single(customer, model_version="v1_lr")
+    return await predict_single(
+        customer, response, model_version="v1_lr", explain=explain, top_k=top_k, latency_budget_ms=None
+    )
 
 
 @app.post(
@@ -374,9 +852,16 @@ async def predict_v1_lr(customer: CustomerInput):
     summary="Single prediction (Random Forest)",
     description="Predict churn using Random Forest model (v2_rf)"
 )
-async def predict_v2_rf(customer: CustomerInput):
+async def predict_v2_rf(
+    customer: CustomerInput,
+    response: Response,
+    explain: bool = Query(False, description="Include per-feature contributions"),
+    top_k: Optional[int] = Query(None, ge=1, le=20, description="Only return the k largest contributions")
+):
     """Predict churn using Random Forest model."""
-    return await predict_single(customer, model_version="v2_rf")
+    return await predict_single(
+        customer, response, model_version="v2_rf", explain=explain, top_k=top_k, latency_budget_ms=None
+    )
 
 
 @app.post(
@@ -386,9 +871,20 @@ async def predict_v2_rf(customer: CustomerInput):
     summary="Single prediction (Gradient Boosting)",
     description="Predict churn using Gradient Boosting model (v3_gb)"
 )
-async def predict_v3_gb(customer: CustomerInput):
+async def predict_v3_gb(
+    customer: CustomerInput,
+    response: Response,
+    explain: bool = Query(False, description="Include per-feature contributions"),
+    top_k: Optional[int] = Query(None, ge=1, le=20, description="Only return the k largest contributions"),
+    latency_budget_ms: Optional[float] = Query(
+        None, gt=0, description="Scoring time allowed; falls back to v3_gb_student if v3_gb is slower"
+    )
+):
     """Predict churn using Gradient Boosting model."""
-    return await predict_single(customer, model_version="v3_gb")
+    return await predict_single(
+        customer, response, model_version="v3_gb", explain=explain, top_k=top_k,
+        latency_budget_ms=latency_budget_ms
+    )
 
 
 @app.post(
@@ -405,6 +901,8 @@ async def predict_v3_gb(customer: CustomerInput):
 )
 async def predict_batch(
     request: BatchPredictionRequest,
+    response: Response,
+    http_request: Request,
     page: Optional[int] = Query(
         None,
         ge=1,
@@ -416,7 +914,11 @@ async def predict_batch(
         le=1000,
         description="Number of items per page (max 1000). If not provided, returns all results."
     ),
-    model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, or v3_gb")
+    model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, or v3_gb"),
+    explain: bool = Query(False, description="Include per-feature contributions (max 1000 customers per page)"),
+    top_k: Optional[int] = Query(None, ge=1, le=20, description="Only return the k largest contributions"),
+    deadline: Optional[Deadline] = Depends(request_deadline),
+    allow_partial: bool = Query(False, description="If the deadline passes, return the customers scored so far, marked partial")
 ):
     # Validate batch size
     if len(request.customers) > 10000:
@@ -435,6 +937,7 @@ async def predict_batch(
     - total_customers: Total number of customers processed
     - predictions: List of prediction results
     - page, page_size, total_pages: Pagination info (if paginated)
+    - partial: True if the deadline passed and only the first customers were scored
     """
     try:
         model_service = get_model_service(model_version=model_version)
@@ -451,31 +954,41 @@ async def predict_batch(
             for customer in request.customers
         ]
         
-        # Make batch prediction
-        predictions, total_count = model_service.predict_batch(
-            customers_data,
-            page=page,
-            page_size=page_size
-        )
-        
-        # Calculate pagination info
+        # Only the requested page is scored
+        total_count = len(customers_data)
         total_pages = None
+        start_idx = 0
+        end_idx = total_count
         if page is not None and page_size is not None:
             total_pages = (total_count + page_size - 1) // page_size
+            start_idx = (page - 1) * page_size
+            end_idx = start_idx + page_size
+        page_data = customers_data[start_idx:end_idx]
+        
+        # Make batch prediction through admission control
+        predictions, probabilities, complete = await _score_batch(
+            model_service, page_data, deadline=deadline, http_request=http_request, allow_partial=allow_partial
+        )
+        if not complete:
+            response.headers[PARTIAL_HEADER] = "true"
         
         # Build response
         results = []
-        start_idx = 0
-        if page is not None and page_size is not None:
-            start_idx = (page - 1) * page_size
+        explanations = [None] * len(predictions)
+        if explain:
+            controller = get_admission_controller()
+            explanations = await controller.run(
+                controller.lane_for_batch(len(predictions)),
+                _explain, model_service, page_data[:len(predictions)], top_k, response
+            )
         
-        for idx, (pred, prob) in enumerate(predictions):
+        for idx, (pred, prob) in enumerate(zip(predictions.tolist(), probabilities.tolist())):
             customer_idx = start_idx + idx
             results.append(
                 BatchPredictionResult(
                     customer_index=customer_idx,
                     input=request.customers[customer_idx],
-                    prediction=PredictionResult.create(pred, prob)
+                    prediction=PredictionResult.create(pred, prob, explanations[idx])
                 )
             )
         
@@ -484,7 +997,8 @@ async def predict_batch(
             predictions=results,
             page=page,
             page_size=page_size,
-            total_pages=total_pages
+            total_pages=total_pages,
+            partial=not complete
         )
     
     except ValueError as e:
@@ -492,7 +1006,7 @@ async def predict_batch(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
-    except HTTPException:
+    except (HTTPException, AdmissionRejected, RequestCancelled):
         raise
     except Exception as e:
         logger.error(f"Batch prediction error: {str(e)}", exc_info=True)
@@ -511,13 +1025,20 @@ async def predict_batch(
 )
 async def predict_batch_simple(
     customers: List[CustomerInput],
-    model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, or v3_gb")
+    response: Response,
+    http_request: Request,
+    model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, or v3_gb"),
+    explain: bool = Query(False, description="Include per-feature contributions (max 1000 customers)"),
+    top_k: Optional[int] = Query(None, ge=1, le=20, description="Only return the k largest contributions"),
+    deadline: Optional[Deadline] = Depends(request_deadline),
+    allow_partial: bool = Query(False, description="If the deadline passes, return the customers scored so far, marked partial")
 ):
     """
     Simple batch prediction endpoint that accepts a JSON array.
     
     This is an alternative to /predict/batch that accepts a simple array
-    of customer objects without pagination.
+    of customer objects without pagination. Partial results (see
+    allow_partial) are flagged by the X-Partial-Results header.
     """
     # Validate batch size
     if len(customers) > 10000:
@@ -541,13 +1062,25 @@ async def predict_batch_simple(
             for customer in customers
         ]
         
-        # Make predictions
-        predictions, _ = model_service.predict_batch(customers_data)
+        # Make predictions through admission control
+        predictions, probabilities, complete = await _score_batch(
+            model_service, customers_data, deadline=deadline, http_request=http_request, allow_partial=allow_partial
+        )
+        if not complete:
+            response.headers[PARTIAL_HEADER] = "true"
+        
+        explanations = [None] * len(predictions)
+        if explain:
+            controller = get_admission_controller()
+            explanations = await controller.run(
+                controller.lane_for_batch(len(predictions)),
+                _explain, model_service, customers_data[:len(predictions)], top_k, response
+            )
         
         # Build response
         results = [
-            PredictionResult.create(pred, prob)
-            for pred, prob in predictions
+            PredictionResult.create(pred, prob, explanation)
+            for pred, prob, explanation in zip(predictions.tolist(), probabilities.tolist(), explanations)
         ]
         
         return results
@@ -557,7 +1090,7 @@ async def predict_batch_simple(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
-    except HTTPException:
+    except (HTTPException, AdmissionRejected, RequestCancelled):
         raise
     except Exception as e:
         logger.error(f"Batch prediction error: {str(e)}", exc_info=True)
@@ -567,6 +1100,456 @@ async def predict_batch_simple(
         )
 
 
+@app.post(
+    "/predict/batch/columnar",
+    tags=["Predictions"],
+    summary="Columnar batch prediction (JSON, MessagePack or Arrow)",
+    description=(
+        "High-volume batch endpoint. The body holds one array per feature column "
+        f"and may be sent as {MEDIA_JSON}, {MEDIA_MSGPACK} or {MEDIA_ARROW} (Content-Type). "
+        "The response format follows the Accept header (defaults to the request format) "
+        "and contains the churn_prediction and churn_probability columns. "
+        "In coordinator mode (COORDINATOR_BACKENDS), large batches are sharded across the backends."
+    ),
+    responses={
+        200: {"description": "Successful batch prediction"},
+        400: {"description": "Invalid input data"},
+        415: {"description": "Unsupported payload format"},
+        502: {"description": "A shard failed on every coordinator backend"},
+        500: {"description": "Model prediction error"}
+    }
+)
+async def predict_batch_columnar(
+    request: Request,
+    model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, or v3_gb"),
+    deadline: Optional[Deadline] = Depends(request_deadline),
+    allow_partial: bool = Query(False, description="If the deadline passes, return the customers scored so far, marked partial")
+):
+    """
+    Columnar batch prediction with content negotiation.
+    
+    The batch is scored directly as a DataFrame: no per-row dicts or
+    Pydantic models are built on either side of the model call. Partial
+    results (see allow_partial) are flagged by the X-Partial-Results header.
+    """
+    content_type = request.headers.get("content-type")
+    
+    try:
+        response_type = negotiate_media_type(request.headers.get("accept"), content_type)
+        df = decode_columnar(await request.body(), content_type)
+        
+        # A coordinator fans large batches out to its backends (never a shard it was sent)
+        coordinator = get_coordinator()
+        fan_out = coordinator.should_fan_out(len(df)) and SHARD_HEADER not in request.headers
+        max_rows = MAX_COLUMNAR_BATCH_SIZE * (len(coordinator.backends) if fan_out else 1)
+        if len(df) > max_rows:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Batch size too large. Maximum {max_rows} customers allowed, got {len(df)}"
+            )
+        
+        if fan_out:
+            predictions, probabilities = await run_in_threadpool(
+                coordinator.score_frame, validate_frame(df), model_version
+            )
+            return Response(
+                content=encode_columnar(predictions, probabilities, response_type),
+                media_type=response_type
+            )
+        
+        model_service = get_model_service(model_version=model_version)
+        
+        if not model_service.is_loaded():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Model {model_version} is not loaded"
+            )
+        
+        predictions, probabilities, complete = await _score_frame(
+            model_service, validate_frame(df), deadline=deadline, http_request=request, allow_partial=allow_partial
+        )
+        
+        return Response(
+            content=encode_columnar(predictions, probabilities, response_type),
+            media_type=response_type,
+            headers={} if complete else {PARTIAL_HEADER: "true"}
+        )
+    
+    except UnsupportedMediaType as e:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=str(e)
+        )
+    except BackendsUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except (HTTPException, AdmissionRejected, RequestCancelled):
+        raise
+    except Exception as e:
+        logger.error(f"Columnar batch prediction error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred during batch prediction"
+        )
+
+
+@app.post(
+    "/predict/what-if",
+    response_model=WhatIfResponse,
+    tags=["Predictions"],
+    summary="What-if sweep",
+    description=(
+        "Score base customers under every combination of feature changes: `overrides` sets "
+        "columns to values, `deltas` offsets numeric columns. Returns the churn probability "
+        "and its change from the base for each customer and scenario."
+    )
+)
+async def predict_what_if(
+    request: WhatIfRequest,
+    model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, or v3_gb")
+):
+    """Run a what-if sweep over a batch of customers."""
+    try:
+        model_service = get_model_service(model_version=model_version)
+        
+        if not model_service.is_loaded():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Model {model_version} is not loaded"
+            )
+        
+        base = pd.DataFrame([customer.model_dump(by_alias=True) for customer in request.customers])
+        sweep = WhatIfSweep(base, request.overrides, request.deltas)
+        
+        # Chunks of the scenario matrix go through admission control like batch slices
+        controller = get_admission_controller()
+        lane = controller.lane_for_batch(sweep.n_customers * sweep.n_scenarios)
+        chunks = [
+            await controller.run(lane, sweep.score_chunk, model_service, start, stop)
+            for start, stop in sweep.chunks()
+        ]
+        probabilities = np.vstack(chunks)
+        base_probabilities = probabilities[:, 0]
+        scenario_probabilities = probabilities[:, 1:]
+        deltas = scenario_probabilities - base_probabilities[:, None]
+        
+        return WhatIfResponse(
+            model_version=model_version,
+            total_customers=sweep.n_customers,
+            total_scenarios=sweep.n_scenarios - 1,
+            base_probabilities=base_probabilities.tolist(),
+            scenarios=[
+                WhatIfScenario(
+                    scenario_index=idx,
+                    mean_probability_delta=float(deltas[:, idx].mean()),
+                    **sweep.describe(idx)
+                )
+                for idx in range(sweep.n_scenarios - 1)
+            ],
+            probabilities=scenario_probabilities.tolist(),
+            probability_deltas=deltas.tolist()
+        )
+    
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except (HTTPException, AdmissionRejected):
+        raise
+    except Exception as e:
+        logger.error(f"What-if sweep error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred during the what-if sweep"
+        )
+
+
+def _submit_job(df, model_version: str, source: str) -> JobInfo:
+    """Store a validated batch as a job and wake the workers."""
+    # Fail fast on unknown or missing models
+    get_model_service(model_version=model_version)
+    record = get_job_store().create_job(df, model_version, source=source)
+    get_job_runner().notify()
+    logger.info(f"Job {record['id']} queued ({len(df)} rows, {model_version})")
+    return JobInfo.from_record(record)
+
+
+@app.post(
+    "/jobs",
+    response_model=JobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Jobs"],
+    summary="Submit a batch job",
+    description="Queue a batch for asynchronous scoring. Poll /jobs/{job_id} and download /jobs/{job_id}/results."
+)
+async def submit_job(
+    request: BatchPredictionRequest,
+    model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, or v3_gb")
+):
+    """Submit a batch of customers as an asynchronous job."""
+    try:
+        customers_data = [
+            customer.model_dump(by_alias=True)
+            for customer in request.customers
+        ]
+        return _submit_job(pd.DataFrame(customers_data), model_version, source="json")
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Job submission error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while submitting the job"
+        )
+
+
+@app.post(
+    "/jobs/file",
+    response_model=JobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Jobs"],
+    summary="Submit a batch job from a file",
+    description="Queue a CSV or JSON file of customers for asynchronous scoring"
+)
+async def submit_job_file(
+    file: UploadFile = File(..., description="CSV with the feature columns, or JSON customers"),
+    model_version: str = Query("v1_lr", description="Model version: v1_lr, v2_rf, or v3_gb")
+):
+    """Submit an uploaded file as an asynchronous job."""
+    try:
+        df = read_upload(await file.read(), file.filename)
+        return _submit_job(df, model_version, source=file.filename or "upload")
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Job submission error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while submitting the job"
+        )
+
+
+@app.get(
+    "/jobs",
+    response_model=List[JobInfo],
+    tags=["Jobs"],
+    summary="List batch jobs",
+    description="List the most recent batch jobs"
+)
+async def list_jobs(
+    job_status: Optional[str] = Query(None, alias="status", description=f"Filter by status: {', '.join(JOB_STATUSES)}"),
+    limit: int = Query(50, ge=1, le=1000, description="Maximum number of jobs to return")
+):
+    """List recent batch jobs."""
+    records = get_job_store().list_jobs(status=job_status, limit=limit)
+    return [JobInfo.from_record(record) for record in records]
+
+
+@app.get(
+    "/jobs/{job_id}",
+    response_model=JobInfo,
+    tags=["Jobs"],
+    summary="Batch job status",
+    description="Get the status and progress of a batch job"
+)
+async def get_job(job_id: str):
+    """Get a batch job's status."""
+    record = get_job_store().get_job(job_id)
+    if record is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found"
+        )
+    return JobInfo.from_record(record)
+
+
+@app.get(
+    "/jobs/{job_id}/results",
+    response_model=JobResultsPage,
+    tags=["Jobs"],
+    summary="Batch job results",
+    description="Download the results scored so far, one page at a time"
+)
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="Customer index of the first result"),
+    limit: int = Query(1000, ge=1, le=10000, description="Number of results per page (max 10000)")
+):
+    """Get a page of batch job results."""
+    store = get_job_store()
+    record = store.get_job(job_id)
+    if record is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found"
+        )
+    
+    rows = store.get_results(job_id, offset=offset, limit=limit)
+    next_offset = offset + limit
+    if next_offset >= record["total"]:
+        next_offset = None
+    
+    return JobResultsPage(
+        job=JobInfo.from_record(record),
+        offset=offset,
+        limit=limit,
+        next_offset=next_offset,
+        results=[
+            JobResult(
+                customer_index=row["customer_index"],
+                prediction=PredictionResult.create(row["churn_prediction"], row["churn_probability"])
+            )
+            for row in rows
+        ]
+    )
+
+
+@app.post(
+    "/scores/rescore",
+    tags=["Scores"],
+    summary="Incrementally rescore a customer snapshot",
+    description=(
+        "Upload a snapshot (CSV, Excel, Parquet or JSON) with customer ids and features. "
+        "Only customers that are new, changed, or not yet scored by a model version are scored; "
+        "the report says how many rows were skipped."
+    )
+)
+async def rescore(
+    file: UploadFile = File(..., description="Snapshot with a customer id column and the feature columns"),
+    model_version: List[str] = Query(["v1_lr"], description="Model versions to keep scored (repeatable)"),
+    id_column: str = Query(DEFAULT_ID_COLUMN, description="Column holding the customer id")
+):
+    """Update the score store from a snapshot."""
+    try:
+        snapshot = read_snapshot(await file.read(), filename=file.filename or "", id_column=id_column)
+        return await run_in_threadpool(
+            rescore_snapshot, snapshot, model_version, source=file.filename, score=_bulk_score
+        )
+    except AdmissionRejected:
+        raise
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Rescoring error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while rescoring"
+        )
+
+
+@app.get(
+    "/scores/runs",
+    tags=["Scores"],
+    summary="Rescoring runs",
+    description="Reports of the most recent rescoring runs"
+)
+async def list_rescore_runs(limit: int = Query(20, ge=1, le=1000, description="Maximum number of runs to return")):
+    """List recent rescoring runs."""
+    return get_score_store().list_runs(limit=limit)
+
+
+@app.post(
+    "/scores/top-risk",
+    response_model=TopRiskResponse,
+    tags=["Scores"],
+    summary="Highest-risk customers",
+    description=(
+        "The k customers with the highest stored churn probability among those matching "
+        "the categorical filters (e.g. month-to-month fiber customers). Runs over the score "
+        "store; populate it with /scores/rescore first."
+    )
+)
+async def top_risk(query: TopRiskQuery):
+    """Get the top-K at-risk customers of the scored population."""
+    try:
+        index = await run_in_threadpool(get_population_index, query.model_version)
+        start = time.perf_counter()
+        top, matched = index.top_k(query.k, query.filters, query.min_probability)
+        query_ms = (time.perf_counter() - start) * 1000
+        return TopRiskResponse(
+            model_version=query.model_version,
+            population=index.size,
+            matched=matched,
+            query_ms=round(query_ms, 3),
+            customers=[
+                AtRiskCustomer(customer_id=customer_id, churn_probability=probability)
+                for customer_id, probability in top
+            ]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Top-risk query error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while querying the scored population"
+        )
+
+
+@app.post(
+    "/scores/cube",
+    response_model=CubeResponse,
+    tags=["Scores"],
+    summary="Churn breakdown of the scored population",
+    description=(
+        "Customers, predicted churn and numeric means of the scored population, broken down "
+        "by categorical columns (e.g. churn rate by Contract and Internet Service) and filtered "
+        "by categorical values. Served from in-memory aggregates that are kept up to date by "
+        "/scores/rescore; populate the score store with it first."
+    )
+)
+async def churn_cube(query: CubeQuery):
+    """Slice and roll up the churn analytics cube."""
+    try:
+        cube = await run_in_threadpool(get_churn_cube, query.model_version)
+        start = time.perf_counter()
+        result = cube.query(query.group_by, query.filters)
+        query_ms = (time.perf_counter() - start) * 1000
+        return CubeResponse(query_ms=round(query_ms, 3), **result)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Churn cube query error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while querying the churn cube"
+        )
+
+
+@app.get(
+    "/scores/customers/{customer_id}",
+    tags=["Scores"],
+    summary="Stored customer scores",
+    description="Stored features of a customer and their score per model version"
+)
+async def get_customer_scores(customer_id: str):
+    """Get a customer's stored scores."""
+    record = get_score_store().get_customer(customer_id)
+    if record is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Customer {customer_id} not found"
+        )
+    return record
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, reload=True)
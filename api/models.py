@@ -2,8 +2,8 @@ from __future__ import annotations
 """
 Pydantic models for request and response schemas.
 """
-from typing import Optional, List, Annotated
-from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, List, Dict, Union, Annotated
+from pydantic import BaseModel, Field, ConfigDict, field_validator, model_validator
 from enum import Enum
 
 
@@ -107,19 +107,54 @@ class CustomerInput(BaseModel):
     )
 
 
+# Feature columns in training order (important for sklearn pipelines)
+CATEGORICAL_COLUMNS = [
+    "Gender", "Senior Citizen", "Partner", "Dependents",
+    "Phone Service", "Multiple Lines", "Internet Service",
+    "Online Security", "Online Backup", "Device Protection",
+    "Tech Support", "Streaming TV", "Streaming Movies",
+    "Contract", "Paperless Billing", "Payment Method",
+]
+NUMERIC_COLUMNS = ["Tenure Months", "Monthly Charges", "Total Charges", "CLTV"]
+EXPECTED_COLUMNS = CATEGORICAL_COLUMNS + NUMERIC_COLUMNS
+
+# Allowed values of every categorical input column, keyed by column name (alias)
+CATEGORICAL_DOMAINS = {
+    field.alias or name: [member.value for member in field.annotation]
+    for name, field in CustomerInput.model_fields.items()
+    if isinstance(field.annotation, type) and issubclass(field.annotation, Enum)
+}
+
+
+class FeatureContribution(BaseModel):
+    """Contribution of one input column to a prediction."""
+    feature: str = Field(..., description="Input column name")
+    contribution: float = Field(..., description="Contribution to the model output (see units)")
+
+
+class PredictionExplanation(BaseModel):
+    """Per-feature explanation of a prediction."""
+    method: str = Field(..., description="linear (exact) or tree_path (path attribution over the trees)")
+    units: str = Field(..., description="log_odds or probability")
+    base_value: float = Field(..., description="Model output before any feature contribution")
+    contributions: List[FeatureContribution] = Field(..., description="Contributions, largest absolute value first")
+
+
 class PredictionResult(BaseModel):
     """Single prediction result."""
     churn_prediction: int = Field(..., description="Predicted churn (0 = No, 1 = Yes)")
     churn_probability: float = Field(..., ge=0, le=1, description="Probability of churn (0-1)")
     churn_label: str = Field(..., description="Human-readable churn prediction")
+    explanation: Optional[PredictionExplanation] = Field(None, description="Feature contributions (if requested with explain=true)")
     
     @classmethod
-    def create(cls, prediction: int, probability: float):
+    def create(cls, prediction: int, probability: float, explanation: Optional[PredictionExplanation] = None):
         """Create a PredictionResult with automatically computed label."""
         return cls(
             churn_prediction=prediction,
             churn_probability=probability,
-            churn_label="Yes" if prediction == 1 else "No"
+            churn_label="Yes" if prediction == 1 else "No",
+            explanation=explanation
         )
 
 
@@ -142,6 +177,7 @@ class BatchPredictionResponse(BaseModel):
     page: Optional[int] = Field(None, ge=1, description="Current page number (if paginated)")
     page_size: Optional[int] = Field(None, ge=1, description="Page size (if paginated)")
     total_pages: Optional[int] = Field(None, ge=1, description="Total number of pages (if paginated)")
+    partial: bool = Field(False, description="True if the deadline passed and only the first customers were scored")
 
 
 class HealthResponse(BaseModel):
@@ -156,3 +192,207 @@ class ErrorResponse(BaseModel):
     error: str = Field(..., description="Error message")
     detail: Optional[str] = Field(None, description="Detailed error information")
     status_code: int = Field(..., description="HTTP status code")
+
+
+class JobInfo(BaseModel):
+    """Status of an asynchronous batch job."""
+    job_id: str = Field(..., description="Job identifier")
+    model_version: str = Field(..., description="Model version used for scoring")
+    status: str = Field(..., description="queued, running, completed or failed")
+    source: Optional[str] = Field(None, description="Origin of the rows (json or uploaded file name)")
+    total: int = Field(..., description="Number of customers in the job")
+    processed: int = Field(..., description="Number of customers scored so far")
+    progress: float = Field(..., ge=0, le=1, description="Fraction of customers scored")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    created_at: float = Field(..., description="Submission time (Unix timestamp)")
+    started_at: Optional[float] = Field(None, description="Processing start time (Unix timestamp)")
+    finished_at: Optional[float] = Field(None, description="Completion time (Unix timestamp)")
+    
+    @classmethod
+    def from_record(cls, record: dict):
+        """Create a JobInfo from a job store record."""
+        return cls(
+            job_id=record["id"],
+            model_version=record["model_version"],
+            status=record["status"],
+            source=record["source"],
+            total=record["total"],
+            processed=record["processed"],
+            progress=record["processed"] / record["total"] if record["total"] else 1.0,
+            error=record["error"],
+            created_at=record["created_at"],
+            started_at=record["started_at"],
+            finished_at=record["finished_at"]
+        )
+
+
+class JobResult(BaseModel):
+    """Result for a single customer of a batch job."""
+    customer_index: int = Field(..., description="Index of customer in the submitted batch")
+    prediction: PredictionResult = Field(..., description="Prediction result")
+
+
+class JobResultsPage(BaseModel):
+    """A page of batch job results."""
+    job: JobInfo = Field(..., description="Job status")
+    offset: int = Field(..., ge=0, description="Customer index of the first result requested")
+    limit: int = Field(..., ge=1, description="Maximum number of results in the page")
+    next_offset: Optional[int] = Field(None, description="Offset of the next page, if more results exist")
+    results: List[JobResult] = Field(..., description="Results ordered by customer index")
+
+
+class TopRiskQuery(BaseModel):
+    """Query for the highest-risk customers of the scored population."""
+    model_version: str = Field("v1_lr", description="Model version whose scores are ranked")
+    k: int = Field(100, ge=1, le=100000, description="Number of customers to return")
+    filters: Dict[str, List[str]] = Field(
+        default_factory=dict,
+        description="Allowed values per categorical column, e.g. {\"Contract\": [\"Month-to-month\"]}"
+    )
+    min_probability: Optional[float] = Field(None, ge=0, le=1, description="Only customers at or above this churn probability")
+    
+    @field_validator("filters")
+    @classmethod
+    def check_filters(cls, filters: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """Reject unknown columns and values."""
+        for column, values in filters.items():
+            if column not in CATEGORICAL_DOMAINS:
+                raise ValueError(f"Cannot filter on {column!r}. Allowed: {list(CATEGORICAL_DOMAINS)}")
+            invalid = set(values) - set(CATEGORICAL_DOMAINS[column])
+            if invalid:
+                raise ValueError(f"Invalid values {sorted(invalid)} for {column}. Allowed: {CATEGORICAL_DOMAINS[column]}")
+        return filters
+
+
+class AtRiskCustomer(BaseModel):
+    """A customer of the scored population with their churn probability."""
+    customer_id: str = Field(..., description="Customer identifier")
+    churn_probability: float = Field(..., ge=0, le=1, description="Stored churn probability")
+
+
+class TopRiskResponse(BaseModel):
+    """Highest-risk customers matching a query, highest probability first."""
+    model_version: str = Field(..., description="Model version whose scores are ranked")
+    population: int = Field(..., description="Customers with a current score for this model version")
+    matched: int = Field(..., description="Customers matching the filters")
+    query_ms: float = Field(..., description="Time spent filtering and selecting, in milliseconds")
+    customers: List[AtRiskCustomer] = Field(..., description="Top customers, highest churn probability first")
+
+
+class CubeQuery(BaseModel):
+    """Slice and roll-up of the churn analytics cube."""
+    model_version: str = Field("v1_lr", description="Model version whose scores are aggregated")
+    group_by: List[str] = Field(
+        default_factory=list,
+        description="Categorical columns to break down by, e.g. [\"Contract\", \"Internet Service\"]"
+    )
+    filters: Dict[str, List[str]] = Field(
+        default_factory=dict,
+        description="Allowed values per categorical column, e.g. {\"Payment Method\": [\"Electronic check\"]}"
+    )
+    
+    @field_validator("group_by")
+    @classmethod
+    def check_group_by(cls, group_by: List[str]) -> List[str]:
+        """Reject unknown and repeated columns."""
+        unknown = [column for column in group_by if column not in CATEGORICAL_DOMAINS]
+        if unknown:
+            raise ValueError(f"Cannot group by {unknown}. Allowed: {list(CATEGORICAL_DOMAINS)}")
+        if len(set(group_by)) != len(group_by):
+            raise ValueError("Columns in group_by must be distinct")
+        return group_by
+    
+    @field_validator("filters")
+    @classmethod
+    def check_filters(cls, filters: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """Reject unknown columns and values."""
+        return TopRiskQuery.check_filters(filters)
+
+
+class CubeRow(BaseModel):
+    """Aggregates of one group of customers."""
+    values: Dict[str, str] = Field(..., description="Value of each group-by column")
+    customers: int = Field(..., description="Customers in the group")
+    share: float = Field(..., description="Share of the matched customers")
+    predicted_churners: int = Field(..., description="Customers predicted to churn")
+    predicted_churn_rate: float = Field(..., description="Share of the group predicted to churn")
+    mean_churn_probability: float = Field(..., description="Average churn probability (expected churn rate)")
+    numeric_means: Dict[str, Optional[float]] = Field(..., description="Average of each numeric column (missing values left out)")
+
+
+class CubeResponse(BaseModel):
+    """Breakdown of the scored population, largest groups first."""
+    model_version: str = Field(..., description="Model version whose scores are aggregated")
+    run_id: int = Field(..., description="Rescoring run the aggregates are current as of")
+    population: int = Field(..., description="Customers with a current score for this model version")
+    matched: int = Field(..., description="Customers matching the filters")
+    cells_scanned: int = Field(..., description="Cube cells matching the filters")
+    query_ms: float = Field(..., description="Time spent slicing and rolling up, in milliseconds")
+    rows: List[CubeRow] = Field(..., description="One row per group")
+
+
+# Numeric input columns, by column name (alias)
+NUMERIC_FIELDS = [
+    field.alias or name
+    for name, field in CustomerInput.model_fields.items()
+    if (field.alias or name) not in CATEGORICAL_DOMAINS
+]
+
+
+class WhatIfRequest(BaseModel):
+    """Base customers and the grid of feature changes to score them under."""
+    customers: List[CustomerInput] = Field(..., min_length=1, description="Base customers")
+    overrides: Dict[str, List[Union[str, float]]] = Field(
+        default_factory=dict,
+        description="Values to try per column, e.g. {\"Contract\": [\"One year\", \"Two year\"]}"
+    )
+    deltas: Dict[str, List[float]] = Field(
+        default_factory=dict,
+        description="Offsets to try per numeric column, e.g. {\"Tenure Months\": [12, 24]}"
+    )
+    
+    @model_validator(mode="after")
+    def check_grid(self):
+        """Validate the columns and values of the grid."""
+        if not self.overrides and not self.deltas:
+            raise ValueError("At least one override or delta is required")
+        both = set(self.overrides) & set(self.deltas)
+        if both:
+            raise ValueError(f"Columns cannot have both overrides and deltas: {sorted(both)}")
+        for column, values in self.overrides.items():
+            if not values:
+                raise ValueError(f"No values given for {column}")
+            if column in CATEGORICAL_DOMAINS:
+                invalid = [v for v in values if v not in CATEGORICAL_DOMAINS[column]]
+                if invalid:
+                    raise ValueError(f"Invalid values {invalid} for {column}. Allowed: {CATEGORICAL_DOMAINS[column]}")
+            elif column in NUMERIC_FIELDS:
+                if any(isinstance(v, str) or v < 0 for v in values):
+                    raise ValueError(f"Values for {column} must be non-negative numbers")
+            else:
+                raise ValueError(f"Unknown column {column!r}")
+        for column, values in self.deltas.items():
+            if column not in NUMERIC_FIELDS:
+                raise ValueError(f"Deltas are only allowed on numeric columns: {NUMERIC_FIELDS}")
+            if not values:
+                raise ValueError(f"No deltas given for {column}")
+        return self
+
+
+class WhatIfScenario(BaseModel):
+    """One scenario of a what-if sweep."""
+    scenario_index: int = Field(..., description="Column of the scenario in the probability matrices")
+    overrides: Dict[str, Union[str, float]] = Field(..., description="Columns set to a value")
+    deltas: Dict[str, float] = Field(..., description="Numeric columns offset by a value (clipped at 0)")
+    mean_probability_delta: float = Field(..., description="Average change in churn probability over the customers")
+
+
+class WhatIfResponse(BaseModel):
+    """Churn probabilities of every customer under every scenario."""
+    model_version: str = Field(..., description="Model version used for scoring")
+    total_customers: int = Field(..., description="Number of base customers")
+    total_scenarios: int = Field(..., description="Number of scenarios (excluding the unchanged customer)")
+    base_probabilities: List[float] = Field(..., description="Churn probability of each unchanged customer")
+    scenarios: List[WhatIfScenario] = Field(..., description="Scenarios, in matrix column order")
+    probabilities: List[List[float]] = Field(..., description="Churn probability per customer (row) and scenario (column)")
+    probability_deltas: List[List[float]] = Field(..., description="Probability minus base probability, same layout")
@@ -0,0 +1,374 @@
+"""
+Streaming drift and data-quality monitoring for the scoring path.
+
+Every scored batch is folded into fixed-size sketches (histograms for the
+numeric features, category counters for the enum fields and a histogram of
+predicted probabilities per model version), so memory stays constant no
+matter how much traffic is observed. Drift is reported as PSI and KS against
+a baseline snapshot built from the training data.
+"""
+import os
+import threading
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .models import CATEGORICAL_DOMAINS, NUMERIC_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Slot of each domain value in the categorical counts, for single records
+_DOMAIN_POSITIONS = {
+    col: {value: pos for pos, value in enumerate(domain)}
+    for col, domain in CATEGORICAL_DOMAINS.items()
+}
+
+# Number of quantile bins used for numeric features (edges come from the baseline)
+NUMERIC_BINS = 20
+# Number of equal-width bins used for predicted probabilities on [0, 1]
+PROBABILITY_BINS = 20
+# Smoothing applied to empty bins so PSI stays finite
+PSI_EPSILON = 1e-4
+# Usual PSI interpretation thresholds
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+OTHER_CATEGORY = "__other__"
+
+
+def _numeric_edges(values: np.ndarray, n_bins: int = NUMERIC_BINS) -> np.ndarray:
+    """Inner bin edges from baseline quantiles (outer bins are open-ended)."""
+    values = values[~np.isnan(values)]
+    quantiles = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])
+    return np.unique(quantiles)
+
+
+def _bin_numeric(values: np.ndarray, edges: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Histogram of values over open-ended bins, plus the count of missing values."""
+    missing = np.isnan(values)
+    counts = np.bincount(
+        np.searchsorted(edges, values[~missing], side="right"),
+        minlength=len(edges) + 1
+    )
+    return counts, int(missing.sum())
+
+
+def _bin_categorical(values: pd.Series, domain: list) -> np.ndarray:
+    """Counts per domain value; the last slot collects unknown or missing values."""
+    # Object indexes on both sides: no categorical or string dtype is built per batch
+    codes = pd.Index(domain, dtype=object).get_indexer(
+        pd.Index(np.asarray(values, dtype=object), dtype=object, copy=False)
+    )
+    codes = np.where(codes < 0, len(domain), codes)
+    return np.bincount(codes, minlength=len(domain) + 1)
+
+
+def _bin_probabilities(probabilities: np.ndarray) -> np.ndarray:
+    """Histogram of probabilities over equal-width bins on [0, 1]."""
+    bins = np.clip((probabilities * PROBABILITY_BINS).astype(int), 0, PROBABILITY_BINS - 1)
+    return np.bincount(bins, minlength=PROBABILITY_BINS)
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> float:
+    """PSI between two histograms defined over the same bins."""
+    e = expected / max(expected.sum(), 1)
+    a = actual / max(actual.sum(), 1)
+    e = np.clip(e, PSI_EPSILON, None)
+    a = np.clip(a, PSI_EPSILON, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def binned_ks_statistic(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Kolmogorov-Smirnov statistic computed from two ordered histograms."""
+    e = np.cumsum(expected) / max(expected.sum(), 1)
+    a = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(e - a)))
+
+
+def _drift_status(psi: float) -> str:
+    if psi >= PSI_SIGNIFICANT:
+        return "significant"
+    if psi >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftBaseline:
+    """Reference distributions computed once from the training data."""
+
+    def __init__(self, frame: pd.DataFrame):
+        """
+        Build the baseline snapshot.
+
+        Args:
+            frame: Training features with the API column names
+        """
+        self.frame = frame
+        self.numeric_edges: Dict[str, np.ndarray] = {}
+        self.numeric_counts: Dict[str, np.ndarray] = {}
+        self.categorical_counts: Dict[str, np.ndarray] = {}
+        self.probability_counts: Dict[str, np.ndarray] = {}
+
+        for col in NUMERIC_COLUMNS:
+            values = frame[col].to_numpy(dtype=float)
+            edges = _numeric_edges(values)
+            self.numeric_edges[col] = edges
+            self.numeric_counts[col], _ = _bin_numeric(values, edges)
+
+        for col, domain in CATEGORICAL_DOMAINS.items():
+            self.categorical_counts[col] = _bin_categorical(frame[col], domain)
+
+    @classmethod
+    def from_training_data(cls, data_path: Optional[str] = None) -> "DriftBaseline":
+        """
+        Load the baseline from the training spreadsheet.
+
+        Args:
+            data_path: Path to the training data. Defaults to DRIFT_BASELINE_DATA
+                       or data/Telco_customer_churn.xlsx.
+        """
+        if data_path is None:
+            data_path = os.getenv("DRIFT_BASELINE_DATA")
+            if data_path is None:
+                base_dir = Path(__file__).parent.parent
+                data_path = base_dir / "data" / "Telco_customer_churn.xlsx"
+
+        data_path = Path(data_path)
+        if not data_path.exists():
+            raise FileNotFoundError(f"Baseline data not found at {data_path}")
+
+        if data_path.suffix == ".csv":
+            frame = pd.read_csv(data_path)
+        else:
+            frame = pd.read_excel(data_path)
+
+        # Same cleaning as the preprocessing notebook
+        frame["Total Charges"] = pd.to_numeric(frame["Total Charges"], errors="coerce")
+        columns = list(CATEGORICAL_DOMAINS) + NUMERIC_COLUMNS
+        logger.info(f"Drift baseline built from {data_path} ({len(frame)} rows)")
+        return cls(frame[columns])
+
+    def probability_histogram(
+        self,
+        model_version: str,
+        scorer: Callable[[pd.DataFrame], Tuple[np.ndarray, np.ndarray]]
+    ) -> np.ndarray:
+        """Baseline probability histogram for a model, scored once and cached."""
+        if model_version not in self.probability_counts:
+            _, probabilities = scorer(self.frame)
+            self.probability_counts[model_version] = _bin_probabilities(probabilities)
+        return self.probability_counts[model_version]
+
+
+class DriftMonitor:
+    """Constant-memory sketches of the live feature and prediction distributions."""
+
+    def __init__(self, baseline: Optional[DriftBaseline] = None):
+        """
+        Initialize the monitor.
+
+        Args:
+            baseline: Baseline snapshot. If None, it is loaded lazily from the
+                      training data the first time it is needed.
+        """
+        self._baseline = baseline
+        self._baseline_error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def baseline(self) -> DriftBaseline:
+        """The baseline snapshot (loaded on first access)."""
+        if self._baseline is None:
+            # Don't retry a failed load on every scored batch
+            if self._baseline_error is not None:
+                raise self._baseline_error
+            try:
+                self._baseline = DriftBaseline.from_training_data()
+            except Exception as e:
+                self._baseline_error = e
+                raise
+        return self._baseline
+
+    def reset(self):
+        """Clear all live sketches."""
+        with self._lock:
+            self.rows_observed = 0
+            self.numeric_counts: Dict[str, np.ndarray] = {}
+            self.numeric_missing: Dict[str, int] = {col: 0 for col in NUMERIC_COLUMNS}
+            self.categorical_counts = {
+                col: np.zeros(len(domain) + 1, dtype=np.int64)
+                for col, domain in CATEGORICAL_DOMAINS.items()
+            }
+            self.probability_counts: Dict[str, np.ndarray] = {}
+
+    def observe(self, df: pd.DataFrame, probabilities: np.ndarray, model_version: Optional[str]):
+        """
+        Fold a scored batch into the sketches.
+
+        Args:
+            df: Feature frame that was scored
+            probabilities: Predicted churn probabilities for the frame
+            model_version: Model version that produced the probabilities
+        """
+        baseline = self.baseline
+
+        numeric = {}
+        for col in NUMERIC_COLUMNS:
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+            numeric[col] = _bin_numeric(values, baseline.numeric_edges[col])
+        categorical = {
+            col: _bin_categorical(df[col], domain)
+            for col, domain in CATEGORICAL_DOMAINS.items()
+        }
+        prob_counts = _bin_probabilities(np.asarray(probabilities, dtype=float))
+
+        with self._lock:
+            self.rows_observed += len(df)
+            for col, (counts, missing) in numeric.items():
+                if col in self.numeric_counts:
+                    self.numeric_counts[col] += counts
+                else:
+                    self.numeric_counts[col] = counts.astype(np.int64)
+                self.numeric_missing[col] += missing
+            for col, counts in categorical.items():
+                self.categorical_counts[col] += counts
+            key = model_version or "unknown"
+            if key in self.probability_counts:
+                self.probability_counts[key] += prob_counts
+            else:
+                self.probability_counts[key] = prob_counts.astype(np.int64)
+
+    def observe_record(self, record: dict, probability: float, model_version: Optional[str]):
+        """
+        Fold a single scored customer into the sketches, without building a DataFrame.
+
+        Args:
+            record: Feature dict that was scored
+            probability: Predicted churn probability
+            model_version: Model version that produced the probability
+        """
+        baseline = self.baseline
+
+        numeric_bins = {}
+        for col in NUMERIC_COLUMNS:
+            try:
+                value = float(record[col])
+            except (TypeError, ValueError):
+                value = float("nan")
+            numeric_bins[col] = None if value != value else int(
+                np.searchsorted(baseline.numeric_edges[col], value, side="right")
+            )
+        categorical_bins = {
+            col: positions.get(record[col], len(positions))
+            for col, positions in _DOMAIN_POSITIONS.items()
+        }
+        prob_bin = min(max(int(probability * PROBABILITY_BINS), 0), PROBABILITY_BINS - 1)
+
+        with self._lock:
+            self.rows_observed += 1
+            for col, pos in numeric_bins.items():
+                if pos is None:
+                    self.numeric_missing[col] += 1
+                    continue
+                if col not in self.numeric_counts:
+                    self.numeric_counts[col] = np.zeros(len(baseline.numeric_edges[col]) + 1, dtype=np.int64)
+                self.numeric_counts[col][pos] += 1
+            for col, pos in categorical_bins.items():
+                self.categorical_counts[col][pos] += 1
+            key = model_version or "unknown"
+            if key not in self.probability_counts:
+                self.probability_counts[key] = np.zeros(PROBABILITY_BINS, dtype=np.int64)
+            self.probability_counts[key][prob_bin] += 1
+
+    def drift_report(
+        self,
+        model_version: Optional[str] = None,
+        scorer: Optional[Callable[[pd.DataFrame], Tuple[np.ndarray, np.ndarray]]] = None
+    ) -> dict:
+        """
+        Compare the live sketches with the baseline.
+
+        Args:
+            model_version: Model version whose prediction distribution is compared
+            scorer: Function scoring the baseline frame for that model version
+
+        Returns:
+            Dictionary with PSI/KS per feature, data-quality counters and,
+            when a model version is given, prediction drift.
+        """
+        baseline = self.baseline
+
+        with self._lock:
+            rows_observed = self.rows_observed
+            numeric_counts = {k: v.copy() for k, v in self.numeric_counts.items()}
+            numeric_missing = dict(self.numeric_missing)
+            categorical_counts = {k: v.copy() for k, v in self.categorical_counts.items()}
+            probability_counts = self.probability_counts.get(model_version)
+            if probability_counts is not None:
+                probability_counts = probability_counts.copy()
+
+        features = {}
+        for col in NUMERIC_COLUMNS:
+            actual = numeric_counts.get(col)
+            if actual is None:
+                continue
+            expected = baseline.numeric_counts[col]
+            psi = population_stability_index(expected, actual)
+            features[col] = {
+                "type": "numeric",
+                "psi": round(psi, 6),
+                "ks": round(binned_ks_statistic(expected, actual), 6),
+                "status": _drift_status(psi),
+                "missing": numeric_missing[col]
+            }
+
+        for col, domain in CATEGORICAL_DOMAINS.items():
+            actual = categorical_counts[col]
+            if actual.sum() == 0:
+                continue
+            # Unknown categories are reported separately, not as drift bins
+            expected = baseline.categorical_counts[col][:-1]
+            psi = population_stability_index(expected, actual[:-1])
+            features[col] = {
+                "type": "categorical",
+                "psi": round(psi, 6),
+                "status": _drift_status(psi),
+                "frequencies": dict(zip(domain, actual[:-1].tolist())),
+                OTHER_CATEGORY: int(actual[-1])
+            }
+
+        report = {
+            "rows_observed": rows_observed,
+            "features": features
+        }
+
+        if model_version is not None:
+            prediction = {"model_version": model_version, "rows_observed": 0}
+            if probability_counts is not None:
+                prediction["rows_observed"] = int(probability_counts.sum())
+                prediction["histogram"] = probability_counts.tolist()
+                if scorer is not None:
+                    expected = baseline.probability_histogram(model_version, scorer)
+                    psi = population_stability_index(expected, probability_counts)
+                    prediction["psi"] = round(psi, 6)
+                    prediction["ks"] = round(binned_ks_statistic(expected, probability_counts), 6)
+                    prediction["status"] = _drift_status(psi)
+            report["prediction"] = prediction
+
+        return report
+
+
+# Global drift monitor instance
+_drift_monitor: Optional[DriftMonitor] = None
+
+
+def get_drift_monitor() -> DriftMonitor:
+    """Get or create the global drift monitor instance."""
+    global _drift_monitor
+    if _drift_monitor is None:
+        _drift_monitor = DriftMonitor()
+    return _drift_monitor
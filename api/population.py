@@ -0,0 +1,157 @@
+"""
+Top-K at-risk queries over the scored population in the score store.
+
+For each model version, the customers with a current score are loaded once
+into memory, ordered by churn probability (highest first): their ids,
+probabilities, and one packed bitmap per value of every categorical column
+(an inverted index from value to customers). A query ORs the bitmaps of the
+allowed values of each filtered column and ANDs the columns together. As
+bit positions follow the probability order, the top k are the first k set
+bits: the bitmap is scanned block by block and the scan stops as soon as k
+matches are found, so no per-query sort or selection over the matches is
+needed.
+
+The index is rebuilt after the next rescoring run changes the scores.
+"""
+import threading
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .models import CATEGORICAL_DOMAINS
+from .scores import ScoreStore, get_score_store
+from .services import get_model_manager
+
+logger = logging.getLogger(__name__)
+
+
+# Number of set bits of every byte value
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.int64)
+# Bitmap bytes unpacked at a time while looking for the first k matches
+SCAN_BLOCK_BYTES = 8192
+
+
+class PopulationIndex:
+    """In-memory bitmap index over the scored customers of one model version."""
+
+    def __init__(self, population: pd.DataFrame, model_version: str, run_id: int = 0):
+        """
+        Build the index.
+
+        Args:
+            population: DataFrame indexed by customer id with churn_probability
+                        and the categorical columns (see ScoreStore.load_population)
+            model_version: Model version the scores belong to
+            run_id: Rescoring run the scores are current as of
+        """
+        self.model_version = model_version
+        self.run_id = run_id
+        self.size = len(population)
+        order = np.argsort(-population["churn_probability"].to_numpy(dtype=np.float64), kind="stable")
+        population = population.iloc[order]
+        self.customer_ids = population.index.to_numpy(dtype=object)
+        self.probabilities = population["churn_probability"].to_numpy(dtype=np.float64)
+        # (column, value) -> packed bitmap of the customers having that value
+        self.bitmaps: Dict[Tuple[str, str], np.ndarray] = {}
+        for column, domain in CATEGORICAL_DOMAINS.items():
+            codes = pd.Categorical(population[column], categories=domain).codes
+            for code, value in enumerate(domain):
+                self.bitmaps[(column, value)] = np.packbits(codes == code)
+
+    def match(self, filters: Dict[str, List[str]]) -> Optional[np.ndarray]:
+        """
+        Packed bitmap of the customers matching the filters.
+
+        Args:
+            filters: Allowed values per categorical column
+
+        Returns:
+            Packed bitmap, or None when nothing is filtered (everyone matches)
+        """
+        combined = None
+        for column, values in filters.items():
+            allowed = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+            for value in values:
+                allowed |= self.bitmaps[(column, value)]
+            combined = allowed if combined is None else combined & allowed
+        return combined
+
+    def top_k(
+        self,
+        k: int,
+        filters: Optional[Dict[str, List[str]]] = None,
+        min_probability: Optional[float] = None
+    ) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        Highest-probability customers matching the filters.
+
+        Args:
+            k: Number of customers to return
+            filters: Allowed values per categorical column
+            min_probability: Only customers at or above this probability
+
+        Returns:
+            Tuple of ((customer_id, probability) pairs, highest first; number of matches)
+        """
+        # Customers at or above the threshold form a prefix of the order
+        limit = self.size
+        if min_probability is not None:
+            limit = int(np.searchsorted(-self.probabilities, -min_probability, side="right"))
+
+        combined = self.match(filters or {})
+        if combined is None:
+            positions = np.arange(min(k, limit))
+            matched = limit
+        else:
+            # Drop the bits past the threshold
+            combined = combined[:(limit + 7) // 8]
+            if limit % 8:
+                combined[-1] &= (0xFF << (8 - limit % 8)) & 0xFF
+            matched = int(_POPCOUNT[combined].sum())
+            found = []
+            n_found = 0
+            for start in range(0, len(combined), SCAN_BLOCK_BYTES):
+                if n_found >= k:
+                    break
+                hits = np.flatnonzero(np.unpackbits(combined[start:start + SCAN_BLOCK_BYTES]))
+                found.append(hits[:k - n_found] + start * 8)
+                n_found += len(found[-1])
+            positions = np.concatenate(found) if found else np.array([], dtype=np.int64)
+
+        return (
+            list(zip(self.customer_ids[positions].tolist(), self.probabilities[positions].tolist())),
+            matched
+        )
+
+
+# Indexes built so far, keyed by model version
+_indexes: Dict[str, PopulationIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_population_index(model_version: str, store: Optional[ScoreStore] = None) -> PopulationIndex:
+    """
+    Get the index of a model version's scored population, rebuilding it if the scores changed.
+
+    Raises:
+        ValueError: If the model version is not available
+    """
+    available = get_model_manager().available_models
+    if model_version not in available:
+        raise ValueError(f"Unknown model version: {model_version}. Available: {list(available)}")
+    store = store or get_score_store()
+    run_id = store.latest_run_id()
+    with _indexes_lock:
+        index = _indexes.get(model_version)
+        if index is None or index.run_id != run_id:
+            start = time.perf_counter()
+            index = PopulationIndex(store.load_population(model_version), model_version, run_id)
+            _indexes[model_version] = index
+            logger.info(
+                f"Population index for {model_version} built: {index.size} customers "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+    return index
@@ -0,0 +1,478 @@
+"""
+Materialized customer scores with incremental, change-driven rescoring.
+
+The score store (SQLite) keeps, per customer id, the latest feature row and
+a hash of it, and per customer and model version the score and the hash of
+the features it was computed from. A rescoring run diffs a new snapshot
+against the store and only scores customers that are new, whose features
+changed, or that have no score yet for a model version; everything else
+keeps its stored score. Each run reports how much scoring it saved.
+
+Run from the project directory:
+    python -m api.scores data/Telco_customer_churn.xlsx --model-version v1_lr v3_gb
+"""
+import argparse
+import io
+import json
+import os
+import sqlite3
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .models import CATEGORICAL_COLUMNS, EXPECTED_COLUMNS, NUMERIC_COLUMNS
+from .services import get_model_manager
+from .codecs import validate_frame
+
+logger = logging.getLogger(__name__)
+
+# Column holding the customer id in snapshots (as in the Telco export)
+DEFAULT_ID_COLUMN = "CustomerID"
+# Rows scored per model call during a rescoring run
+RESCORE_CHUNK_SIZE = 10000
+
+# Feature columns as stored in SQLite
+FEATURE_FIELDS = {col: col.lower().replace(" ", "_") for col in EXPECTED_COLUMNS}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    feature_hash INTEGER NOT NULL,
+    {feature_columns},
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customer_scores (
+    customer_id TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    feature_hash INTEGER NOT NULL,
+    churn_prediction INTEGER NOT NULL,
+    churn_probability REAL NOT NULL,
+    scored_at REAL NOT NULL,
+    PRIMARY KEY (model_version, customer_id)
+);
+CREATE TABLE IF NOT EXISTS rescore_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    report TEXT NOT NULL
+);
+""".format(feature_columns=",\n    ".join(
+    f"{field} {'REAL' if col in NUMERIC_COLUMNS else 'TEXT'}"
+    for col, field in FEATURE_FIELDS.items()
+))
+
+
+def feature_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    64-bit hash of the 20 feature values of each row.
+
+    Values are normalized first (numerics as float, categoricals as
+    strings), so the same customer hashes the same whether the snapshot came
+    from CSV, Excel or JSON.
+
+    Args:
+        df: DataFrame with the expected feature columns
+
+    Returns:
+        int64 array, one hash per row
+    """
+    combined = np.zeros(len(df), dtype=np.uint64)
+    for col in EXPECTED_COLUMNS:
+        if col in NUMERIC_COLUMNS:
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+        else:
+            values = df[col].astype(str).to_numpy(dtype=object)
+        combined = (combined * np.uint64(1000003)) ^ pd.util.hash_array(values)
+    return combined.view(np.int64)
+
+
+def read_snapshot(
+    source: Union[str, Path, bytes],
+    filename: Optional[str] = None,
+    id_column: str = DEFAULT_ID_COLUMN
+) -> pd.DataFrame:
+    """
+    Read a customer snapshot into validated feature rows indexed by customer id.
+
+    Args:
+        source: File path, or file content (then `filename` gives the format)
+        filename: Name used to pick the format (.csv, .xlsx/.xls, .parquet, else JSON)
+        id_column: Column holding the customer id
+
+    Returns:
+        Validated DataFrame with the expected feature columns, indexed by customer id
+    """
+    if filename is None:
+        filename = str(source)
+    name = filename.lower()
+    data = io.BytesIO(source) if isinstance(source, bytes) else source
+    try:
+        if name.endswith(".csv"):
+            frame = pd.read_csv(data)
+        elif name.endswith((".xlsx", ".xls")):
+            frame = pd.read_excel(data)
+        elif name.endswith(".parquet"):
+            frame = pd.read_parquet(data)
+        else:
+            frame = pd.read_json(data)
+    except Exception as e:
+        raise ValueError(f"Could not read snapshot: {str(e)}")
+
+    if id_column not in frame.columns:
+        raise ValueError(f"Snapshot has no customer id column {id_column!r}")
+    if "Total Charges" in frame.columns and frame["Total Charges"].dtype.kind not in "fi":
+        # Blank totals (new customers) mean missing, as in the preprocessing notebook
+        frame["Total Charges"] = pd.to_numeric(frame["Total Charges"], errors="coerce")
+
+    ids = frame[id_column].astype(str)
+    duplicated = ids.duplicated()
+    if duplicated.any():
+        raise ValueError(f"Duplicate customer id {ids[duplicated].iloc[0]!r} in snapshot")
+
+    features = validate_frame(frame)
+    features.index = pd.Index(ids.to_numpy(), name="customer_id")
+    return features
+
+
+class ScoreStore:
+    """Latest feature rows and scores per customer, in SQLite."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Args:
+            db_path: Path to the SQLite file. Defaults to SCORES_DB_PATH or data/scores.db.
+        """
+        if db_path is None:
+            db_path = os.getenv("SCORES_DB_PATH")
+            if db_path is None:
+                base_dir = Path(__file__).parent.parent
+                db_path = base_dir / "data" / "scores.db"
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def customer_hashes(self) -> pd.Series:
+        """Stored feature hash per customer id."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT customer_id, feature_hash FROM customers").fetchall()
+        return pd.Series(
+            [row[1] for row in rows],
+            index=[row[0] for row in rows],
+            dtype="Int64"
+        )
+
+    def score_hashes(self, model_version: str) -> pd.Series:
+        """Feature hash each stored score of a model version was computed from."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT customer_id, feature_hash FROM customer_scores WHERE model_version = ?",
+                (model_version,)
+            ).fetchall()
+        return pd.Series(
+            [row[1] for row in rows],
+            index=[row[0] for row in rows],
+            dtype="Int64"
+        )
+
+    def upsert_customers(self, features: pd.DataFrame, hashes: np.ndarray):
+        """Store the feature rows (indexed by customer id) and their hashes."""
+        fields = list(FEATURE_FIELDS.values())
+        now = time.time()
+        columns = [features[col].astype(object).where(features[col].notna(), None) for col in EXPECTED_COLUMNS]
+        rows = [
+            (customer_id, int(feature_hash), *values, now)
+            for customer_id, feature_hash, *values in zip(features.index, hashes, *columns)
+        ]
+        placeholders = ", ".join("?" * (len(fields) + 3))
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO customers (customer_id, feature_hash, {', '.join(fields)}, updated_at) "
+                f"VALUES ({placeholders})",
+                rows
+            )
+
+    def upsert_scores(
+        self,
+        model_version: str,
+        customer_ids: Sequence[str],
+        hashes: np.ndarray,
+        predictions: np.ndarray,
+        probabilities: np.ndarray
+    ):
+        """Store scores of a model version."""
+        now = time.time()
+        rows = [
+            (customer_id, model_version, int(feature_hash), int(pred), float(prob), now)
+            for customer_id, feature_hash, pred, prob in zip(customer_ids, hashes, predictions, probabilities)
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO customer_scores "
+                "(customer_id, model_version, feature_hash, churn_prediction, churn_probability, scored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def get_customer(self, customer_id: str) -> Optional[dict]:
+        """Stored features and scores of one customer."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM customers WHERE customer_id = ?", (customer_id,)).fetchone()
+            if row is None:
+                return None
+            scores = conn.execute(
+                "SELECT model_version, churn_prediction, churn_probability, scored_at, "
+                "feature_hash = ? AS current FROM customer_scores WHERE customer_id = ? "
+                "ORDER BY model_version",
+                (row["feature_hash"], customer_id)
+            ).fetchall()
+        return {
+            "customer_id": customer_id,
+            "features": {col: row[field] for col, field in FEATURE_FIELDS.items()},
+            "updated_at": row["updated_at"],
+            "scores": [dict(score, current=bool(score["current"])) for score in scores]
+        }
+
+    def load_population(self, model_version: str) -> pd.DataFrame:
+        """
+        Customers with a current score for a model version.
+
+        Scores computed from an older feature row than the stored one are left out.
+
+        Returns:
+            DataFrame indexed by customer id with churn_probability and the
+            categorical feature columns
+        """
+        fields = ", ".join(f"c.{FEATURE_FIELDS[col]}" for col in CATEGORICAL_COLUMNS)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT c.customer_id, s.churn_probability, {fields} "
+                "FROM customer_scores s JOIN customers c ON c.customer_id = s.customer_id "
+                "WHERE s.model_version = ? AND s.feature_hash = c.feature_hash",
+                (model_version,)
+            ).fetchall()
+        frame = pd.DataFrame(
+            [tuple(row) for row in rows],
+            columns=["customer_id", "churn_probability"] + CATEGORICAL_COLUMNS
+        )
+        return frame.set_index("customer_id")
+
+    def load_scored(self, model_version: str, customer_ids: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Feature rows and current scores of a model version's customers.
+
+        Args:
+            model_version: Model version
+            customer_ids: Only these customers (all when None)
+
+        Returns:
+            DataFrame indexed by customer id with churn_prediction,
+            churn_probability and the expected feature columns
+        """
+        fields = ", ".join(f"c.{field}" for field in FEATURE_FIELDS.values())
+        query = (
+            f"SELECT c.customer_id, s.churn_prediction, s.churn_probability, {fields} "
+            "FROM customer_scores s JOIN customers c ON c.customer_id = s.customer_id "
+            "WHERE s.model_version = ? AND s.feature_hash = c.feature_hash"
+        )
+        rows = []
+        with self._connect() as conn:
+            if customer_ids is None:
+                rows = conn.execute(query, (model_version,)).fetchall()
+            else:
+                customer_ids = list(customer_ids)
+                # Stay below SQLite's limit on bound parameters
+                for offset in range(0, len(customer_ids), 900):
+                    chunk = customer_ids[offset:offset + 900]
+                    rows += conn.execute(
+                        f"{query} AND s.customer_id IN ({', '.join('?' * len(chunk))})",
+                        (model_version, *chunk)
+                    ).fetchall()
+        frame = pd.DataFrame(
+            [tuple(row) for row in rows],
+            columns=["customer_id", "churn_prediction", "churn_probability"] + EXPECTED_COLUMNS
+        )
+        frame[NUMERIC_COLUMNS] = frame[NUMERIC_COLUMNS].astype(np.float64)
+        return frame.set_index("customer_id")
+
+    def latest_run_id(self) -> int:
+        """Id of the most recent rescoring run (0 if none); changes whenever scores do."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(id) FROM rescore_runs").fetchone()
+        return row[0] or 0
+
+    def record_run(self, source: Optional[str], started_at: float, report: dict) -> int:
+        """Store the report of a rescoring run."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO rescore_runs (source, started_at, finished_at, report) VALUES (?, ?, ?, ?)",
+                (source, started_at, time.time(), json.dumps(report))
+            )
+        return cursor.lastrowid
+
+    def list_runs(self, limit: int = 20) -> List[dict]:
+        """Most recent rescoring runs."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM rescore_runs ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row, report=json.loads(row["report"])) for row in rows]
+
+
+def rescore_snapshot(
+    snapshot: pd.DataFrame,
+    model_versions: Sequence[str],
+    store: Optional[ScoreStore] = None,
+    source: Optional[str] = None,
+    score: Optional[Callable] = None
+) -> dict:
+    """
+    Bring the score store up to date with a snapshot, scoring only what changed.
+
+    Args:
+        snapshot: Validated feature rows indexed by customer id (see read_snapshot)
+        model_versions: Model versions to keep scored
+        store: Score store (defaults to the global one)
+        source: Where the snapshot came from, for the run history
+        score: Function scoring rows with a model service, returning
+            (predictions, probabilities) (default: the service's score_batch)
+
+    Returns:
+        Report of the run: customers new/changed/unchanged, and per model
+        version the rows scored and skipped
+    """
+    store = store or get_score_store()
+    score = score or (lambda model_service, rows: model_service.score_batch(rows))
+    manager = get_model_manager()
+    # Fail before touching the store if a version is unknown or missing
+    services = {version: manager.get_model(version) for version in model_versions}
+
+    # Imported here: the cube module reads from this one
+    from .cube import apply_rescore, cube_run_id
+
+    started_at = time.time()
+    base_run_id = store.latest_run_id()
+    hashes = feature_hashes(snapshot)
+    customer_ids = snapshot.index.to_numpy()
+
+    stale_rows = {}
+    retracted = {}
+    for version in services:
+        scored_hashes = store.score_hashes(version).reindex(customer_ids)
+        stale = scored_hashes.isna().to_numpy() | (scored_hashes.fillna(0).to_numpy(dtype=np.int64) != hashes)
+        stale_rows[version] = np.flatnonzero(stale)
+        if cube_run_id(version) == base_run_id:
+            # Rows the cached analytics cube holds for the customers about to be rescored
+            retracted[version] = store.load_scored(version, customer_ids[stale_rows[version]])
+
+    known = store.customer_hashes().reindex(customer_ids)
+    new = known.isna().to_numpy()
+    changed = ~new & (known.fillna(0).to_numpy(dtype=np.int64) != hashes)
+    if (new | changed).any():
+        store.upsert_customers(snapshot[new | changed], hashes[new | changed])
+
+    report = {
+        "source": source,
+        "customers": len(snapshot),
+        "new_customers": int(new.sum()),
+        "changed_customers": int(changed.sum()),
+        "unchanged_customers": int((~new & ~changed).sum()),
+        "versions": {}
+    }
+
+    added = {}
+    for version, model_service in services.items():
+        stale_idx = stale_rows[version]
+
+        start = time.perf_counter()
+        scored_chunks = []
+        for offset in range(0, len(stale_idx), RESCORE_CHUNK_SIZE):
+            idx = stale_idx[offset:offset + RESCORE_CHUNK_SIZE]
+            predictions, probabilities = score(model_service, snapshot.iloc[idx])
+            store.upsert_scores(version, customer_ids[idx], hashes[idx], predictions, probabilities)
+            if version in retracted:
+                scored_chunks.append(
+                    snapshot.iloc[idx].assign(churn_prediction=predictions, churn_probability=probabilities)
+                )
+        elapsed = time.perf_counter() - start
+        if version in retracted:
+            added[version] = pd.concat(scored_chunks) if scored_chunks else snapshot.iloc[:0]
+
+        scored = len(stale_idx)
+        skipped = len(snapshot) - scored
+        report["versions"][version] = {
+            "scored": scored,
+            "skipped": skipped,
+            "saved_ratio": round(skipped / len(snapshot), 4) if len(snapshot) else 0.0,
+            "seconds": round(elapsed, 3)
+        }
+
+    total = len(snapshot) * len(services)
+    skipped = sum(v["skipped"] for v in report["versions"].values())
+    report["rows_scored"] = total - skipped
+    report["rows_skipped"] = skipped
+    report["saved_ratio"] = round(skipped / total, 4) if total else 0.0
+    report["elapsed_seconds"] = round(time.time() - started_at, 3)
+    report["run_id"] = store.record_run(source, started_at, report)
+    for version in retracted:
+        apply_rescore(version, base_run_id, report["run_id"], retracted[version], added[version])
+    logger.info(
+        f"Rescored {report['rows_scored']} of {total} rows "
+        f"({report['saved_ratio']:.1%} saved) from {source or 'snapshot'}"
+    )
+    return report
+
+
+# Global score store instance
+_score_store: Optional[ScoreStore] = None
+
+
+def get_score_store() -> ScoreStore:
+    """Get or create the global score store instance."""
+    global _score_store
+    if _score_store is None:
+        _score_store = ScoreStore()
+    return _score_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally rescore a customer snapshot")
+    parser.add_argument("snapshot", help="CSV, Excel, Parquet or JSON file with customer ids and features")
+    parser.add_argument("--model-version", nargs="+", default=["v1_lr"])
+    parser.add_argument("--id-column", default=DEFAULT_ID_COLUMN)
+    parser.add_argument("--db", default=None, help="Score store path (default: SCORES_DB_PATH or data/scores.db)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    snapshot = read_snapshot(args.snapshot, id_column=args.id_column)
+    report = rescore_snapshot(
+        snapshot,
+        args.model_version,
+        store=ScoreStore(args.db) if args.db else None,
+        source=Path(args.snapshot).name
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Production server: preforked uvicorn workers sharing preloaded models.
+
+The parent process loads (and warms up) every model once, then forks the
+workers. The unpickled pipelines are inherited copy-on-write instead of
+being loaded again by each worker, and all workers accept connections from
+one shared listening socket. BLAS/OpenMP pools are limited per worker so N
+workers do not each start one thread per core, and the scoring slots of
+admission control (SCORING_SLOTS) are divided between the workers.
+
+SIGTERM or SIGINT on the parent is forwarded to the workers, which finish
+their in-flight requests before exiting. Workers that die unexpectedly are
+restarted.
+
+Run from the project directory:
+    python api/serve.py --workers 4
+"""
+import argparse
+import os
+import sys
+
+# Thread pool sizes must be set before numpy/scipy/sklearn are imported
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Run the Churn Prediction API in production mode")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")),
+        help="Number of worker processes (default: number of usable cores)"
+    )
+    parser.add_argument(
+        "--threads-per-worker", type=int, default=int(os.getenv("THREADS_PER_WORKER", "1")),
+        help="BLAS/OpenMP threads per worker"
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        help="Seconds to wait for workers to finish in-flight requests on shutdown"
+    )
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    return parser.parse_args()
+
+
+args = _parse_args() if __name__ == "__main__" else None
+for _var in THREAD_ENV_VARS:
+    os.environ.setdefault(_var, str(args.threads_per_worker if args else 1))
+
+import gc
+import logging
+import signal
+import socket
+import time
+from pathlib import Path
+
+# Add parent directory to path so 'api' module can be found
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import uvicorn
+
+from api.admission import usable_cores
+
+logger = logging.getLogger("api.serve")
+
+
+def preload():
+    """Load everything workers would otherwise load themselves, before forking."""
+    import api.main  # noqa: F401 - build the app once, in the parent
+    from api.services import get_model_manager
+    from api.monitoring import get_drift_monitor
+
+    manager = get_model_manager()
+    loaded = [k for k, v in manager.list_models().items() if v["loaded"]]
+    logger.info(f"Preloaded models: {loaded}")
+    try:
+        get_drift_monitor().baseline
+    except Exception as e:
+        logger.warning(f"Drift monitoring disabled: {str(e)}")
+
+    # Model worker processes (MODEL_EXECUTION_MODE=process) cannot be shared
+    # between server workers: each server worker starts its own after the fork
+    from api.workers import get_worker_pool
+    get_worker_pool().stop()
+
+    # Keep the garbage collector from touching (and so copying) inherited pages
+    gc.collect()
+    gc.freeze()
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Create the listening socket shared by all workers."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(slot: int, sock: socket.socket, options) -> None:
+    """Body of a worker process; never returns."""
+    # Restore default handlers; uvicorn installs its own graceful ones
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # Only one worker processes the batch job queue, so per-version job
+    # concurrency limits hold for the whole server
+    if slot != 0:
+        os.environ["JOB_WORKERS"] = "0"
+
+    # Share the cores between the workers: each worker's admission controller
+    # only sees its own scoring threads
+    os.environ.setdefault(
+        "SCORING_SLOTS",
+        str(max(1, usable_cores() // (options.workers * options.threads_per_worker)))
+    )
+
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(options.threads_per_worker)
+    except ImportError:
+        pass
+
+    from api.main import app
+
+    config = uvicorn.Config(
+        app,
+        log_level=options.log_level,
+        lifespan="on",
+        timeout_graceful_shutdown=options.graceful_timeout
+    )
+    server = uvicorn.Server(config)
+    exit_code = 0
+    try:
+        server.run(sockets=[sock])
+    except Exception:
+        logger.exception(f"Worker {slot} crashed")
+        exit_code = 1
+    os._exit(exit_code)
+
+
+class Arbiter:
+    """Parent process: forks workers, restarts them, and shuts them down."""
+
+    def __init__(self, sock: socket.socket, options):
+        self.sock = sock
+        self.options = options
+        self.workers = {}  # pid -> slot
+        self.stopping = False
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(slot, self.sock, self.options)
+        self.workers[pid] = slot
+        logger.info(f"Started worker {slot} (pid {pid})")
+
+    def handle_stop(self, signum, frame):
+        if not self.stopping:
+            logger.info(f"Received {signal.Signals(signum).name}, stopping workers...")
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+
+        for slot in range(self.options.workers):
+            self.spawn(slot)
+
+        while not self.stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in self.workers:
+                slot = self.workers.pop(pid)
+                if not self.stopping:
+                    logger.warning(f"Worker {slot} (pid {pid}) exited with status {status}, restarting")
+                    self.spawn(slot)
+                continue
+            time.sleep(0.5)
+
+        self.shutdown()
+
+    def shutdown(self):
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + self.options.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.workers.pop(pid, None)
+            else:
+                time.sleep(0.1)
+
+        for pid in self.workers:
+            logger.warning(f"Worker pid {pid} did not stop in time, killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.sock.close()
+        logger.info("All workers stopped")
+
+
+def main(options):
+    logging.basicConfig(
+        level=options.log_level.upper(),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    if options.workers <= 0:
+        options.workers = usable_cores()
+
+    logger.info(
+        f"Starting {options.workers} worker(s) on {options.host}:{options.port} "
+        f"({options.threads_per_worker} BLAS/OpenMP thread(s) each)"
+    )
+    preload()
+    sock = bind_socket(options.host, options.port)
+    Arbiter(sock, options).run()
+
+
+if __name__ == "__main__":
+    main(args)
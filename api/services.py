@@ -1,27 +1,97 @@
 """
 Service layer for model loading and prediction logic.
 """
+import json
 import os
 import pickle
+import threading
+import time
 import pandas as pd
 import numpy as np
 from typing import List, Tuple, Optional
 from pathlib import Path
 import logging
 
+from .admission import LatencyStats
+from .fastpath import compile_pipeline, records_to_frame
+from .models import CATEGORICAL_COLUMNS, EXPECTED_COLUMNS, NUMERIC_COLUMNS
+from .monitoring import get_drift_monitor
+from .shadow import ShadowScorer, parse_shadow_models
+from .synthetic import generate_customers
+from .workers import get_execution_mode, get_worker_pool
+
 logger = logging.getLogger(__name__)
 
+# Version suffix of a distilled student (e.g. v3_gb_student, see api/distill.py)
+STUDENT_SUFFIX = "_student"
+# Single customers timed to estimate a model's latency before live timings exist
+LATENCY_CALIBRATION_ROWS = 32
+# Live single-customer timings needed before they replace the calibration
+LATENCY_MIN_SAMPLES = 100
+
+# Synthetic batch sizes scored when a model is warmed up, and passes per size
+WARMUP_BATCH_SIZES = (1, 16, 256, 1024)
+WARMUP_ROUNDS = 3
+
+# Batches smaller than this are scored without deduplication
+DEDUP_MIN_ROWS = 32
+# Deduplication is skipped when more than this share of the rows is unique
+DEDUP_MAX_UNIQUE_RATIO = 0.9
+# Order in which columns are combined into row keys: most varied first
+DEDUP_COLUMN_ORDER = ["Total Charges", "Monthly Charges", "CLTV", "Tenure Months"] + CATEGORICAL_COLUMNS
+
+
+def unique_rows(df: pd.DataFrame) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Group identical feature rows of a batch.
+    
+    Each column is factorized (hash table lookup, vectorized) and the codes
+    are combined column by column into an exact row key, so rows are only
+    merged when all 20 values are equal. The most varied columns go first:
+    no batch has fewer unique rows than any of its columns has values, so a
+    batch that is clearly all unique is given up on after the first column.
+    
+    Args:
+        df: DataFrame with the expected feature columns
+        
+    Returns:
+        Tuple of (first, inverse), with `first` the position of the first
+        occurrence of each unique row and `df.iloc[first].iloc[inverse]`
+        equal to `df`; None if more than DEDUP_MAX_UNIQUE_RATIO of the rows
+        are unique
+    """
+    n_rows = len(df)
+    max_unique = DEDUP_MAX_UNIQUE_RATIO * n_rows
+    key = np.zeros(n_rows, dtype=np.int64)
+    n_keys = 1
+    for col in DEDUP_COLUMN_ORDER:
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+        if len(uniques) > max_unique:
+            return None
+        if n_keys * len(uniques) >= 2 ** 63:
+            # Renumber the keys seen so far to keep the combined key in int64
+            key, seen = pd.factorize(key)
+            n_keys = len(seen)
+        key = key * len(uniques) + codes
+        n_keys *= len(uniques)
+    
+    _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    if len(first) > max_unique:
+        return None
+    return first, inverse
+
 
 class ModelService:
     """Service for loading and using the churn prediction model."""
     
-    def __init__(self, model_path: Optional[str] = None):
+    def __init__(self, model_path: Optional[str] = None, model_version: Optional[str] = None):
         """
         Initialize the model service.
         
         Args:
             model_path: Path to the model pickle file. If None, uses default path.
                        Can also be set via MODEL_PATH environment variable.
+            model_version: Model version key used when reporting (e.g. v1_lr)
         """
         if model_path is None:
             # Check environment variable first
@@ -33,7 +103,22 @@ class ModelService:
                 model_path = base_dir / "models" / "churn_model_v1_lr.pkl"
         
         self.model_path = Path(model_path)
+        self.model_version = model_version
         self.model = None
+        # Preprocessing replayed into reusable buffers (None: score through sklearn)
+        self.compiled = None
+        self.is_warm = False
+        self.warmup_timings: List[dict] = []
+        # Batch deduplication counters
+        self.dedup_stats = {"batches": 0, "deduplicated_batches": 0, "rows": 0, "scored_rows": 0}
+        self._dedup_lock = threading.Lock()
+        # Worker process scoring for this model (MODEL_EXECUTION_MODE=process)
+        self.worker = None
+        # Shadow model scoring a sample of this model's traffic (SHADOW_MODELS)
+        self.shadow = None
+        # Scoring time of single customers (latency budget selection)
+        self.row_latency = LatencyStats()
+        self.calibrated_row_ms: Optional[float] = None
         self._load_model()
     
     def _load_model(self):
@@ -44,6 +129,7 @@ class ModelService:
             
             with open(self.model_path, 'rb') as f:
                 self.model = pickle.load(f)
+            self.compiled = compile_pipeline(self.model)
             
             logger.info(f"Model successfully loaded from {self.model_path}")
         except Exception as e:
@@ -54,6 +140,145 @@ class ModelService:
         """Check if model is loaded."""
         return self.model is not None
     
+    def warmup(self, batch_sizes: Tuple[int, ...] = WARMUP_BATCH_SIZES, rounds: int = WARMUP_ROUNDS):
+        """
+        Warm up the model by scoring synthetic batches of several sizes.
+        
+        The first calls through the pipeline pay for sklearn validation,
+        pandas dtype inference and other lazily initialized code paths; doing
+        them here keeps that cost out of the first real requests.
+        
+        Args:
+            batch_sizes: Sizes of the synthetic batches
+            rounds: Number of passes per size
+        """
+        if not self.is_loaded():
+            raise RuntimeError("Model is not loaded")
+        
+        timings = []
+        for size in batch_sizes:
+            df = generate_customers(size, seed=size)
+            elapsed = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                self.score_frame(df)
+                elapsed.append((time.perf_counter() - start) * 1000)
+            timings.append({
+                "batch_size": size,
+                "first_ms": round(elapsed[0], 3),
+                "warm_ms": round(min(elapsed), 3)
+            })
+        
+        self.warmup_timings = timings
+        self.calibrate_row_latency()
+        self.is_warm = True
+        logger.info(f"Model {self.model_version or self.model_path.name} warmed up: {timings}")
+    
+    def _score_one(self, customer_data: dict) -> Tuple[int, float]:
+        """Score a single customer, without monitoring."""
+        if self.compiled is not None and self.worker is None:
+            return self.compiled.score_record(customer_data)
+        predictions, probabilities = self.score_frame(pd.DataFrame([customer_data], columns=EXPECTED_COLUMNS))
+        return int(predictions[0]), float(probabilities[0])
+    
+    def calibrate_row_latency(self, n_rows: int = LATENCY_CALIBRATION_ROWS) -> float:
+        """Median time to score a single synthetic customer, in milliseconds."""
+        records = generate_customers(n_rows, seed=n_rows).to_dict("records")
+        self._score_one(records[0])
+        elapsed = []
+        for record in records:
+            start = time.perf_counter()
+            self._score_one(record)
+            elapsed.append((time.perf_counter() - start) * 1000)
+        self.calibrated_row_ms = float(np.median(elapsed))
+        return self.calibrated_row_ms
+    
+    def row_latency_ms(self) -> Optional[float]:
+        """
+        Expected time to score a single customer, in milliseconds.
+        
+        The live p95 once LATENCY_MIN_SAMPLES customers were scored,
+        the calibration measured at warm-up before that (None if the
+        model was not calibrated yet).
+        """
+        if self.row_latency.count >= LATENCY_MIN_SAMPLES:
+            return self.row_latency.percentile(95)
+        return self.calibrated_row_ms
+    
+    def score_frame(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score a feature DataFrame without recording it for monitoring.
+        
+        Args:
+            df: DataFrame with the expected feature columns
+            
+        Returns:
+            Tuple of (predictions, probabilities) arrays
+        """
+        if self.worker is not None:
+            return self.worker.score(df.reindex(columns=EXPECTED_COLUMNS))
+        if self.compiled is not None and not set(EXPECTED_COLUMNS).difference(df.columns):
+            # Columns are read by name, so neither a reindexed copy nor the
+            # pipeline's intermediate matrices are allocated
+            return self.compiled.score(df)
+        df = df.reindex(columns=EXPECTED_COLUMNS)
+        # Derive the class from the probabilities instead of calling predict(),
+        # which would run the whole preprocessing pipeline a second time
+        proba = self.model.predict_proba(df)
+        predictions = self.model.classes_[np.argmax(proba, axis=1)]
+        return predictions, proba[:, 1]
+    
+    def score_batch(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score a batch, scoring each distinct feature row only once.
+        
+        Results of the unique rows are scattered back to every position
+        they occur at. Small batches and batches that are (almost) all
+        unique are scored as they are.
+        
+        Args:
+            df: DataFrame with the expected feature columns
+            
+        Returns:
+            Tuple of (predictions, probabilities) arrays
+        """
+        groups = unique_rows(df) if len(df) >= DEDUP_MIN_ROWS else None
+        if groups is None:
+            predictions, probabilities = self.score_frame(df)
+            scored_rows = len(df)
+        else:
+            first, inverse = groups
+            predictions, probabilities = self.score_frame(df.iloc[first])
+            predictions, probabilities = predictions[inverse], probabilities[inverse]
+            scored_rows = len(first)
+        
+        with self._dedup_lock:
+            self.dedup_stats["batches"] += 1
+            self.dedup_stats["deduplicated_batches"] += groups is not None
+            self.dedup_stats["rows"] += len(df)
+            self.dedup_stats["scored_rows"] += scored_rows
+        return predictions, probabilities
+    
+    def dedup_report(self) -> dict:
+        """Deduplication counters, with the share of rows that did not need scoring."""
+        with self._dedup_lock:
+            stats = dict(self.dedup_stats)
+        saved = stats["rows"] - stats["scored_rows"]
+        stats["dedup_ratio"] = round(saved / stats["rows"], 4) if stats["rows"] else 0.0
+        return stats
+    
+    def _observe(self, df: pd.DataFrame, predictions: np.ndarray, probabilities: np.ndarray):
+        """Feed a scored batch to the drift monitor and the shadow model; never fails the request."""
+        try:
+            get_drift_monitor().observe(df, probabilities, self.model_version)
+        except Exception as e:
+            logger.debug(f"Drift monitoring skipped: {str(e)}")
+        if self.shadow is not None:
+            try:
+                self.shadow.offer(df, predictions, probabilities)
+            except Exception as e:
+                logger.debug(f"Shadow scoring skipped: {str(e)}")
+    
     def predict_single(self, customer_data: dict) -> Tuple[int, float]:
         """
         Predict churn for a single customer.
@@ -69,41 +294,120 @@ class ModelService:
         if not self.is_loaded():
             raise RuntimeError("Model is not loaded")
         
+        if self.compiled is not None and self.worker is None:
+            return self._predict_record(customer_data)
+        
         try:
             # Convert to DataFrame - column names should already match (with spaces)
             # The input dict keys should match the training column names exactly
             df = pd.DataFrame([customer_data])
             
-            # Ensure column order matches training (important for sklearn pipelines)
-            expected_columns = [
-                "Gender", "Senior Citizen", "Partner", "Dependents",
-                "Phone Service", "Multiple Lines", "Internet Service",
-                "Online Security", "Online Backup", "Device Protection",
-                "Tech Support", "Streaming TV", "Streaming Movies",
-                "Contract", "Paperless Billing", "Payment Method",
-                "Tenure Months", "Monthly Charges", "Total Charges", "CLTV"
-            ]
-            
             # Check for missing columns
-            missing_cols = set(expected_columns) - set(df.columns)
+            missing_cols = set(EXPECTED_COLUMNS) - set(df.columns)
             if missing_cols:
                 raise ValueError(f"Missing required columns: {missing_cols}")
             
             # Reorder columns to match training order
-            df = df.reindex(columns=expected_columns)
+            df = df.reindex(columns=EXPECTED_COLUMNS)
             
             # Get prediction and probability
-            prediction = self.model.predict(df)[0]
-            probability = self.model.predict_proba(df)[0, 1]
+            start = time.perf_counter()
+            predictions, probabilities = self.score_frame(df)
+            self.row_latency.record((time.perf_counter() - start) * 1000)
+            self._observe(df, predictions, probabilities)
             
-            return int(prediction), float(probability)
+            return int(predictions[0]), float(probabilities[0])
         
-        except ValueError:
+        except (ValueError, RuntimeError):
             raise
         except Exception as e:
             logger.error(f"Error during prediction: {str(e)}")
             raise ValueError(f"Prediction failed: {str(e)}")
     
+    def _predict_record(self, customer_data: dict) -> Tuple[int, float]:
+        """predict_single through the compiled pipeline: no DataFrame is built."""
+        missing_cols = set(EXPECTED_COLUMNS).difference(customer_data)
+        if missing_cols:
+            raise ValueError(f"Missing required columns: {missing_cols}")
+        try:
+            start = time.perf_counter()
+            prediction, probability = self.compiled.score_record(customer_data)
+            self.row_latency.record((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            logger.error(f"Error during prediction: {str(e)}")
+            raise ValueError(f"Prediction failed: {str(e)}")
+        try:
+            get_drift_monitor().observe_record(customer_data, probability, self.model_version)
+        except Exception as e:
+            logger.debug(f"Drift monitoring skipped: {str(e)}")
+        if self.shadow is not None:
+            try:
+                self.shadow.offer(
+                    pd.DataFrame([customer_data], columns=EXPECTED_COLUMNS),
+                    np.array([prediction]), np.array([probability])
+                )
+            except Exception as e:
+                logger.debug(f"Shadow scoring skipped: {str(e)}")
+        return prediction, probability
+    
+    def predict_frame(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predict churn for a column batch without per-row conversion.
+        
+        Args:
+            df: DataFrame with the expected feature columns
+            
+        Returns:
+            Tuple of (predictions, probabilities) arrays
+        """
+        if not self.is_loaded():
+            raise RuntimeError("Model is not loaded")
+        
+        missing_cols = set(EXPECTED_COLUMNS) - set(df.columns)
+        if missing_cols:
+            raise ValueError(f"Missing required columns: {missing_cols}")
+        
+        try:
+            predictions, probabilities = self.score_batch(df)
+            self._observe(df, predictions, probabilities)
+            return predictions, probabilities
+        except RuntimeError:
+            raise
+        except Exception as e:
+            logger.error(f"Error during batch prediction: {str(e)}")
+            raise ValueError(f"Batch prediction failed: {str(e)}")
+    
+    def predict_arrays(self, customers_data: List[dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predict churn for multiple customers, returning NumPy arrays.
+        
+        The batch is built column by column from the dicts (no row-wise
+        DataFrame construction or reindexed copy) and the results stay
+        arrays, so callers can serialize them without per-row tuples.
+        
+        Args:
+            customers_data: List of customer feature dictionaries
+            
+        Returns:
+            Tuple of (predictions, probabilities) arrays
+        """
+        if not self.is_loaded():
+            raise RuntimeError("Model is not loaded")
+        
+        try:
+            df = records_to_frame(customers_data, EXPECTED_COLUMNS, NUMERIC_COLUMNS)
+            
+            # Get predictions and probabilities (identical rows are scored once)
+            predictions, probabilities = self.score_batch(df)
+            self._observe(df, predictions, probabilities)
+            return predictions, probabilities
+        
+        except (ValueError, RuntimeError):
+            raise
+        except Exception as e:
+            logger.error(f"Error during batch prediction: {str(e)}")
+            raise ValueError(f"Batch prediction failed: {str(e)}")
+    
     def predict_batch(
         self, 
         customers_data: List[dict],
@@ -123,55 +427,14 @@ class ModelService:
             - predictions: List of (prediction, probability) tuples
             - total_count: Total number of customers
         """
-        if not self.is_loaded():
-            raise RuntimeError("Model is not loaded")
+        # Apply pagination if requested
+        total_count = len(customers_data)
+        if page is not None and page_size is not None:
+            start_idx = (page - 1) * page_size
+            customers_data = customers_data[start_idx:start_idx + page_size]
         
-        try:
-            # Convert to DataFrame
-            df = pd.DataFrame(customers_data)
-            
-            # Ensure column order matches training (important for sklearn pipelines)
-            expected_columns = [
-                "Gender", "Senior Citizen", "Partner", "Dependents",
-                "Phone Service", "Multiple Lines", "Internet Service",
-                "Online Security", "Online Backup", "Device Protection",
-                "Tech Support", "Streaming TV", "Streaming Movies",
-                "Contract", "Paperless Billing", "Payment Method",
-                "Tenure Months", "Monthly Charges", "Total Charges", "CLTV"
-            ]
-            
-            # Check for missing columns
-            missing_cols = set(expected_columns) - set(df.columns)
-            if missing_cols:
-                raise ValueError(f"Missing required columns: {missing_cols}")
-            
-            # Reorder columns to match training order
-            df = df.reindex(columns=expected_columns)
-            
-            # Apply pagination if requested
-            total_count = len(df)
-            if page is not None and page_size is not None:
-                start_idx = (page - 1) * page_size
-                end_idx = start_idx + page_size
-                df = df.iloc[start_idx:end_idx]
-            
-            # Get predictions and probabilities
-            predictions = self.model.predict(df)
-            probabilities = self.model.predict_proba(df)[:, 1]
-            
-            # Combine results
-            results = [
-                (int(pred), float(prob))
-                for pred, prob in zip(predictions, probabilities)
-            ]
-            
-            return results, total_count
-        
-        except ValueError:
-            raise
-        except Exception as e:
-            logger.error(f"Error during batch prediction: {str(e)}")
-            raise ValueError(f"Batch prediction failed: {str(e)}")
+        predictions, probabilities = self.predict_arrays(customers_data)
+        return list(zip(predictions.tolist(), probabilities.tolist())), total_count
 
 
 # Global model service instances - one per model
@@ -188,17 +451,37 @@ class ModelManager:
         self.available_models = {
             "v1_lr": "churn_model_v1_lr.pkl",
             "v2_rf": "churn_model_v2_rf.pkl",
-            "v3_gb": "churn_model_v3_gb.pkl"
+            "v3_gb": "churn_model_v3_gb.pkl",
+            # Distilled from v3_gb by api/distill.py
+            "v3_gb_student": "churn_model_v3_gb_student.pkl"
         }
+        # Set MODEL_WARMUP=0 to skip warm-up (e.g. for quick local runs)
+        self.warmup_enabled = os.getenv("MODEL_WARMUP", "1") != "0"
+        # Score in the API process (thread) or in one worker process per model (process)
+        self.execution_mode = get_execution_mode()
+        # Shadow model per primary version (SHADOW_MODELS, e.g. "v1_lr:v3_gb")
+        self.shadow_models = parse_shadow_models(os.getenv("SHADOW_MODELS"))
         self._load_all_models()
     
+    def _load_model(self, model_key: str, model_path: Path) -> ModelService:
+        """Load a model and warm it up before it is made available."""
+        service = ModelService(model_path=str(model_path), model_version=model_key)
+        if self.execution_mode == "process":
+            service.worker = get_worker_pool().start_worker(model_key, str(model_path), self.warmup_enabled)
+        if self.warmup_enabled and service.is_loaded():
+            try:
+                service.warmup()
+            except Exception as e:
+                logger.warning(f"Warm-up of model {model_key} failed: {str(e)}")
+        return service
+    
     def _load_all_models(self):
         """Load all available models."""
         for model_key, model_file in self.available_models.items():
             model_path = self.models_dir / model_file
             if model_path.exists():
                 try:
-                    service = ModelService(model_path=str(model_path))
+                    service = self._load_model(model_key, model_path)
                     if service.is_loaded():
                         _model_services[model_key] = service
                         logger.info(f"Model {model_key} loaded successfully")
@@ -208,6 +491,27 @@ class ModelManager:
                     logger.error(f"Error loading model {model_key}: {str(e)}")
             else:
                 logger.warning(f"Model file not found: {model_path}")
+        for model_key, service in list(_model_services.items()):
+            self._attach_shadow(model_key, service)
+    
+    def _attach_shadow(self, model_key: str, service: ModelService):
+        """Start shadow scoring of a primary model's traffic if SHADOW_MODELS names a shadow for it."""
+        shadow = self.shadow_models.get(model_key)
+        if shadow is None or service.shadow is not None:
+            return
+        try:
+            if shadow in self.available_models:
+                shadow_service = self.get_model(shadow)
+            else:
+                # A candidate pickle that is not served as a primary version
+                shadow_path = Path(shadow)
+                if not shadow_path.is_absolute():
+                    shadow_path = self.base_dir / shadow_path
+                shadow_service = self._load_model(shadow_path.stem, shadow_path)
+            service.shadow = ShadowScorer(model_key, shadow, shadow_service)
+            logger.info(f"Shadow scoring of {model_key} by {shadow} enabled")
+        except Exception as e:
+            logger.error(f"Could not start shadow scoring of {model_key} by {shadow}: {str(e)}")
     
     def get_model(self, model_version: str = "v1_lr") -> ModelService:
         """
@@ -233,7 +537,8 @@ class ModelManager:
             model_path = self.models_dir / self.available_models[model_version]
             if not model_path.exists():
                 raise FileNotFoundError(f"Model file not found: {model_path}")
-            _model_services[model_version] = ModelService(model_path=str(model_path))
+            _model_services[model_version] = self._load_model(model_version, model_path)
+            self._attach_shadow(model_version, _model_services[model_version])
         
         return _model_services[model_version]
     
@@ -242,12 +547,75 @@ class ModelManager:
         result = {}
         for model_key in self.available_models.keys():
             is_loaded = model_key in _model_services and _model_services[model_key].is_loaded()
+            row_latency_ms = _model_services[model_key].row_latency_ms() if is_loaded else None
             result[model_key] = {
                 "file": self.available_models[model_key],
                 "loaded": is_loaded,
-                "path": str(self.models_dir / self.available_models[model_key])
+                "warm": is_loaded and _model_services[model_key].is_warm,
+                "execution_mode": self.execution_mode,
+                "path": str(self.models_dir / self.available_models[model_key]),
+                "shadow": self.shadow_models.get(model_key),
+                "row_latency_ms": round(row_latency_ms, 4) if row_latency_ms is not None else None
             }
+            if model_key.endswith(STUDENT_SUFFIX):
+                result[model_key]["distillation"] = self.student_report(model_key)
         return result
+    
+    def student_report(self, model_key: str) -> Optional[dict]:
+        """Teacher, fidelity and holdout metrics saved by api/distill.py next to a student's pickle."""
+        report_path = (self.models_dir / self.available_models[model_key]).with_suffix(".json")
+        if not report_path.exists():
+            return None
+        with open(report_path) as f:
+            report = json.load(f)
+        return {key: report.get(key) for key in ("teacher", "created_at", "fidelity", "holdout_labels", "latency")}
+    
+    def select_model(self, model_version: str, latency_budget_ms: float) -> str:
+        """
+        Pick the tier of a model version that fits a single-customer latency budget.
+        
+        The requested version is used if its expected latency fits, else its
+        distilled student (<version>_student) if that fits. When neither fits,
+        the faster of the two is used. Blocking: a candidate that is not
+        loaded or not calibrated yet (MODEL_WARMUP=0) is loaded or
+        calibrated first, so call it off the event loop.
+        
+        Args:
+            model_version: Requested model version
+            latency_budget_ms: Scoring time allowed per customer, in milliseconds
+            
+        Returns:
+            Model version to score with
+        """
+        candidates = [model_version]
+        student = f"{model_version}{STUDENT_SUFFIX}"
+        if student in self.available_models:
+            candidates.append(student)
+        
+        latencies = {}
+        for candidate in candidates:
+            try:
+                service = self.get_model(candidate)
+                latency_ms = service.row_latency_ms()
+                if latency_ms is None:
+                    latency_ms = service.calibrate_row_latency()
+            except Exception as e:
+                if candidate == model_version:
+                    raise
+                logger.warning(f"Student {candidate} unavailable for latency selection: {str(e)}")
+                continue
+            if latency_ms <= latency_budget_ms:
+                return candidate
+            latencies[candidate] = latency_ms
+        return min(latencies, key=latencies.get)
+    
+    def shadow_scorers(self) -> dict:
+        """Shadow scorers of the loaded models, by primary version."""
+        return {
+            model_key: service.shadow
+            for model_key, service in _model_services.items()
+            if service.shadow is not None
+        }
 
 
 # Global model manager instance
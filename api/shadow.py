@@ -0,0 +1,284 @@
+"""
+Shadow scoring of candidate models on live traffic.
+
+A shadow model is attached to a primary model version (SHADOW_MODELS). Every
+request is still answered by the primary model only; afterwards a sample of
+the scored batches (SHADOW_SAMPLE_RATE) is copied, together with the primary
+results, into a bounded queue. A background thread scores the queued
+batches with the shadow model and folds the comparison into fixed-size
+aggregates:
+
+* agreement and the 2x2 table of primary vs shadow classes
+* mean, mean absolute and maximum probability difference (shadow - primary)
+* a histogram of the differences on [-1, 1]
+* shadow scoring time and the lag between the request and the comparison
+
+The request path only samples and enqueues. When the queue is full
+(SHADOW_QUEUE_SIZE batches) the batch is dropped and counted, never waited
+for. The background thread scores in slices and, before each slice, blocks
+until no primary scoring is running (the admission controller signals when
+its slots are all free), so shadow work only uses idle time instead of
+competing with requests for the CPU and the GIL. Under sustained load the
+queue fills up and shadow batches are dropped rather than slowing primary
+responses, and a batch still waiting for idle time SHADOW_MAX_AGE_S seconds
+after its request is dropped as expired rather than compared late.
+"""
+import os
+import queue
+import random
+import threading
+import time
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .admission import BULK_SLICE_ROWS, LatencyStats, get_admission_controller
+
+logger = logging.getLogger(__name__)
+
+# Equal-width bins of the probability difference on [-1, 1]
+DIFFERENCE_BINS = 40
+# Absolute probability differences reported as "large"
+LARGE_DIFFERENCE = 0.1
+
+
+def parse_shadow_models(value: Optional[str]) -> Dict[str, str]:
+    """
+    Parse SHADOW_MODELS, e.g. "v1_lr:v3_gb,v3_gb:models/churn_model_v3_gb_retrained.pkl".
+
+    Returns:
+        Mapping of primary model version to shadow model version or pickle path
+    """
+    shadows = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        primary, sep, shadow = item.partition(":")
+        if not sep or not primary.strip() or not shadow.strip():
+            raise ValueError(f"Invalid SHADOW_MODELS entry {item!r}. Expected primary:shadow")
+        shadows[primary.strip()] = shadow.strip()
+    return shadows
+
+
+class ShadowScorer:
+    """Scores sampled primary batches with a shadow model in the background."""
+
+    def __init__(
+        self,
+        primary_version: str,
+        shadow_version: str,
+        shadow_service,
+        sample_rate: Optional[float] = None,
+        queue_size: Optional[int] = None,
+        max_age_s: Optional[float] = None
+    ):
+        """
+        Initialize the scorer and start its background thread.
+
+        Args:
+            primary_version: Model version answering the requests
+            shadow_version: Name of the shadow model (version key or pickle name)
+            shadow_service: ModelService of the shadow model
+            sample_rate: Share of batches shadowed (SHADOW_SAMPLE_RATE, default 1.0)
+            queue_size: Batches waiting for shadow scoring at most (SHADOW_QUEUE_SIZE, default 32)
+            max_age_s: Seconds a batch may wait for idle time (SHADOW_MAX_AGE_S, default 60)
+        """
+        self.primary_version = primary_version
+        self.shadow_version = shadow_version
+        self.shadow_service = shadow_service
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("SHADOW_SAMPLE_RATE", "1.0"))
+        if not 0 <= self.sample_rate <= 1:
+            raise ValueError(f"Shadow sample rate must be between 0 and 1, got {self.sample_rate}")
+        self.max_age_s = max_age_s if max_age_s is not None else float(os.getenv("SHADOW_MAX_AGE_S", "60"))
+        self._queue_size = queue_size if queue_size is not None else int(os.getenv("SHADOW_QUEUE_SIZE", "32"))
+        self._queue: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        self._lock = threading.Lock()
+        self.reset()
+        self._start_thread()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start_thread(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"shadow-{self.primary_version}", daemon=True
+        )
+        self._thread.start()
+
+    def _after_fork(self):
+        # The thread does not survive the fork of a server worker; its queue
+        # and lock may have been held by it when the parent forked
+        self._queue = queue.Queue(maxsize=self._queue_size)
+        self._lock = threading.Lock()
+        self._start_thread()
+
+    def reset(self):
+        """Clear the aggregates."""
+        with self._lock:
+            self.offered_batches = 0
+            self.sampled_batches = 0
+            self.dropped_batches = 0
+            self.expired_batches = 0
+            self.failed_batches = 0
+            self.batches = 0
+            self.rows = 0
+            self.agreements = 0
+            # [primary class][shadow class]
+            self.class_table = np.zeros((2, 2), dtype=np.int64)
+            self.primary_sum = 0.0
+            self.shadow_sum = 0.0
+            self.difference_sum = 0.0
+            self.abs_difference_sum = 0.0
+            self.max_abs_difference = 0.0
+            self.large_differences = 0
+            self.difference_histogram = np.zeros(DIFFERENCE_BINS, dtype=np.int64)
+            self.scoring = LatencyStats()
+            self.lag = LatencyStats()
+
+    def offer(self, df: pd.DataFrame, predictions: np.ndarray, probabilities: np.ndarray):
+        """
+        Queue a scored primary batch for shadow scoring, if sampled and there is room.
+
+        Called on the request path: never blocks.
+        """
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        with self._lock:
+            self.offered_batches += 1
+            if not sampled:
+                return
+            self.sampled_batches += 1
+            if self._queue.full():
+                self.dropped_batches += 1
+                return
+        try:
+            self._queue.put_nowait((
+                time.perf_counter(),
+                df.copy(),
+                np.array(predictions, dtype=np.int64),
+                np.array(probabilities, dtype=np.float64)
+            ))
+        except queue.Full:
+            with self._lock:
+                self.dropped_batches += 1
+
+    def _run(self):
+        while True:
+            enqueued, df, predictions, probabilities = self._queue.get()
+            try:
+                scoring_s = 0.0
+                shadow_predictions, shadow_probabilities = [], []
+                for start in range(0, len(df), BULK_SLICE_ROWS):
+                    if not self._wait_for_idle(enqueued + self.max_age_s):
+                        break
+                    slice_start = time.perf_counter()
+                    slice_predictions, slice_probabilities = self.shadow_service.score_batch(
+                        df.iloc[start:start + BULK_SLICE_ROWS]
+                    )
+                    scoring_s += time.perf_counter() - slice_start
+                    shadow_predictions.append(np.asarray(slice_predictions, dtype=np.int64))
+                    shadow_probabilities.append(np.asarray(slice_probabilities, dtype=np.float64))
+                else:
+                    # Every slice was scored before the batch expired
+                    self._record(
+                        predictions, probabilities,
+                        np.concatenate(shadow_predictions), np.concatenate(shadow_probabilities),
+                        scoring_ms=scoring_s * 1000,
+                        lag_ms=(time.perf_counter() - enqueued) * 1000
+                    )
+            except Exception as e:
+                with self._lock:
+                    self.failed_batches += 1
+                logger.warning(f"Shadow scoring of {self.primary_version} by {self.shadow_version} failed: {str(e)}")
+
+    def _wait_for_idle(self, expires: float) -> bool:
+        """
+        Wait until no primary request holds a scoring slot.
+
+        Args:
+            expires: perf_counter time after which the batch is not worth scoring
+
+        Returns:
+            False (and the batch is counted as expired) if it expired first
+        """
+        if get_admission_controller().idle.wait(timeout=max(0.0, expires - time.perf_counter())):
+            return True
+        with self._lock:
+            self.expired_batches += 1
+        return False
+
+    def _record(
+        self,
+        predictions: np.ndarray,
+        probabilities: np.ndarray,
+        shadow_predictions: np.ndarray,
+        shadow_probabilities: np.ndarray,
+        scoring_ms: float,
+        lag_ms: float
+    ):
+        differences = shadow_probabilities - probabilities
+        abs_differences = np.abs(differences)
+        table = np.bincount(predictions * 2 + shadow_predictions, minlength=4).reshape(2, 2)
+        histogram = np.bincount(
+            np.clip(((differences + 1) / 2 * DIFFERENCE_BINS).astype(np.int64), 0, DIFFERENCE_BINS - 1),
+            minlength=DIFFERENCE_BINS
+        )
+        with self._lock:
+            self.batches += 1
+            self.rows += len(predictions)
+            self.agreements += int(table[0, 0] + table[1, 1])
+            self.class_table += table
+            self.primary_sum += float(probabilities.sum())
+            self.shadow_sum += float(shadow_probabilities.sum())
+            self.difference_sum += float(differences.sum())
+            self.abs_difference_sum += float(abs_differences.sum())
+            self.max_abs_difference = max(self.max_abs_difference, float(abs_differences.max(initial=0.0)))
+            self.large_differences += int((abs_differences > LARGE_DIFFERENCE).sum())
+            self.difference_histogram += histogram
+            self.scoring.record(scoring_ms)
+            self.lag.record(lag_ms)
+
+    def stats(self) -> dict:
+        """Comparison of the shadow model against the primary on the shadowed traffic."""
+        with self._lock:
+            rows = self.rows
+            edges = np.linspace(-1, 1, DIFFERENCE_BINS + 1)
+
+            def mean(total: float) -> Optional[float]:
+                return round(total / rows, 6) if rows else None
+
+            return {
+                "primary_version": self.primary_version,
+                "shadow_version": self.shadow_version,
+                "sample_rate": self.sample_rate,
+                "queue": {
+                    "size": self._queue.qsize(),
+                    "max_size": self._queue.maxsize,
+                    "offered_batches": self.offered_batches,
+                    "sampled_batches": self.sampled_batches,
+                    "dropped_batches": self.dropped_batches,
+                    "expired_batches": self.expired_batches,
+                    "failed_batches": self.failed_batches
+                },
+                "batches": self.batches,
+                "rows": rows,
+                "agreement_rate": mean(self.agreements),
+                "class_table": {
+                    "primary_0_shadow_0": int(self.class_table[0, 0]),
+                    "primary_0_shadow_1": int(self.class_table[0, 1]),
+                    "primary_1_shadow_0": int(self.class_table[1, 0]),
+                    "primary_1_shadow_1": int(self.class_table[1, 1])
+                },
+                "mean_primary_probability": mean(self.primary_sum),
+                "mean_shadow_probability": mean(self.shadow_sum),
+                "mean_difference": mean(self.difference_sum),
+                "mean_abs_difference": mean(self.abs_difference_sum),
+                "max_abs_difference": round(self.max_abs_difference, 6),
+                "large_difference_rate": mean(self.large_differences),
+                "difference_histogram": [
+                    {"from": round(float(low), 3), "to": round(float(high), 3), "count": int(count)}
+                    for low, high, count in zip(edges[:-1], edges[1:], self.difference_histogram)
+                    if count
+                ],
+                "scoring": self.scoring.to_dict(),
+                "lag": self.lag.to_dict()
+            }
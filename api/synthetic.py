@@ -0,0 +1,55 @@
+"""
+Synthetic customers drawn from the input domains in api/models.py.
+
+Used to warm up models, to benchmark and load-test the API, and wherever
+realistic-looking but fake feature rows are needed. Rows respect the
+dependencies between columns (no phone service -> "No phone service" for
+Multiple Lines, no internet -> "No internet service" for the add-ons) and
+Total Charges follows tenure x monthly charges.
+"""
+import numpy as np
+import pandas as pd
+
+from .models import CATEGORICAL_DOMAINS
+
+PHONE_DEPENDENT = ["Multiple Lines"]
+INTERNET_DEPENDENT = [
+    "Online Security", "Online Backup", "Device Protection",
+    "Tech Support", "Streaming TV", "Streaming Movies",
+]
+
+
+def generate_customers(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Generate random customers.
+
+    Args:
+        n_rows: Number of customers
+        seed: Random seed
+
+    Returns:
+        DataFrame with the 20 input columns (API names)
+    """
+    rng = np.random.default_rng(seed)
+    data = {
+        col: rng.choice(domain, size=n_rows)
+        for col, domain in CATEGORICAL_DOMAINS.items()
+    }
+
+    no_phone = data["Phone Service"] == "No"
+    for col in PHONE_DEPENDENT:
+        values = rng.choice(["Yes", "No"], size=n_rows)
+        data[col] = np.where(no_phone, "No phone service", values)
+
+    no_internet = data["Internet Service"] == "No"
+    for col in INTERNET_DEPENDENT:
+        values = rng.choice(["Yes", "No"], size=n_rows)
+        data[col] = np.where(no_internet, "No internet service", values)
+
+    tenure = rng.integers(0, 73, size=n_rows)
+    monthly = np.round(rng.uniform(18.25, 118.75, size=n_rows), 2)
+    data["Tenure Months"] = tenure
+    data["Monthly Charges"] = monthly
+    data["Total Charges"] = np.round(tenure * monthly * rng.uniform(0.95, 1.05, size=n_rows), 2)
+    data["CLTV"] = rng.integers(2003, 6501, size=n_rows)
+    return pd.DataFrame(data)
@@ -0,0 +1,117 @@
+"""
+What-if sweeps: score a batch of customers under a grid of feature changes.
+
+A sweep takes base customers and, per column, either replacement values
+(overrides, any column) or offsets (deltas, numeric columns). The scenarios
+are the cartesian product of these lists, plus scenario 0, the unchanged
+customer. The scenario matrix (every customer under every scenario) is built
+column by column with repeat/tile and scored with one ModelService call per
+chunk of customers, so memory stays bounded however large the grid is.
+Identical scenario rows (e.g. an override equal to the current value) are
+scored once thanks to batch deduplication.
+"""
+import itertools
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .admission import BULK_SLICE_ROWS
+from .models import EXPECTED_COLUMNS, NUMERIC_COLUMNS
+
+# Scenario rows (customers x scenarios) materialized and scored at once: one
+# bulk slice, so interactive requests are admitted between chunks
+WHATIF_CHUNK_ROWS = BULK_SLICE_ROWS
+# Limits on the size of a sweep
+MAX_WHATIF_SCENARIOS = 1000
+MAX_WHATIF_ROWS = 1000000
+
+
+class WhatIfSweep:
+    """Scenario grid over a base batch, scored chunk by chunk."""
+
+    def __init__(
+        self,
+        base: pd.DataFrame,
+        overrides: Dict[str, Sequence[Union[str, float]]],
+        deltas: Dict[str, Sequence[float]]
+    ):
+        """
+        Build the scenario grid.
+
+        Args:
+            base: Base customers with the expected feature columns
+            overrides: Values to try per column
+            deltas: Offsets to try per numeric column (results are clipped at 0)
+        """
+        self.base = base.reindex(columns=EXPECTED_COLUMNS).reset_index(drop=True)
+        self.columns = list(overrides) + list(deltas)
+        self.is_delta = [False] * len(overrides) + [True] * len(deltas)
+        grid = list(itertools.product(*overrides.values(), *deltas.values()))
+
+        self.n_customers = len(self.base)
+        # Scenario 0 is the unchanged customer
+        self.n_scenarios = len(grid) + 1
+        if self.n_scenarios - 1 > MAX_WHATIF_SCENARIOS:
+            raise ValueError(
+                f"Too many scenarios. Maximum {MAX_WHATIF_SCENARIOS}, got {self.n_scenarios - 1}"
+            )
+        if self.n_customers * self.n_scenarios > MAX_WHATIF_ROWS:
+            raise ValueError(
+                f"Sweep too large. Maximum {MAX_WHATIF_ROWS} customer-scenario pairs, "
+                f"got {self.n_customers * self.n_scenarios}"
+            )
+        self.scenarios: List[Tuple] = grid
+        # One array per changed column, indexed by scenario
+        self.grid_columns = [
+            np.array([None] + [scenario[pos] for scenario in grid], dtype=object)
+            for pos in range(len(self.columns))
+        ]
+        self.chunk_customers = max(1, WHATIF_CHUNK_ROWS // self.n_scenarios)
+
+    def describe(self, index: int) -> Dict[str, Dict[str, Union[str, float]]]:
+        """Overrides and deltas of a scenario (index into self.scenarios)."""
+        scenario = self.scenarios[index]
+        return {
+            "overrides": {
+                col: value for col, value, delta in zip(self.columns, scenario, self.is_delta) if not delta
+            },
+            "deltas": {
+                col: value for col, value, delta in zip(self.columns, scenario, self.is_delta) if delta
+            }
+        }
+
+    def chunks(self) -> List[Tuple[int, int]]:
+        """Customer ranges scored together."""
+        return [
+            (start, min(start + self.chunk_customers, self.n_customers))
+            for start in range(0, self.n_customers, self.chunk_customers)
+        ]
+
+    def scenario_frame(self, start: int, stop: int) -> pd.DataFrame:
+        """Every customer of a range under every scenario, customer-major."""
+        customer_idx = np.repeat(np.arange(start, stop), self.n_scenarios)
+        scenario_idx = np.tile(np.arange(self.n_scenarios), stop - start)
+        unchanged = scenario_idx == 0
+
+        frame = self.base.iloc[customer_idx].reset_index(drop=True)
+        for col, delta, values in zip(self.columns, self.is_delta, self.grid_columns):
+            changed = values[scenario_idx]
+            if delta:
+                offsets = np.where(unchanged, 0.0, changed).astype(np.float64)
+                frame[col] = np.clip(frame[col].to_numpy(dtype=np.float64) + offsets, 0, None)
+            elif col in NUMERIC_COLUMNS:
+                frame[col] = np.where(unchanged, frame[col].to_numpy(dtype=np.float64), changed).astype(np.float64)
+            else:
+                frame[col] = np.where(unchanged, frame[col].to_numpy(dtype=object), changed)
+        return frame
+
+    def score_chunk(self, model_service, start: int, stop: int) -> np.ndarray:
+        """
+        Score a range of customers under all scenarios in one call.
+
+        Returns:
+            Array of shape (stop - start, n_scenarios); column 0 is the base probability
+        """
+        _, probabilities = model_service.score_batch(self.scenario_frame(start, stop))
+        return probabilities.reshape(stop - start, self.n_scenarios)
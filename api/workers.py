@@ -0,0 +1,416 @@
+"""
+Per-model worker processes (MODEL_EXECUTION_MODE=process).
+
+By default every model scores inside the API process, so a long batch on a
+slow model holds the GIL while other models' requests wait, and a crash in a
+model's native code takes the whole API down. In process mode each model
+version gets a long-lived worker process that loads its own copy of the
+pipeline; ModelService.score_frame forwards batches to it. Everything else
+(validation, deduplication, drift monitoring, explanations) stays in the
+API process.
+
+Batches are exchanged through a shared memory segment per worker rather
+than pickled over the pipe. The API writes the numeric columns as a float64
+matrix and the categorical columns as int8 codes into the domains of
+CustomerInput. The worker scores them and writes predictions and
+probabilities back into the same segment. The pipe carries only small
+control messages.
+
+A supervisor thread pings the workers, restarts any that died, and samples
+each worker's CPU time. A worker that crashes or times out during a batch
+fails that batch with WorkerUnavailable (500) and is restarted.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import logging
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .models import CATEGORICAL_COLUMNS, CATEGORICAL_DOMAINS, EXPECTED_COLUMNS, NUMERIC_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_MODES = ("thread", "process")
+
+# Seconds between health checks
+WORKER_HEALTH_INTERVAL = 5.0
+# Rows the shared memory segment of a new worker holds
+INITIAL_CAPACITY_ROWS = 1024
+# Bytes per row: numerics (float64) and categorical codes (int8) in,
+# probabilities (float64) and predictions (int64) out
+ROW_BYTES = len(NUMERIC_COLUMNS) * 8 + len(CATEGORICAL_COLUMNS) + 8 + 8
+
+# Categorical values by code; code -1 (missing) maps to the trailing NaN
+_DOMAIN_VALUES = {
+    col: np.array(CATEGORICAL_DOMAINS[col] + [np.nan], dtype=object) for col in CATEGORICAL_COLUMNS
+}
+
+
+class WorkerUnavailable(RuntimeError):
+    """Raised when a model worker crashed, timed out or could not be started."""
+
+
+def _views(buf, n_rows: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Numeric, code, probability and prediction arrays of a batch in a segment."""
+    n_numeric, n_categorical = len(NUMERIC_COLUMNS), len(CATEGORICAL_COLUMNS)
+    offset = 0
+    numeric = np.ndarray((n_rows, n_numeric), dtype=np.float64, buffer=buf, offset=offset)
+    offset += numeric.nbytes
+    codes = np.ndarray((n_rows, n_categorical), dtype=np.int8, buffer=buf, offset=offset)
+    offset += codes.nbytes
+    # Keep the float64 output aligned
+    offset += -offset % 8
+    probabilities = np.ndarray(n_rows, dtype=np.float64, buffer=buf, offset=offset)
+    offset += probabilities.nbytes
+    predictions = np.ndarray(n_rows, dtype=np.int64, buffer=buf, offset=offset)
+    return numeric, codes, probabilities, predictions
+
+
+def _write_features(buf, df: pd.DataFrame):
+    numeric, codes, _, _ = _views(buf, len(df))
+    numeric[:] = df[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+    for pos, col in enumerate(CATEGORICAL_COLUMNS):
+        col_codes = pd.Categorical(df[col], categories=CATEGORICAL_DOMAINS[col]).codes
+        unknown = (col_codes < 0) & df[col].notna().to_numpy()
+        if unknown.any():
+            row = int(np.argmax(unknown))
+            raise ValueError(
+                f"Invalid value {df[col].iloc[row]!r} for {col} at row {row}. "
+                f"Allowed: {CATEGORICAL_DOMAINS[col]}"
+            )
+        codes[:, pos] = col_codes
+
+
+def _read_features(buf, n_rows: int) -> pd.DataFrame:
+    numeric, codes, _, _ = _views(buf, n_rows)
+    columns = {col: _DOMAIN_VALUES[col][codes[:, pos]] for pos, col in enumerate(CATEGORICAL_COLUMNS)}
+    columns.update({col: numeric[:, pos] for pos, col in enumerate(NUMERIC_COLUMNS)})
+    return pd.DataFrame(columns, columns=EXPECTED_COLUMNS)
+
+
+def _worker_main(conn, model_version: str, model_path: str, warmup: bool):
+    """Entry point of a worker process: load the model, then serve requests until told to stop."""
+    # Shutdown is driven by the API process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Imported here: services imports this module to start the workers
+    from .services import ModelService
+
+    try:
+        service = ModelService(model_path=model_path, model_version=model_version)
+        if warmup:
+            service.warmup()
+    except Exception as e:
+        conn.send(("error", f"Could not load {model_version}: {str(e)}"))
+        return
+    conn.send(("ready", time.process_time()))
+
+    segment = None
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            # The API process is gone
+            break
+        command = message[0]
+        if command == "stop":
+            break
+        if command == "ping":
+            conn.send(("ok", time.process_time()))
+            continue
+        try:
+            _, name, n_rows = message
+            if segment is None or segment.name != name:
+                if segment is not None:
+                    segment.close()
+                segment = shared_memory.SharedMemory(name=name)
+            predictions, probabilities = service.score_frame(_read_features(segment.buf, n_rows))
+            _, _, probabilities_out, predictions_out = _views(segment.buf, n_rows)
+            probabilities_out[:] = probabilities
+            predictions_out[:] = predictions
+            conn.send(("ok", time.process_time()))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+    if segment is not None:
+        segment.close()
+
+
+class ModelWorker:
+    """API-side handle of one model's worker process."""
+
+    def __init__(self, model_version: str, model_path: str, timeout: float, warmup: bool = True):
+        """
+        Initialize the handle; the process is started by start().
+
+        Args:
+            model_version: Model version served by the worker
+            model_path: Path to the model pickle file
+            timeout: Seconds a batch may take before the worker is considered hung
+            warmup: Warm the model up in the worker after loading it
+        """
+        self.model_version = model_version
+        self.model_path = model_path
+        self.timeout = timeout
+        self.warmup = warmup
+        self.process = None
+        self.conn = None
+        self.segment: Optional[shared_memory.SharedMemory] = None
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.restarts = 0
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_seen = None
+        self.cpu_seconds = 0.0
+        self.cpu_percent = 0.0
+        self._cpu_sample: Optional[Tuple[float, float]] = None
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def start(self, start_timeout: float = 300.0):
+        """Start the worker process and wait until its model is loaded."""
+        with self._lock:
+            self._start(start_timeout)
+
+    def _start(self, start_timeout: float = 300.0):
+        if self.process is not None:
+            self._terminate()
+            self.restarts += 1
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, self.model_version, self.model_path, self.warmup),
+            name=f"model-{self.model_version}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        status, payload = self._receive(start_timeout)
+        if status != "ready":
+            self._terminate()
+            raise WorkerUnavailable(payload)
+        self.started_at = time.time()
+        self._cpu_sample = None
+        self._record_cpu(payload)
+        logger.info(f"Model worker for {self.model_version} started (pid {self.process.pid})")
+
+    def _terminate(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+        if self.process is not None:
+            self.process.join(timeout=5)
+        if self.conn is not None:
+            self.conn.close()
+
+    def _receive(self, timeout: float) -> Tuple[str, object]:
+        """Wait for the worker's reply; a dead or hung worker is killed."""
+        try:
+            if self.conn.poll(timeout):
+                return self.conn.recv()
+            reason = f"no reply within {timeout:.0f}s"
+        except (EOFError, OSError):
+            reason = "process exited"
+        exitcode = self.process.exitcode
+        self._terminate()
+        self.errors += 1
+        self.last_error = f"{reason} (exit code {exitcode})" if exitcode is not None else reason
+        raise WorkerUnavailable(f"Model worker for {self.model_version} failed: {self.last_error}")
+
+    def _record_cpu(self, cpu_seconds: float):
+        now = time.monotonic()
+        self.last_seen = time.time()
+        self.cpu_seconds = cpu_seconds
+        if self._cpu_sample is not None and now > self._cpu_sample[0]:
+            self.cpu_percent = 100 * (cpu_seconds - self._cpu_sample[1]) / (now - self._cpu_sample[0])
+        self._cpu_sample = (now, cpu_seconds)
+
+    def _segment_for(self, n_rows: int) -> shared_memory.SharedMemory:
+        """Shared memory segment large enough for a batch, grown by powers of two."""
+        size = max(n_rows, 1) * ROW_BYTES + 8
+        if self.segment is None or self.segment.size < size:
+            capacity = max(INITIAL_CAPACITY_ROWS, 1 << (max(n_rows, 1) - 1).bit_length())
+            if self.segment is not None:
+                self.segment.close()
+                self.segment.unlink()
+            self.segment = shared_memory.SharedMemory(create=True, size=capacity * ROW_BYTES + 8)
+        return self.segment
+
+    def score(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score a batch in the worker process.
+
+        Args:
+            df: DataFrame with the expected feature columns
+
+        Returns:
+            Tuple of (predictions, probabilities) arrays
+        """
+        with self._lock:
+            if not self.is_alive():
+                # Crashed since the last batch and not restarted yet by the supervisor
+                self._start()
+            segment = self._segment_for(len(df))
+            _write_features(segment.buf, df)
+            self.conn.send(("score", segment.name, len(df)))
+            status, payload = self._receive(self.timeout)
+            if status == "error":
+                self.errors += 1
+                self.last_error = payload
+                raise ValueError(payload)
+            self._record_cpu(payload)
+            self.requests += 1
+            self.rows += len(df)
+            _, _, probabilities, predictions = _views(segment.buf, len(df))
+            return predictions.copy(), probabilities.copy()
+
+    def check(self):
+        """Health check: restart a dead worker, ping an idle one (a busy worker is alive)."""
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if not self.is_alive():
+                logger.warning(f"Model worker for {self.model_version} is down, restarting")
+                self._start()
+                return
+            self.conn.send(("ping",))
+            _, cpu_seconds = self._receive(self.timeout)
+            self._record_cpu(cpu_seconds)
+        except Exception as e:
+            logger.error(f"Health check of the {self.model_version} worker failed: {str(e)}")
+        finally:
+            self._lock.release()
+
+    def forget(self):
+        """Drop the handles inherited by a forked child; the child starts its own worker."""
+        self.process = None
+        self.conn = None
+        self.segment = None
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.restarts = self.requests = self.rows = self.errors = 0
+        self._cpu_sample = None
+
+    def stop(self):
+        """Stop the worker process and free its shared memory."""
+        with self._lock:
+            if self.is_alive():
+                try:
+                    self.conn.send(("stop",))
+                    self.process.join(timeout=5)
+                except OSError:
+                    pass
+            self._terminate()
+            if self.segment is not None:
+                self.segment.close()
+                self.segment.unlink()
+                self.segment = None
+
+    def to_dict(self) -> dict:
+        return {
+            "pid": self.process.pid if self.process is not None else None,
+            "alive": self.is_alive(),
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at and self.is_alive() else None,
+            "restarts": self.restarts,
+            "requests": self.requests,
+            "rows": self.rows,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "seconds_since_heartbeat": round(time.time() - self.last_seen, 1) if self.last_seen else None,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "cpu_percent": round(self.cpu_percent, 1),
+            "shared_memory_bytes": self.segment.size if self.segment is not None else 0
+        }
+
+
+class WorkerPool:
+    """The model worker processes and their supervisor thread."""
+
+    def __init__(self, timeout: Optional[float] = None, health_interval: float = WORKER_HEALTH_INTERVAL):
+        """
+        Initialize the pool.
+
+        Args:
+            timeout: Seconds a batch may take before its worker is restarted (WORKER_TIMEOUT, default 120)
+            health_interval: Seconds between health checks
+        """
+        self.timeout = timeout or float(os.getenv("WORKER_TIMEOUT", "120"))
+        self.health_interval = health_interval
+        self.workers: Dict[str, ModelWorker] = {}
+        self._stop = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A forked server worker must not share the parent's pipes and segments
+        self._stop = threading.Event()
+        self._supervisor = None
+        for worker in self.workers.values():
+            worker.forget()
+        if self.workers:
+            self._start_supervisor()
+
+    def _start_supervisor(self):
+        self._supervisor = threading.Thread(target=self._supervise, name="model-workers", daemon=True)
+        self._supervisor.start()
+
+    def start_worker(self, model_version: str, model_path: str, warmup: bool = True) -> ModelWorker:
+        """Start (or return) the worker of a model version."""
+        worker = self.workers.get(model_version)
+        if worker is None:
+            worker = ModelWorker(model_version, model_path, self.timeout, warmup)
+            worker.start()
+            self.workers[model_version] = worker
+        if self._supervisor is None:
+            self._start_supervisor()
+        return worker
+
+    def _supervise(self):
+        while not self._stop.wait(self.health_interval):
+            for worker in list(self.workers.values()):
+                worker.check()
+
+    def stop(self):
+        """Stop the supervisor and every worker."""
+        self._stop.set()
+        self._supervisor = None
+        for worker in self.workers.values():
+            worker.stop()
+
+    def stats(self) -> dict:
+        """Per-model worker health and CPU usage."""
+        return {
+            "mode": get_execution_mode(),
+            "health_interval_seconds": self.health_interval,
+            "timeout_seconds": self.timeout,
+            "workers": {version: worker.to_dict() for version, worker in self.workers.items()}
+        }
+
+
+def get_execution_mode() -> str:
+    """Where models score: thread (in the API process, default) or process (MODEL_EXECUTION_MODE)."""
+    mode = os.getenv("MODEL_EXECUTION_MODE", "thread").lower()
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"Invalid MODEL_EXECUTION_MODE {mode!r}. Allowed: {list(EXECUTION_MODES)}")
+    return mode
+
+
+# Global worker pool instance
+_worker_pool: Optional[WorkerPool] = None
+
+
+def get_worker_pool() -> WorkerPool:
+    """Get or create the global worker pool instance."""
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = WorkerPool()
+    return _worker_pool